@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+HTTPie engine benchmarks.
+
+Runs a batch of requests (``--batch``) against a local HTTP/1.1 server
+with each ``--engine`` and a few ``--parallel`` levels, and reports
+the requests per second:
+
+    $ python benchmarks/engines.py
+    $ python benchmarks/engines.py --requests 5000 --parallel 1 50 200
+    $ python benchmarks/engines.py --latency 50 --output results.json
+
+The server delays each response by ``--latency`` milliseconds to simulate
+a remote service, which is where running many requests at the same time
+pays off.
+
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+ENGINES = ['requests', 'asyncio']
+
+DEFAULT_REQUESTS = 1000
+DEFAULT_PARALLEL = [1, 10, 50]
+DEFAULT_LATENCY_MS = 10.0
+DEFAULT_RUNS = 3
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Reply to every GET with a small JSON document, after a delay."""
+
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are separate writes.
+    disable_nagle_algorithm = True
+    body = json.dumps({'hello': 'world', 'numbers': [1, 2, 3]}).encode()
+    latency = 0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(latency):
+    handler = type('Handler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def write_batch_file(path, url, count):
+    with open(path, 'w') as f:
+        for i in range(count):
+            f.write(json.dumps({'url': '%s/items/%d' % (url, i)}) + '\n')
+
+
+def run_batch(batch_file, engine, parallel):
+    """Return the wall time of running the batch file in seconds."""
+    args = [
+        sys.executable, '-m', 'httpie',
+        '--ignore-stdin', '--pretty=none', '--body',
+        '--engine', engine, '--parallel', str(parallel),
+        '--batch', batch_file,
+    ]
+    start = time.perf_counter()
+    subprocess.run(args, check=True, cwd=ROOT_DIR, stdin=subprocess.DEVNULL,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def run_benchmarks(requests_count, parallel_levels, latency_ms, runs):
+    server = start_stub_server(latency=latency_ms / 1000)
+    url = 'http://127.0.0.1:%d' % server.server_port
+    tmp_dir = tempfile.mkdtemp(prefix='httpie-bench-')
+    batch_file = os.path.join(tmp_dir, 'requests.jsonl')
+    write_batch_file(batch_file, url, requests_count)
+    results = {}
+    try:
+        for parallel in parallel_levels:
+            for engine in ENGINES:
+                elapsed = statistics.median(
+                    run_batch(batch_file, engine, parallel)
+                    for _ in range(runs)
+                )
+                results['%s:%d' % (engine, parallel)] = {
+                    'engine': engine,
+                    'parallel': parallel,
+                    'seconds': round(elapsed, 4),
+                    'requests_per_second': round(requests_count / elapsed, 1),
+                }
+    finally:
+        server.shutdown()
+        os.remove(batch_file)
+        os.rmdir(tmp_dir)
+    return results
+
+
+def print_results(results):
+    print('%-10s %8s %10s %10s' % ('engine', 'parallel', 'seconds', 'req/s'))
+    for result in results.values():
+        print('%-10s %8d %10.3f %10.1f' % (
+            result['engine'], result['parallel'], result['seconds'],
+            result['requests_per_second']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS,
+                        help='requests per batch (default: %(default)s)')
+    parser.add_argument('--parallel', type=int, nargs='+',
+                        default=DEFAULT_PARALLEL,
+                        help='--parallel levels (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY_MS,
+                        help='server latency in ms (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS,
+                        help='runs per benchmark (default: %(default)s)')
+    parser.add_argument('--output', help='also save the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        requests_count=args.requests,
+        parallel_levels=args.parallel,
+        latency_ms=args.latency,
+        runs=args.runs,
+    )
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+"""
+HTTPie start-up time benchmarks.
+
+Measures the wall time of a few typical invocations, each in a fresh
+interpreter, and breaks the import time down per module using the
+``-X importtime`` data:
+
+    $ python benchmarks/startup.py                       # Print results.
+    $ python benchmarks/startup.py --output results.json
+    $ python benchmarks/startup.py --compare             # Against the baseline.
+    $ python benchmarks/startup.py --save-baseline
+
+It also times preparing the TLS context of the first HTTPS connection
+(loading the CA bundle), and getting the shared one for the following
+connections, which is the time saved for each of them.
+
+With ``--compare``, the exit status is 1 when any of the measured times is
+slower than the baseline by more than the tolerance. A time is considered a
+regression only when it exceeds both the relative (``--tolerance``) and the
+absolute (``--min-delta``) thresholds, so that the noise of very short
+timings doesn't fail the comparison. Tolerances can also be set per
+benchmark, e.g., ``--tolerance import:pygments=0.5``.
+
+The baseline is machine-specific; regenerate it with ``--save-baseline``
+when comparing on a different machine.
+
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+RESULTS_VERSION = 1
+
+# The modules whose cumulative import time is reported.
+IMPORT_MODULES = [
+    'httpie.core',
+    'httpie.cli',
+    'httpie.plugins',
+    'requests',
+    'pygments',
+]
+
+DEFAULT_RUNS = 10
+DEFAULT_TOLERANCE = 0.15
+DEFAULT_MIN_DELTA_MS = 5.0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Reply to every GET with a small JSON document."""
+
+    body = json.dumps({'hello': 'world', 'numbers': [1, 2, 3]}).encode()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server():
+    server = HTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def get_scenarios(url):
+    """Return the benchmarked invocations as `(name, args)` pairs."""
+    return [
+        ('version', ['--version']),
+        ('help', ['--help']),
+        ('request-pretty-none', ['--ignore-stdin', '--pretty=none', url]),
+        ('request-pretty-all', ['--ignore-stdin', '--pretty=all', url]),
+    ]
+
+
+def get_env(config_dir):
+    env = dict(os.environ)
+    env['HTTPIE_CONFIG_DIR'] = config_dir
+    env['TERM'] = 'xterm-256color'
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [ROOT_DIR, env.get('PYTHONPATH')]))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+def run_http(args, env, importtime=False):
+    """Run `python -m httpie` with `args`; return (wall time, stderr)."""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-m', 'httpie'] + args
+    start = time.perf_counter()
+    process = subprocess.run(cmd, env=env, stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - start
+    stderr = process.stderr.decode('utf8', 'replace')
+    if process.returncode != 0:
+        raise RuntimeError('%r failed:\n%s' % (cmd, stderr))
+    return elapsed, stderr
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output into `(depth, module, cumulative_us)`.
+
+    The lines look like::
+
+        import time: self [us] | cumulative | imported package
+        import time:       129 |        129 |   _io
+
+    where the indentation of the module name is its nesting depth.
+
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[12:].split('|')
+            cumulative_us = int(cumulative_us)
+        except ValueError:
+            # The header line.
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), cumulative_us))
+    return entries
+
+
+def get_import_time(entries, module):
+    """
+    Return the total time (in us) spent importing `module` and its
+    submodules.
+
+    Submodules are often imported separately, later than the package itself
+    (e.g., `pygments.lexers`), so all the top-most imports of the package
+    and its submodules are added up.
+
+    """
+    def matches(name):
+        return name == module or name.startswith(module + '.')
+
+    total = 0
+    # Reversed, the entries are in pre-order (parents before children).
+    ancestors = []
+    for depth, name, cumulative_us in reversed(entries):
+        while ancestors and ancestors[-1][0] >= depth:
+            ancestors.pop()
+        if matches(name) and not any(matched for _, matched in ancestors):
+            total += cumulative_us
+        ancestors.append((depth, matches(name)))
+    return total
+
+
+def summarize(samples):
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+    }
+
+
+def run_tls_benchmarks(runs=DEFAULT_RUNS):
+    """Time creating a TLS context, and getting the shared one, in ms."""
+    sys.path.insert(0, ROOT_DIR)
+    from httpie.tls import create_ssl_context, get_ssl_context
+
+    def measure(func):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func(verify=True, cert=None)
+            samples.append((time.perf_counter() - start) * 1000)
+        return summarize(samples)
+
+    return {
+        'context-create': measure(create_ssl_context),
+        'context-shared': measure(get_ssl_context),
+    }
+
+
+def run_benchmarks(runs=DEFAULT_RUNS):
+    """Run all the benchmarks and return the results dict."""
+    server = start_stub_server()
+    url = 'http://127.0.0.1:%d/' % server.server_address[1]
+    config_dir = tempfile.mkdtemp(prefix='httpie-bench-')
+    env = get_env(config_dir)
+    try:
+        wall = {}
+        imports = {}
+        for name, args in get_scenarios(url):
+            # Warm up: bytecode compilation, plugin index, color depth cache.
+            run_http(args, env)
+            samples = [run_http(args, env)[0] * 1000 for _ in range(runs)]
+            wall[name] = summarize(samples)
+
+            module_samples = {module: [] for module in IMPORT_MODULES}
+            for _ in range(runs):
+                entries = parse_importtime(
+                    run_http(args, env, importtime=True)[1])
+                for module in IMPORT_MODULES:
+                    module_samples[module].append(
+                        get_import_time(entries, module) / 1000)
+            imports[name] = {
+                module: summarize(samples)
+                for module, samples in module_samples.items()
+            }
+    finally:
+        server.shutdown()
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    return {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': runs,
+        'wall_ms': wall,
+        'import_ms': imports,
+        'tls_ms': run_tls_benchmarks(runs=runs),
+    }
+
+
+def iter_timings(results):
+    """Yield `(key, median_ms)` for every timing in `results`."""
+    for scenario, summary in sorted(results['wall_ms'].items()):
+        yield 'wall:%s' % scenario, summary['median']
+    for scenario, modules in sorted(results['import_ms'].items()):
+        for module, summary in sorted(modules.items()):
+            yield 'import:%s:%s' % (scenario, module), summary['median']
+    for name, summary in sorted(results.get('tls_ms', {}).items()):
+        yield 'tls:%s' % name, summary['median']
+
+
+def get_tolerance(key, tolerances, default):
+    """
+    Return the tolerance for `key`, e.g., "import:help:pygments".
+
+    `tolerances` may contain any `:`-separated part of the key, and the
+    most specific match wins, e.g., "pygments" or "import:help:pygments".
+
+    """
+    parts = key.split(':')
+    best = default, -1
+    for pattern, tolerance in tolerances.items():
+        pattern_parts = pattern.split(':')
+        if all(part in parts for part in pattern_parts):
+            if len(pattern_parts) > best[1]:
+                best = tolerance, len(pattern_parts)
+    return best[0]
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE,
+            min_delta=DEFAULT_MIN_DELTA_MS, tolerances=None):
+    """
+    Compare `results` against `baseline`.
+
+    Return a list of `(key, baseline_ms, current_ms, regressed)`.
+
+    """
+    tolerances = tolerances or {}
+    baseline_timings = dict(iter_timings(baseline))
+    rows = []
+    for key, current in iter_timings(results):
+        if key not in baseline_timings:
+            continue
+        previous = baseline_timings[key]
+        allowed = get_tolerance(key, tolerances, tolerance)
+        regressed = (current - previous > min_delta
+                     and current > previous * (1 + allowed))
+        rows.append((key, previous, current, regressed))
+    return rows
+
+
+def format_results(results):
+    lines = ['Wall time (ms, median of %d runs):' % results['runs']]
+    for scenario, summary in results['wall_ms'].items():
+        lines.append('  %-24s %8.1f' % (scenario, summary['median']))
+    lines.append('Cumulative import time (ms, median):')
+    lines.append('  %-24s %s' % ('', ''.join(
+        '%16s' % module for module in IMPORT_MODULES)))
+    for scenario, modules in results['import_ms'].items():
+        lines.append('  %-24s %s' % (scenario, ''.join(
+            '%16.1f' % modules[module]['median']
+            for module in IMPORT_MODULES)))
+    if 'tls_ms' in results:
+        lines.append('TLS context (ms, median):')
+        for name, summary in results['tls_ms'].items():
+            lines.append('  %-24s %8.1f' % (name, summary['median']))
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    lines = ['%-44s %10s %10s %8s' % ('', 'baseline', 'current', 'change')]
+    for key, previous, current, regressed in rows:
+        change = ((current - previous) / previous * 100) if previous else 0
+        lines.append('%-44s %10.1f %10.1f %+7.0f%%%s' % (
+            key, previous, current, change,
+            '  REGRESSION' if regressed else ''))
+    return '\n'.join(lines)
+
+
+def tolerance_arg(value):
+    """Parse a ``[KEY=]FRACTION`` tolerance."""
+    key, sep, fraction = value.rpartition('=')
+    try:
+        return key, float(fraction)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'invalid tolerance: %r' % value)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the start-up time of HTTPie.')
+    parser.add_argument(
+        '--runs', type=int, default=DEFAULT_RUNS,
+        help='number of runs of each benchmark (default: %(default)s)')
+    parser.add_argument(
+        '--output', metavar='FILE',
+        help='write the results as JSON to FILE')
+    parser.add_argument(
+        '--results', metavar='FILE',
+        help='use previously saved results instead of running benchmarks')
+    parser.add_argument(
+        '--baseline', metavar='FILE', default=DEFAULT_BASELINE,
+        help='the baseline results (default: benchmarks/baseline.json)')
+    parser.add_argument(
+        '--compare', action='store_true',
+        help='compare with the baseline and fail on regressions')
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help='save the results as the new baseline')
+    parser.add_argument(
+        '--tolerance', type=tolerance_arg, action='append', default=[],
+        metavar='[KEY=]FRACTION',
+        help='allowed relative slowdown, either overall or for a KEY such '
+             'as "pygments" or "wall:help" (default: %s)' % DEFAULT_TOLERANCE)
+    parser.add_argument(
+        '--min-delta', type=float, default=DEFAULT_MIN_DELTA_MS,
+        metavar='MS',
+        help='slowdowns smaller than this are never regressions '
+             '(default: %(default)s)')
+    args = parser.parse_args(args)
+
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        results = run_benchmarks(runs=args.runs)
+    print(format_results(results))
+
+    for path in filter(None, [
+            args.output, args.save_baseline and args.baseline]):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        tolerances = dict(args.tolerance)
+        tolerance = tolerances.pop('', DEFAULT_TOLERANCE)
+        rows = compare(results, baseline, tolerance=tolerance,
+                       min_delta=args.min_delta, tolerances=tolerances)
+        print()
+        print(format_comparison(rows))
+        if any(regressed for key, previous, current, regressed in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
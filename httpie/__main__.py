@@ -3,7 +3,19 @@
 
 """
 import sys
-from .core import main
+
+
+def main():
+    from httpie import daemon
+    if daemon.is_enabled():
+        from httpie.config import DEFAULT_CONFIG_DIR
+        exit_status = daemon.run_client(sys.argv[1:],
+                                        config_dir=DEFAULT_CONFIG_DIR)
+        if exit_status is not None:
+            return exit_status
+
+    from httpie.core import main
+    return main()
 
 
 if __name__ == '__main__':
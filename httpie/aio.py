@@ -0,0 +1,687 @@
+"""
+An HTTP/1.1 transport built on `asyncio` streams (``--engine=asyncio``).
+
+The I/O of all the connections happens on a single event loop running in
+a background thread; `AsyncioAdapter.send()` and the reads of the response
+body only wait for it. Idle connections are kept alive and reused.
+
+The responses are regular `urllib3.HTTPResponse` objects reading the body
+from the event loop, so that `requests` (content decoding, cookies,
+redirects) and the output processing work just like with the default
+`requests.adapters.HTTPAdapter`. Requests through a proxy are sent by
+the latter. Hostnames are resolved by the `httpie.resolver.Resolver`,
+if any, in the default executor of the event loop.
+
+"""
+import asyncio
+import http.client
+import io
+import socket
+import ssl
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import (RequestException, ConnectionError,
+                                 ConnectTimeout, ReadTimeout, SSLError,
+                                 InvalidURL)
+from requests.packages.urllib3 import HTTPResponse
+from requests.packages.urllib3._collections import HTTPHeaderDict
+from requests.packages.urllib3.exceptions import NewConnectionError
+from requests.utils import select_proxy
+
+from httpie.racing import CONNECTION_ATTEMPT_DELAY
+from httpie.retries import IDEMPOTENT_METHODS
+from httpie.timings import finish_hop, start_hop
+from httpie.tls import (DEFAULT_PROTOCOLS, connection_port, get_ssl_context,
+                        save_session)
+from httpie.uploads import FileBody
+
+
+DEFAULT_PORTS = {
+    'http': 80,
+    'https': 443,
+}
+
+# How much of the body is fetched from the event loop at once.
+READ_CHUNK_SIZE = 64 * 1024
+
+# Responses to these, and with these status codes, never have a body.
+NO_BODY_METHODS = frozenset(['HEAD'])
+NO_BODY_STATUSES = frozenset([204, 304])
+
+# The body framing of a response.
+FRAMING_NONE = 'none'
+FRAMING_LENGTH = 'length'
+FRAMING_CHUNKED = 'chunked'
+FRAMING_CLOSE = 'close'
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """Return the event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever,
+                                      name='httpie-asyncio')
+            thread.daemon = True
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def run(coroutine):
+    """Run `coroutine` on the event loop and wait for its result."""
+    future = asyncio.run_coroutine_threadsafe(coroutine, get_loop())
+    try:
+        return future.result()
+    except BaseException:
+        # E.g., a `KeyboardInterrupt` while waiting.
+        future.cancel()
+        raise
+
+
+def get_timeouts(timeout):
+    """Return `(connect_timeout, read_timeout)` for a `requests` timeout."""
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+async def open_connection(host, port, ssl_context, server_hostname,
+                          socket_options=None):
+    """
+    Like `asyncio.open_connection()`, setting `socket_options` (see
+    `httpie.transport.get_socket_options()`) before connecting.
+
+    Without `socket_options`, connections to the addresses of `host` are
+    raced by `asyncio` itself (see `httpie.racing`).
+
+    """
+    if socket_options is None:
+        return await asyncio.open_connection(
+            host, port, ssl=ssl_context, server_hostname=server_hostname,
+            happy_eyeballs_delay=CONNECTION_ATTEMPT_DELAY, interleave=1)
+    loop = asyncio.get_running_loop()
+    error = OSError('No addresses found for %s' % host)
+    for family, type_, proto, canonname, sockaddr in await loop.getaddrinfo(
+            host, port, type=socket.SOCK_STREAM):
+        sock = socket.socket(family, type_, proto)
+        try:
+            for option in socket_options:
+                sock.setsockopt(*option)
+            sock.setblocking(False)
+            await loop.sock_connect(sock, sockaddr)
+        except OSError as e:
+            sock.close()
+            error = e
+            continue
+        except BaseException:
+            sock.close()
+            raise
+        reader, writer = await asyncio.open_connection(
+            sock=sock, ssl=ssl_context, server_hostname=server_hostname)
+        # `asyncio` enables `TCP_NODELAY` on every TCP socket.
+        for option in socket_options:
+            writer.get_extra_info('socket').setsockopt(*option)
+        return reader, writer
+    raise error
+
+
+def encode_header(value):
+    # Like `http.client`: `str` is Latin-1, `bytes` is sent as it is.
+    return value if isinstance(value, bytes) else value.encode('latin-1')
+
+
+def get_request_head(request, url):
+    """Return the request line and headers of `request` as `bytes`."""
+    headers = list(request.headers.items())
+    if 'Host' not in request.headers:
+        headers.insert(0, ('Host', url.netloc.rsplit('@', 1)[-1]))
+    lines = [encode_header('%s %s HTTP/1.1' % (request.method,
+                                               request.path_url))]
+    lines.extend(encode_header(name) + b': ' + encode_header(value)
+                 for name, value in headers)
+    return b'\r\n'.join(lines) + b'\r\n\r\n'
+
+
+def iter_request_body(body, chunked):
+    """Yield the chunks of a streamed (file or iterator) request `body`."""
+    if hasattr(body, 'read'):
+        read = body.read
+        body = iter(lambda: read(READ_CHUNK_SIZE), b'')
+    for chunk in body:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf8')
+        if not chunk:
+            continue
+        if chunked:
+            chunk = b'%x\r\n%s\r\n' % (len(chunk), chunk)
+        yield chunk
+    if chunked:
+        yield b'0\r\n\r\n'
+
+
+def parse_status_line(line):
+    """Return `(version, status, reason)`, e.g., `(11, 200, 'OK')`."""
+    try:
+        version, status, *reason = line.decode('iso-8859-1').split(None, 2)
+        version = {'HTTP/1.0': 10, 'HTTP/1.1': 11}[version]
+        status = int(status)
+    except (KeyError, ValueError):
+        raise http.client.BadStatusLine(repr(line))
+    return version, status, reason[0].strip() if reason else ''
+
+
+def get_framing(method, version, status, msg):
+    """Return `(framing, content_length)` of a response body."""
+    if (method in NO_BODY_METHODS or status in NO_BODY_STATUSES
+            or 100 <= status < 200):
+        return FRAMING_NONE, 0
+    if 'chunked' in msg.get('Transfer-Encoding', '').lower():
+        return FRAMING_CHUNKED, None
+    length = msg.get('Content-Length')
+    if length is not None:
+        try:
+            length = int(length.split(',')[0])
+        except ValueError:
+            raise http.client.HTTPException(
+                'Invalid Content-Length: %r' % length)
+        return (FRAMING_LENGTH, length) if length else (FRAMING_NONE, 0)
+    return FRAMING_CLOSE, None
+
+
+def is_keep_alive(version, msg):
+    tokens = {token.strip().lower()
+              for token in msg.get('Connection', '').split(',')}
+    if version == 11:
+        return 'close' not in tokens
+    return 'keep-alive' in tokens
+
+
+class ResponseHead(object):
+    """
+    The parts of `http.client.HTTPResponse` that `requests` and HTTPie use
+    (as `urllib3.HTTPResponse._original_response`).
+
+    """
+
+    def __init__(self, version, status, reason, msg):
+        self.version = version
+        self.status = status
+        self.reason = reason
+        self.msg = msg
+        # Whether the response has no body (left) to read.
+        self.complete = False
+        self.body = None
+        # The `ssl.SSLObject` of an HTTPS connection.
+        self.ssl_object = None
+
+    def isclosed(self):
+        return self.body.isclosed()
+
+    def close(self):
+        self.body.close()
+
+
+class Connection(object):
+    """A connection used by one exchange at a time.
+
+    All its methods but `close_threadsafe()` run on the event loop.
+
+    """
+
+    def __init__(self, pool, key, reader, writer):
+        self.pool = pool
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+        # The `ConnectionPool` limit held while the connection is in use.
+        self.limit = None
+        self.read_timeout = None
+        self.framing = FRAMING_NONE
+        self.remaining = 0
+        self.keep_alive = False
+
+    @property
+    def is_usable(self):
+        return not (self.reader.at_eof() or self.writer.is_closing())
+
+    async def write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def sendfile(self, file, offset, count):
+        """Send `count` bytes of `file` from `offset` (see `FileBody`)."""
+        await asyncio.get_running_loop().sendfile(
+            self.writer.transport, file, offset, count)
+
+    async def read_head(self, request, read_timeout):
+        """Read the response status line and headers.
+
+        Return a `ResponseHead`, and prepare for reading the body.
+
+        """
+        try:
+            while True:
+                line = await self._readline(read_timeout)
+                if not line:
+                    raise http.client.RemoteDisconnected(
+                        'Remote end closed connection without response')
+                version, status, reason = parse_status_line(line)
+                header_lines = []
+                while True:
+                    line = await self._readline(read_timeout)
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    header_lines.append(line)
+                # Skip informational responses, e.g., `100 Continue`.
+                if not 100 <= status < 200 or status == 101:
+                    break
+        except asyncio.TimeoutError as e:
+            raise ReadTimeout(e, request=request)
+
+        msg = http.client.parse_headers(io.BytesIO(b''.join(header_lines)))
+        self.framing, self.remaining = get_framing(
+            request.method, version, status, msg)
+        self.keep_alive = (self.framing != FRAMING_CLOSE
+                           and is_keep_alive(version, msg))
+        self.read_timeout = read_timeout
+        head = ResponseHead(version, status, reason, msg)
+        head.ssl_object = self.writer.get_extra_info('ssl_object')
+        if self.framing == FRAMING_NONE:
+            head.complete = True
+            self.finish()
+        return head
+
+    async def read_body(self, size):
+        """Return `(data, complete)` with up to `size` bytes of the body.
+
+        Once complete, the connection is released and must not be used
+        by the caller anymore.
+
+        """
+        try:
+            try:
+                if self.framing == FRAMING_LENGTH:
+                    data = await self._read(min(size, self.remaining))
+                    self.remaining -= len(data)
+                    if not data and self.remaining:
+                        raise http.client.IncompleteRead(b'', self.remaining)
+                elif self.framing == FRAMING_CHUNKED:
+                    data = await self._read_chunked(size)
+                elif self.framing == FRAMING_CLOSE:
+                    data = await self._read(size)
+                else:
+                    data = b''
+            except asyncio.TimeoutError:
+                # `urllib3` turns it into a `ReadTimeoutError`.
+                raise socket.timeout('Read timed out.')
+        except BaseException:
+            self.close()
+            raise
+        complete = not data or (self.framing == FRAMING_LENGTH
+                                and not self.remaining)
+        if complete:
+            self.finish()
+        return data, complete
+
+    async def _read_chunked(self, size):
+        if not self.remaining:
+            line = await self._readline(self.read_timeout)
+            try:
+                self.remaining = int(line.split(b';', 1)[0], 16)
+            except ValueError:
+                raise http.client.IncompleteRead(line)
+            if not self.remaining:
+                # The last chunk; skip the trailers.
+                while line not in (b'\r\n', b'\n', b''):
+                    line = await self._readline(self.read_timeout)
+                self.framing = FRAMING_NONE
+                return b''
+        data = await self._read(min(size, self.remaining))
+        if not data:
+            raise http.client.IncompleteRead(b'', self.remaining)
+        self.remaining -= len(data)
+        if not self.remaining:
+            # The CRLF after the chunk data.
+            await self._readline(self.read_timeout)
+        return data
+
+    async def _read(self, size):
+        return await asyncio.wait_for(self.reader.read(size),
+                                      self.read_timeout)
+
+    async def _readline(self, timeout):
+        try:
+            return await asyncio.wait_for(self.reader.readline(), timeout)
+        except ValueError:
+            raise http.client.LineTooLong('header line')
+
+    def finish(self):
+        """Release the connection after the whole body has been read."""
+        if self.keep_alive and self.is_usable:
+            self.pool.put(self)
+        else:
+            self.close()
+
+    def release_limit(self):
+        if self.limit is not None:
+            self.limit.release()
+            self.limit = None
+
+    def close(self):
+        self.release_limit()
+        ssl_object = self.writer.get_extra_info('ssl_object')
+        if ssl_object is not None:
+            save_session(ssl_object)
+        self.writer.close()
+
+    def close_threadsafe(self):
+        get_loop().call_soon_threadsafe(self.close)
+
+
+class ConnectionPool(object):
+    """Idle keep-alive connections by `(scheme, host, port, TLS options)`.
+
+    Up to `maxsize` idle connections are kept for each key. With `block`,
+    no more than `maxsize` connections to a key are in use at the same time,
+    like with a blocking `urllib3` pool.
+
+    Only used on the event loop, except for `configure()`.
+
+    """
+
+    def __init__(self, maxsize, block=False, resolver=None,
+                 socket_options=None):
+        self.idle = defaultdict(list)
+        self.resolver = resolver
+        self.socket_options = socket_options
+        self.num_connections = 0
+        self.num_requests = 0
+        self.configure(maxsize, block)
+
+    def configure(self, maxsize, block):
+        self.maxsize = maxsize
+        self.block = block
+        # Semaphores by key. Connections in use keep releasing their
+        # old ones.
+        self.limits = {}
+
+    async def get(self, request, key, ssl_context, connect_timeout):
+        """Return an idle connection to `key`, or a new one."""
+        limit = None
+        if self.block:
+            limit = self.limits.get(key)
+            if limit is None:
+                limit = self.limits[key] = asyncio.Semaphore(self.maxsize)
+            await limit.acquire()
+        try:
+            connection = await self._get(request, key, ssl_context,
+                                         connect_timeout)
+        except BaseException:
+            if limit is not None:
+                limit.release()
+            raise
+        connection.limit = limit
+        return connection
+
+    async def _get(self, request, key, ssl_context, connect_timeout):
+        self.num_requests += 1
+        idle = self.idle.get(key)
+        while idle:
+            connection = idle.pop()
+            if connection.is_usable:
+                connection.reused = True
+                return connection
+            connection.close()
+
+        reader, writer = await self.connect(request, key, ssl_context,
+                                            connect_timeout)
+        return Connection(self, key, reader, writer)
+
+    async def connect(self, request, key, ssl_context, connect_timeout):
+        """Open a new connection to `key`; return `(reader, writer)`."""
+        scheme, host, port = key[:3]
+        addresses = [host]
+        if self.resolver is not None:
+            try:
+                addresses = await asyncio.get_running_loop().run_in_executor(
+                    None, self.resolver.resolve, host, port)
+            except OSError as e:
+                raise ConnectionError(NewConnectionError(
+                    None, 'Failed to resolve %r (%s)' % (host, e)),
+                    request=request)
+
+        # For the session cache of `ssl_context`.
+        connection_port.set(port)
+        for address in addresses:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    open_connection(
+                        address, port, ssl_context,
+                        server_hostname=host if ssl_context else None,
+                        socket_options=self.socket_options),
+                    connect_timeout,
+                )
+                break
+            except asyncio.TimeoutError as e:
+                raise ConnectTimeout(e, request=request)
+            except ssl.SSLError as e:
+                raise SSLError(e, request=request)
+            except OSError as e:
+                error = e
+        else:
+            raise ConnectionError(NewConnectionError(
+                None, 'Failed to establish a new connection: %s' % error),
+                request=request)
+        self.num_connections += 1
+        return reader, writer
+
+    def put(self, connection):
+        connection.release_limit()
+        connection.reused = False
+        idle = self.idle[connection.key]
+        if len(idle) < self.maxsize:
+            idle.append(connection)
+        else:
+            connection.close()
+
+    async def exchange(self, request, key, ssl_context, timeout, data):
+        """
+        Send the whole request `data`, and return `(connection, head)`.
+
+        An idempotent request on a reused connection that the server has
+        closed meanwhile is retried on a new connection.
+
+        """
+        connect_timeout, read_timeout = get_timeouts(timeout)
+        while True:
+            connection = await self.get(request, key, ssl_context,
+                                        connect_timeout)
+            try:
+                await connection.write(data)
+                return connection, await connection.read_head(
+                    request, read_timeout)
+            except RequestException:
+                connection.close()
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                if connection.reused and request.method in IDEMPOTENT_METHODS:
+                    continue
+                raise ConnectionError(e, request=request)
+            except BaseException:
+                connection.close()
+                raise
+
+
+class ResponseBody(object):
+    """The body of a response, read from the event loop.
+
+    Used as the `fp` of `urllib3.HTTPResponse`. It fetches up to
+    `READ_CHUNK_SIZE` bytes from the event loop at once, so that even
+    reading it byte by byte is cheap.
+
+    """
+
+    def __init__(self, connection, complete=False):
+        self.connection = connection
+        self._buffer = b''
+        self._offset = 0
+        self._eof = complete
+        self._closed = False
+
+    def read(self, amt=None):
+        if amt is None:
+            chunks = [self._buffer[self._offset:]]
+            self._buffer, self._offset = b'', 0
+            while not self._eof:
+                chunks.append(self._fetch())
+            return b''.join(chunks)
+        while self._offset == len(self._buffer) and not self._eof:
+            self._buffer, self._offset = self._fetch(), 0
+        data = self._buffer[self._offset:self._offset + amt]
+        self._offset += len(data)
+        return data
+
+    def _fetch(self):
+        if self._closed:
+            self._eof = True
+            return b''
+        data, self._eof = run(self.connection.read_body(READ_CHUNK_SIZE))
+        return data
+
+    def isclosed(self):
+        return self._closed or (
+            self._eof and self._offset == len(self._buffer))
+
+    @property
+    def closed(self):
+        return self.isclosed()
+
+    def close(self):
+        if not self._eof:
+            # The connection is in the middle of a response.
+            self.connection.close_threadsafe()
+        self._eof = self._closed = True
+
+
+class AsyncioAdapter(HTTPAdapter):
+    """A transport adapter sending HTTP/1.1 requests through `asyncio`."""
+
+    pool = None
+    pool_class = ConnectionPool
+
+    def __init__(self, resolver=None, socket_options=None, *args, **kwargs):
+        self.resolver = resolver
+        self.socket_options = socket_options
+        super(AsyncioAdapter, self).__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        # Also called by `httpie.client.configure_pools()`.
+        super(AsyncioAdapter, self).init_poolmanager(
+            connections, maxsize, block=block, **pool_kwargs)
+        if self.pool is None:
+            self.pool = self.pool_class(maxsize=maxsize, block=block,
+                                        resolver=self.resolver,
+                                        socket_options=self.socket_options)
+        else:
+            self.pool.configure(maxsize=maxsize, block=block)
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        start_hop(request)
+        if select_proxy(request.url, proxies):
+            return finish_hop(super(AsyncioAdapter, self).send(
+                request, stream=stream, timeout=timeout, verify=verify,
+                cert=cert, proxies=proxies))
+
+        url = urlsplit(request.url)
+        scheme = url.scheme.lower()
+        try:
+            port = url.port or DEFAULT_PORTS[scheme]
+        except (KeyError, ValueError) as e:
+            raise InvalidURL(e, request=request)
+        if not url.hostname:
+            raise InvalidURL('Invalid URL %r: No host supplied'
+                             % request.url, request=request)
+        key = scheme, url.hostname, port
+        if scheme == 'https':
+            key += (verify, cert)
+        connection, response_head = self.exchange(request, url, key, timeout)
+        response_head.body = ResponseBody(connection,
+                                          complete=response_head.complete)
+        response = HTTPResponse(
+            body=response_head.body,
+            headers=HTTPHeaderDict(response_head.msg.items()),
+            status=response_head.status,
+            version=response_head.version,
+            reason=response_head.reason,
+            preload_content=False,
+            decode_content=False,
+            original_response=response_head,
+            request_method=request.method,
+        )
+        return finish_hop(self.build_response(request, response))
+
+    def get_ssl_context(self, request, key, protocols=DEFAULT_PROTOCOLS):
+        """Return the `ssl.SSLContext` for `key`, or `None` for HTTP."""
+        if key[0] != 'https':
+            return None
+        try:
+            return get_ssl_context(*key[3:], protocols=protocols)
+        except (OSError, ssl.SSLError) as e:
+            raise SSLError(e, request=request)
+
+    def exchange(self, request, url, key, timeout):
+        """
+        Send `request` over a connection to `key`; return the connection
+        (or anything with the same `read_body()` and `close_threadsafe()`)
+        and the `ResponseHead`.
+
+        """
+        ssl_context = self.get_ssl_context(request, key)
+        head = get_request_head(request, url)
+        body = request.body
+        if body is None or isinstance(body, (bytes, str)):
+            if isinstance(body, str):
+                body = body.encode('iso-8859-1')
+            return run(self.pool.exchange(
+                request, key, ssl_context, timeout, head + (body or b'')))
+        return self._send_streamed(
+            request, key, ssl_context, timeout, head, body)
+
+    def _send_streamed(self, request, key, ssl_context, timeout, head, body):
+        """Send a file or iterator `body` without reading it all first."""
+        connect_timeout, read_timeout = get_timeouts(timeout)
+        chunked = 'chunked' in request.headers.get(
+            'Transfer-Encoding', '').lower()
+        connection = run(self.pool.get(request, key, ssl_context,
+                                       connect_timeout))
+        try:
+            run(connection.write(head))
+            if isinstance(body, FileBody) and not chunked:
+                run(connection.sendfile(*body.get_sendfile_args()))
+            else:
+                for chunk in iter_request_body(body, chunked=chunked):
+                    run(connection.write(chunk))
+            return connection, run(connection.read_head(request,
+                                                        read_timeout))
+        except RequestException:
+            connection.close_threadsafe()
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            connection.close_threadsafe()
+            raise ConnectionError(e, request=request)
+        except BaseException:
+            connection.close_threadsafe()
+            raise
@@ -0,0 +1,484 @@
+"""
+Batch mode: run many requests from a JSON Lines file in a single process.
+
+    $ http --batch requests.jsonl
+    $ http --verbose --batch requests.jsonl
+
+Each line of the file is a JSON object describing one request::
+
+    {"method": "POST", "url": "example.org/items",
+     "headers": {"X-API-Token": "123"}, "data": {"name": "foo", "qty": 2},
+     "params": {"dry-run": "1"}, "auth": "user:password",
+     "auth_type": "basic", "session": "user1",
+     "items": ["tag=a"], "options": ["--form"]}
+
+Only ``url`` is required. ``items`` are request items just like on the
+command line, and ``options`` are additional command line options for that
+request. The command line options given along with ``--batch`` apply
+to every request.
+
+All requests share the same connection pools, so connections are kept
+alive and reused. Each request still only sees the cookies of its own
+``session`` (if any), like when running ``http`` for each of them.
+
+With ``--parallel N``, up to N requests run at the same time in threads.
+The output of each exchange is buffered and written at once, in the order
+of the file (or as each one completes, with ``--unordered``), and
+``--parallel-per-host`` caps the number of connections to each host.
+``--pipeline K`` pipelines up to K requests to the same host on one
+connection instead (see `httpie.pipeline`).
+
+"""
+import io
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+from requests.cookies import RequestsCookieJar
+
+from httpie import ExitStatus
+from httpie.compat import str
+from httpie.input import (SEP_HEADERS, SEP_QUERY, SEP_DATA,
+                          SEP_DATA_RAW_JSON, positive_int_arg)
+
+
+# Written between the output of consecutive exchanges.
+EXCHANGE_SEPARATOR = b'\n\n'
+
+LINE_KEYS = frozenset([
+    'method', 'url', 'headers', 'params', 'data', 'items', 'auth',
+    'auth_type', 'session', 'options',
+])
+
+
+class BatchLineError(ValueError):
+    pass
+
+
+def escape(key, separators=(SEP_HEADERS, SEP_DATA)):
+    """Escape the characters in `key` that would be taken for separators.
+
+    ``=`` and ``:`` are all that's needed to escape every item separator.
+
+    """
+    key = key.replace('\\', '\\\\')
+    for separator in separators:
+        key = key.replace(separator, '\\' + separator)
+    return key
+
+
+def get_line_args(line):
+    """Translate a parsed batch `line` into command line arguments."""
+    if not isinstance(line, dict):
+        raise BatchLineError('a JSON object expected')
+    unknown = set(line) - LINE_KEYS
+    if unknown:
+        raise BatchLineError(f"unknown keys: {', '.join(sorted(unknown))}")
+    if not isinstance(line.get('url'), str) or not line['url']:
+        raise BatchLineError('"url" is required')
+
+    args = list(line.get('options') or [])
+    if line.get('auth') is not None:
+        args.append('--auth=' + line['auth'])
+    if line.get('auth_type') is not None:
+        args.append('--auth-type=' + line['auth_type'])
+    if line.get('session') is not None:
+        args.append('--session=' + line['session'])
+
+    if line.get('method'):
+        args.append(line['method'])
+    args.append(line['url'])
+
+    for name, value in (line.get('headers') or {}).items():
+        args.append(escape(name) + SEP_HEADERS + str(value))
+    for name, value in (line.get('params') or {}).items():
+        args.append(escape(name) + SEP_QUERY + str(value))
+    for name, value in (line.get('data') or {}).items():
+        if isinstance(value, str):
+            args.append(escape(name) + SEP_DATA + value)
+        else:
+            args.append(escape(name) + SEP_DATA_RAW_JSON + json.dumps(value))
+    args.extend(line.get('items') or [])
+
+    if not all(isinstance(arg, str) for arg in args):
+        raise BatchLineError('"options", "items", and the values of '
+                             '"auth", "auth_type" and "session" must be '
+                             'strings')
+    return args
+
+
+def iter_lines(batch_file, env):
+    """Yield `(line_number, line)` for each non-blank line of the file."""
+    if batch_file == '-':
+        f = io.TextIOWrapper(getattr(env.stdin, 'buffer', env.stdin),
+                             encoding='utf8')
+    else:
+        f = open(batch_file, encoding='utf8')
+    with f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                yield line_number, line
+
+
+def write_separator(env):
+    outfile = env.stdout
+    getattr(outfile, 'buffer', outfile).write(EXCHANGE_SEPARATOR)
+
+
+def write_exchange(env, output):
+    outfile = env.stdout
+    getattr(outfile, 'buffer', outfile).write(output)
+    outfile.flush()
+
+
+def add_batch_arguments(parser):
+    """
+    Add the ``--batch`` options to `parser` (or an argument group): to
+    `httpie.cli.parser`, for ``--help``, and to the `httpie.input.ModeParser`
+    that parses them (see `httpie.core.get_mode_parser()`).
+
+    """
+    parser.add_argument(
+        '--batch',
+        metavar='FILE',
+        help="""
+        Run all the requests described in FILE, a JSON Lines file, in a single
+        process and over shared connections. Use "-" to read it from stdin.
+        Each line is a JSON object like:
+
+            {"method": "POST", "url": "example.org", "headers": {"X-A": "b"},
+             "params": {"q": "a"}, "data": {"name": "foo"}, "items": ["c=d"],
+             "auth": "user:pass", "auth_type": "basic", "session": "name",
+             "options": ["--form"]}
+
+        where only "url" is required. Other options given on the command line
+        apply to every request. With --debug, an estimate of the time saved
+        over running http for each request is reported.
+
+        """
+    )
+    parser.add_argument(
+        '--parallel',
+        type=positive_int_arg,
+        default=1,
+        metavar='N',
+        help="""
+        With --batch, run up to N requests at the same time. The output of each
+        exchange is still written at once, in the order of the batch file.
+        Requests with the same "session" run one after another.
+
+        """
+    )
+    parser.add_argument(
+        '--parallel-per-host',
+        type=positive_int_arg,
+        default=None,
+        metavar='N',
+        help="""
+        With --parallel, open no more than N connections to the same host
+        at the same time (by default, as many as --parallel).
+
+        """
+    )
+    parser.add_argument(
+        '--unordered',
+        default=False,
+        action='store_true',
+        help="""
+        With --parallel, write the output of each exchange as soon as it
+        completes, rather than in the order of the batch file.
+
+        """
+    )
+    parser.add_argument(
+        '--pipeline',
+        type=positive_int_arg,
+        default=1,
+        metavar='K',
+        help="""
+        With --batch, write up to K consecutive GET and HEAD requests to the
+        same host on one connection without waiting for the responses (HTTP/1.1
+        pipelining), and read the responses in order. Requests are sent one by
+        one again if the server closes the connection or misbehaves.
+
+        """
+    )
+
+
+def run_batch(mode_args, args, env, error, traceback):
+    """Run all the requests from the ``--batch`` file.
+
+    `mode_args` are the parsed ``--batch`` options, and `args` the other
+    command line arguments (see `httpie.core.get_mode_parser()`).
+    Return the exit status of the first request that failed, if any.
+
+    """
+    # Imported here to avoid a circular import.
+    from httpie.client import get_connection_stats
+
+    start_cpu_time = time.process_time()
+    start_time = time.time()
+    start_stats = get_connection_stats()
+
+    batch_file = mode_args.batch
+    try:
+        lines = list(iter_lines(batch_file, env))
+    except (IOError, OSError) as e:
+        error('Cannot read batch file: %s', e)
+        return ExitStatus.ERROR
+
+    # The batch file itself might be read from stdin.
+    args = args + ['--ignore-stdin']
+    requests = []
+    statuses = []
+    for line_number, line in lines:
+        try:
+            line = json.loads(line)
+            line_args = get_line_args(line)
+        except ValueError as e:
+            error('%s:%d: invalid batch line: %s', batch_file, line_number, e)
+            statuses.append(ExitStatus.ERROR)
+        else:
+            requests.append((line, args + line_args))
+            statuses.append(None)
+
+    if mode_args.parallel > 1:
+        request_statuses = run_parallel(
+            requests, env=env, error=error, traceback=traceback,
+            parallel=mode_args.parallel,
+            parallel_per_host=mode_args.parallel_per_host,
+            unordered=mode_args.unordered,
+        )
+    else:
+        request_statuses = run_sequential(
+            requests, env=env, error=error, traceback=traceback,
+            pipeline=mode_args.pipeline)
+
+    request_statuses = iter(request_statuses)
+    statuses = [next(request_statuses) if status is None else status
+                for status in statuses]
+
+    if '--debug' in args:
+        print_batch_stats(
+            env=env,
+            count=len(requests),
+            elapsed=time.time() - start_time,
+            startup_cpu_time=start_cpu_time,
+            connections=get_connection_stats()[0] - start_stats[0],
+        )
+    return next((status for status in statuses if status != ExitStatus.OK),
+                ExitStatus.OK)
+
+
+def run_sequential(requests, env, error, traceback, pipeline=1):
+    """Run `requests` one by one, streaming their output to ``env.stdout``.
+
+    With `pipeline` > 1, runs of up to `pipeline` consecutive requests that
+    can be pipelined to the same origin are (see `httpie.pipeline`).
+
+    Return their exit statuses.
+
+    """
+    from httpie.client import get_requests_session
+    from httpie.core import run
+
+    requests_session = get_requests_session()
+    pipelines = {}
+    parsed = {}
+    pipelined = None
+    window_end = 0
+    statuses = []
+    try:
+        for i, (line, args) in enumerate(requests):
+            if i:
+                write_separator(env)
+            requests_session.cookies = RequestsCookieJar()
+            if pipeline > 1 and i >= window_end:
+                pipelined, window_end = start_pipeline(
+                    requests, i, pipeline, requests_session, pipelines, env,
+                    parsed)
+            if i in parsed:
+                # Already parsed by `start_pipeline()`.
+                parsed_args, request_env = parsed.pop(i)
+            else:
+                # The arg parser modifies the `env` (e.g., for `--output`).
+                parsed_args, request_env = None, env.copy()
+            statuses.append(run(
+                args=args,
+                env=request_env,
+                error=error,
+                traceback=traceback,
+                requests_session=requests_session,
+                parsed_args=parsed_args,
+            ))
+            if pipelined is not None and i == window_end - 1:
+                pipelined.finish()
+                del requests_session.adapters[pipelined.origin]
+                pipelined = None
+    finally:
+        for adapter in pipelines.values():
+            adapter.close()
+    return statuses
+
+
+def parse_request_args(args, env):
+    """
+    Parse the `args` of a batch request, as `httpie.core.run()` would.
+
+    Return `(parsed_args, request_env)`: the parsed args, or the exception
+    raised by the parser, and the copy of `env` they were parsed with (and
+    that the parser may have modified), for running the request.
+
+    """
+    from httpie.core import parse_args
+
+    request_env = env.copy()
+    try:
+        parsed_args = parse_args(args=args, env=request_env)
+    except (Exception, SystemExit) as e:
+        parsed_args = e
+    return parsed_args, request_env
+
+
+def start_pipeline(requests, start, depth, requests_session, pipelines, env,
+                   parsed):
+    """
+    Pipeline the run of up to `depth` requests from `requests[start]` that
+    can be pipelined to the same origin, if there are two or more.
+
+    Return `(adapter, end)`: the `httpie.pipeline.PipelineAdapter` mounted
+    on `requests_session` (or `None`) and the index of the request after
+    the run. `pipelines` has the adapters by origin. The requests that are
+    parsed are added to `parsed` (see `parse_request_args()`) by index, so
+    that they aren't parsed again when they're run.
+
+    """
+    from httpie.client import get_adapter, get_adapter_kwargs
+    from httpie.pipeline import PipelineAdapter, get_pipeline_request
+
+    key = None
+    prepared_requests = []
+    for i in range(start, min(start + depth, len(requests))):
+        if i not in parsed:
+            parsed[i] = parse_request_args(requests[i][1], env)
+        parsed_args = parsed[i][0]
+        if isinstance(parsed_args, BaseException):
+            # Reported when the request is run.
+            break
+        try:
+            pipeline_request = get_pipeline_request(
+                requests_session, parsed_args, env.config.directory)
+        except Exception:
+            # Reported when the request is run.
+            pipeline_request = None
+        if (pipeline_request is None
+                or key is not None and pipeline_request[0] != key):
+            break
+        key = pipeline_request[0]
+        if not prepared_requests:
+            fallback_kwargs = get_adapter_kwargs(parsed_args,
+                                                 env.config.directory)
+        prepared_requests.append(pipeline_request[1])
+
+    if len(prepared_requests) < 2:
+        return None, start + 1
+    adapter = pipelines.get(key)
+    if adapter is None:
+        adapter = pipelines[key] = PipelineAdapter(
+            key, fallback=get_adapter(**fallback_kwargs))
+    if not adapter.pipeline(prepared_requests):
+        return None, start + len(prepared_requests)
+    requests_session.mount(adapter.origin, adapter)
+    return adapter, start + len(prepared_requests)
+
+
+def run_parallel(requests, env, error, traceback, parallel,
+                 parallel_per_host=None, unordered=False):
+    """
+    Run `requests` in `parallel` threads, buffering the output of each
+    exchange and writing it to ``env.stdout`` in the order of `requests`
+    (or as each one completes, when `unordered`).
+
+    Return their exit statuses.
+
+    """
+    from httpie.client import configure_pools
+
+    # The pool of each host only opens `parallel_per_host` connections;
+    # the other requests to the host wait for one of them to be released.
+    pool_options = configure_pools(
+        maxsize=min(parallel_per_host or parallel, parallel),
+        block=parallel_per_host is not None,
+    )
+    try:
+        return _run_parallel(requests, env=env, error=error,
+                             traceback=traceback, parallel=parallel,
+                             unordered=unordered)
+    finally:
+        configure_pools(**pool_options)
+
+
+def _run_parallel(requests, env, error, traceback, parallel, unordered):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from httpie.core import run
+
+    session_locks = {line['session']: threading.Lock()
+                     for line, args in requests if line.get('session')}
+
+    def run_exchange(line, args):
+        stdout = io.BytesIO()
+        # Requests sharing a session file must see each other's changes.
+        with session_locks.get(line.get('session'), nullcontext()):
+            status = run(
+                args=args,
+                # Buffered, so that parallel exchanges don't interleave.
+                env=env.copy(stdout=stdout, colors=env.colors),
+                error=error,
+                traceback=traceback,
+            )
+        return status, stdout.getvalue()
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [executor.submit(run_exchange, line, args)
+                   for line, args in requests]
+        statuses = {}
+        try:
+            for future in (as_completed(futures) if unordered else futures):
+                status, output = future.result()
+                if statuses:
+                    write_separator(env)
+                write_exchange(env, output)
+                statuses[future] = status
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            if traceback:
+                raise
+            env.stderr.write('\n')
+            return [statuses.get(future, ExitStatus.ERROR)
+                    for future in futures]
+    return [statuses[future] for future in futures]
+
+
+def print_batch_stats(env, count, elapsed, startup_cpu_time, connections):
+    """
+    Report how long the batch took, and an estimate of how long running
+    ``http`` for each request would have taken.
+
+    The time of a separate invocation is estimated as the CPU time spent
+    by this process before the batch started (interpreter start-up, imports,
+    plugins, config) plus the time the request took in the batch.
+
+    """
+    estimate = count * startup_cpu_time + elapsed
+    env.stderr.write(
+        '\n>>> Batch: %d requests in %.3f s over %d new connection(s)\n'
+        '>>> Estimate (not measured) for %d separate invocations: %.3f s, '
+        'assuming %.3f s of start-up each; estimated speed-up: %.1fx\n\n' % (
+            count, elapsed, connections,
+            count, estimate, startup_cpu_time,
+            estimate / elapsed if elapsed else 1,
+        )
+    )
+    env.stderr.flush()
@@ -0,0 +1,356 @@
+"""
+Benchmark mode: send the same request many times and report the latencies.
+
+    $ http --bench -n 10000 --concurrency 50 example.org
+
+The request is built once from the usual arguments, like for a single
+request, and then sent ``--requests`` times by ``--concurrency`` workers,
+each sending its next request as soon as the previous response has been
+read (a "closed loop"). The workers share the connection pools, which keep
+a connection per worker to each host.
+
+The latencies (from sending the request to the end of the response body)
+are recorded in a `LatencyHistogram`, and the report gives the throughput,
+latency percentiles, response statuses, errors and the bytes received,
+as text or, with ``--bench-format=json``, as JSON.
+
+"""
+import json
+import threading
+import time
+from collections import Counter
+
+import requests
+
+from httpie import ExitStatus
+from httpie.input import positive_int_arg
+from httpie.utils import humanize_bytes
+
+
+BENCH_FORMAT_TEXT = 'text'
+BENCH_FORMAT_JSON = 'json'
+BENCH_FORMATS = [BENCH_FORMAT_TEXT, BENCH_FORMAT_JSON]
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class BenchError(ValueError):
+    pass
+
+
+class LatencyHistogram(object):
+    """
+    Latencies in microseconds, counted in log-linear buckets like an HDR
+    histogram: values are kept with `significant_bits` bits of precision
+    (a relative error under 0.1% with the default 11), whatever their
+    magnitude, in memory proportional to the number of distinct buckets.
+
+    """
+
+    def __init__(self, significant_bits=11):
+        self.significant_bits = significant_bits
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def get_bucket(self, value):
+        shift = max(0, value.bit_length() - self.significant_bits)
+        return (value >> shift) << shift, (1 << shift) - 1
+
+    def record(self, seconds):
+        value = int(seconds * 1e6)
+        self.counts[self.get_bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def add(self, other):
+        """Add the values of `other`, e.g., recorded by another thread."""
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min,
+                                                             value)
+                self.max = value if self.max is None else max(self.max,
+                                                             value)
+
+    def get_percentile(self, percentile):
+        """
+        Return the value below which `percentile` % of the values fall (the
+        highest value of its bucket, but no more than the maximum).
+
+        """
+        if not self.count:
+            return None
+        rank = max(1, percentile / 100 * self.count)
+        seen = 0
+        for (lowest, width), count in sorted(self.counts.items()):
+            seen += count
+            if seen >= rank:
+                return min(lowest + width, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class BenchResult(object):
+
+    def __init__(self):
+        self.latencies = LatencyHistogram()
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.bytes = 0
+
+    def add(self, other):
+        self.latencies.add(other.latencies)
+        self.statuses.update(other.statuses)
+        self.errors.update(other.errors)
+        self.bytes += other.bytes
+
+    @property
+    def count(self):
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+
+def add_bench_arguments(parser):
+    """
+    Add the ``--bench`` options to `parser` (or an argument group), like
+    `httpie.batch.add_batch_arguments()`.
+
+    """
+    parser.add_argument(
+        '--bench',
+        default=False,
+        action='store_true',
+        help="""
+        Send the request --requests times, from --concurrency workers that
+        each send their next request as soon as they have read the previous
+        response, over shared connections. Instead of the responses, a report
+        of the throughput, the latency percentiles (p50, p90, p99 and p99.9),
+        the response statuses, the errors and the bytes received is written.
+
+        """
+    )
+    parser.add_argument(
+        '--requests', '-n',
+        type=positive_int_arg,
+        default=1,
+        metavar='N',
+        help="""
+        With --bench, the number of requests to send.
+
+        """
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=positive_int_arg,
+        default=1,
+        metavar='C',
+        help="""
+        With --bench, the number of requests in flight at any time (and of
+        connections to the host).
+
+        """
+    )
+    parser.add_argument(
+        '--bench-format',
+        choices=BENCH_FORMATS,
+        default=BENCH_FORMAT_TEXT,
+        help="""
+        With --bench, write the report as text (default) or as JSON.
+
+        """
+    )
+
+
+def prepare_request(requests_session, args):
+    """
+    Return `(prepared_request, send_kwargs)` for `args`, like
+    `requests.Session.request()` does before sending.
+
+    """
+    from httpie.client import get_requests_kwargs
+
+    kwargs = get_requests_kwargs(args)
+    body = kwargs['data']
+    if hasattr(body, 'read'):
+        # A streamed body (e.g., from stdin), which is sent more than once.
+        kwargs['data'] = body.read()
+        body.close()
+    prepared = requests_session.prepare_request(requests.Request(
+        method=kwargs['method'].upper(),
+        url=kwargs['url'],
+        headers=kwargs['headers'],
+        files=kwargs['files'],
+        data=kwargs['data'] or {},
+        params=kwargs['params'] or {},
+        auth=kwargs['auth'],
+    ))
+    send_kwargs = {
+        'timeout': kwargs['timeout'],
+        'allow_redirects': kwargs['allow_redirects'],
+    }
+    send_kwargs.update(requests_session.merge_environment_settings(
+        prepared.url, kwargs['proxies'], kwargs['stream'], kwargs['verify'],
+        kwargs['cert']))
+    return prepared, send_kwargs
+
+
+def run_worker(requests_session, prepared, send_kwargs, claim, result):
+    """Send `prepared` for as long as `claim()` returns `True`."""
+    while claim():
+        start = time.perf_counter()
+        try:
+            response = requests_session.send(prepared.copy(), **send_kwargs)
+            try:
+                for chunk in response.raw.stream(READ_CHUNK_SIZE,
+                                                 decode_content=False):
+                    result.bytes += len(chunk)
+            finally:
+                response.close()
+        except Exception as e:
+            result.errors[type(e).__name__] += 1
+            continue
+        result.latencies.record(time.perf_counter() - start)
+        result.statuses[response.status_code] += 1
+
+
+def run_bench(mode_args, args, env, error, traceback):
+    """Run the benchmark for `args`, with the parsed ``--bench`` options
+    `mode_args` (see `httpie.core.get_mode_parser()`)."""
+    from httpie.client import (configure_pools, get_adapter_kwargs,
+                               get_requests_session)
+    from httpie.core import parse_args
+
+    count = mode_args.requests
+    concurrency = min(mode_args.concurrency, count)
+    try:
+        args = parse_args(args=args, env=env)
+        if args.session or args.session_read_only or args.download:
+            raise BenchError('--bench cannot be used with sessions or'
+                             ' --download')
+        requests_session = get_requests_session(
+            **get_adapter_kwargs(args, env.config.directory))
+        prepared, send_kwargs = prepare_request(requests_session, args)
+    except SystemExit as e:
+        return ExitStatus.ERROR if e.code else ExitStatus.OK
+    except Exception as e:
+        if traceback:
+            raise
+        error('%s: %s', type(e).__name__, e)
+        return ExitStatus.ERROR
+
+    remaining = [count]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def claim():
+        with lock:
+            if stop.is_set() or not remaining[0]:
+                return False
+            remaining[0] -= 1
+            return True
+
+    results = [BenchResult() for _ in range(concurrency)]
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            args=(requests_session, prepared, send_kwargs, claim, result),
+            daemon=True,
+        )
+        for result in results
+    ]
+    # A connection per worker to each host.
+    pool_options = configure_pools(maxsize=concurrency)
+    start = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.1)
+    except KeyboardInterrupt:
+        # Report what has been done so far.
+        stop.set()
+        for thread in threads:
+            thread.join()
+        env.stderr.write('\n')
+    finally:
+        configure_pools(**pool_options)
+    elapsed = time.perf_counter() - start
+
+    result = BenchResult()
+    for worker_result in results:
+        result.add(worker_result)
+    report = get_report(result, prepared, concurrency, elapsed)
+    if mode_args.bench_format == BENCH_FORMAT_JSON:
+        output = json.dumps(report, indent=4) + '\n'
+    else:
+        output = format_report(report)
+    outfile = env.stdout
+    getattr(outfile, 'buffer', outfile).write(output.encode('utf8'))
+    outfile.flush()
+    return ExitStatus.ERROR if result.errors else ExitStatus.OK
+
+
+def get_report(result, prepared, concurrency, elapsed):
+    """Return the results as a JSON-serializable `dict`."""
+    latencies = result.latencies
+
+    def ms(value):
+        return None if value is None else round(value / 1000, 3)
+
+    return {
+        'method': prepared.method,
+        'url': prepared.url,
+        'requests': result.count,
+        'concurrency': concurrency,
+        'duration': round(elapsed, 3),
+        'throughput': round(result.count / elapsed, 1) if elapsed else None,
+        'bytes': result.bytes,
+        'latency_ms': dict(
+            [('min', ms(latencies.min)), ('mean', ms(latencies.mean)),
+             ('max', ms(latencies.max))]
+            + [('p%s' % percentile, ms(latencies.get_percentile(percentile)))
+               for percentile in PERCENTILES]
+        ),
+        'statuses': {str(status): count
+                     for status, count in sorted(result.statuses.items())},
+        'errors': dict(sorted(result.errors.items())),
+    }
+
+
+def format_report(report):
+    latency = report['latency_ms']
+
+    def ms(key):
+        value = latency[key]
+        return '-' if value is None else '%.2f ms' % value
+
+    lines = [
+        '%s %s' % (report['method'], report['url']),
+        '',
+        'Requests:      %d (concurrency %d)' % (report['requests'],
+                                                report['concurrency']),
+        'Duration:      %.3f s' % report['duration'],
+        'Throughput:    %s requests/s' % (report['throughput'] or '-'),
+        'Transferred:   %s' % humanize_bytes(report['bytes']),
+        'Latency:       min %s, mean %s, max %s' % (
+            ms('min'), ms('mean'), ms('max')),
+    ]
+    lines.extend('  %-12s %s' % (key, ms(key))
+                 for key in latency if key.startswith('p'))
+    lines.append('Statuses:      %s' % (', '.join(
+        '%s: %d' % item for item in report['statuses'].items()) or '-'))
+    lines.append('Errors:        %s' % (', '.join(
+        '%s: %d' % item for item in report['errors'].items()) or '-'))
+    return '\n'.join(lines) + '\n'
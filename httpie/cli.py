@@ -9,17 +9,24 @@ from argparse import (RawDescriptionHelpFormatter, FileType,
                       OPTIONAL, ZERO_OR_MORE, SUPPRESS)
 
 from httpie import __doc__, __version__
+from httpie.batch import add_batch_arguments
+from httpie.bench import add_bench_arguments
 from httpie.plugins.builtin import BuiltinAuthPlugin
 from httpie.plugins import plugin_manager
 from httpie.sessions import DEFAULT_SESSIONS_DIR
-from httpie.output.formatters.colors import AVAILABLE_STYLES, DEFAULT_STYLE
+from httpie.client import (ENGINES, ENGINE_REQUESTS, ENGINE_ASYNCIO,
+                           ENGINE_HTTP2)
+from httpie.output.formatters.styles import AVAILABLE_STYLES, DEFAULT_STYLE
+from httpie.retries import DEFAULT_BACKOFF, DEFAULT_BUDGET, DEFAULT_RETRY_ON
+from httpie.timings import TIMINGS_FORMAT_TEXT, TIMINGS_FORMATS
 from httpie.input import (Parser, AuthCredentialsArgType, KeyValueArgType,
                           SEP_PROXY, SEP_CREDENTIALS, SEP_GROUP_ALL_ITEMS,
                           OUT_REQ_HEAD, OUT_REQ_BODY, OUT_RESP_HEAD,
                           OUT_RESP_BODY, OUTPUT_OPTIONS,
                           OUTPUT_OPTIONS_DEFAULT, PRETTY_MAP,
                           PRETTY_STDOUT_TTY_ONLY, SessionNameValidator,
-                          readable_file_arg)
+                          readable_file_arg, resolve_arg, keepalive_arg,
+                          retry_on_arg)
 
 
 class HTTPieHelpFormatter(RawDescriptionHelpFormatter):
@@ -380,6 +387,24 @@ sessions.add_argument(
 )
 
 
+#######################################################################
+# Batch
+#######################################################################
+
+batch = parser.add_argument_group(title='Batch')
+
+add_batch_arguments(batch)
+
+
+#######################################################################
+# Benchmark
+#######################################################################
+
+bench = parser.add_argument_group(title='Benchmark')
+
+add_bench_arguments(bench)
+
+
 #######################################################################
 # Authentication
 #######################################################################
@@ -415,7 +440,7 @@ auth.add_argument(
                     type=plugin.auth_type,
                     name=plugin.name,
                     package=''
-                    if issubclass(plugin, BuiltinAuthPlugin)
+                    if plugin.package_name == BuiltinAuthPlugin.package_name
                     else f' (provided by {plugin.package_name})',
                     description=(
                         ''
@@ -505,6 +530,173 @@ network.add_argument(
 
     """
 )
+network.add_argument(
+    '--resolve',
+    default=[],
+    action='append',
+    type=resolve_arg,
+    metavar='HOST:PORT:ADDRESS',
+    help="""
+    Connect to ADDRESS instead of resolving HOST, when connecting to HOST
+    and PORT, e.g., to target a specific backend. The hostname is still used
+    for the Host header and TLS. Can be given multiple times:
+
+        --resolve=example.org:443:10.0.0.1
+
+    """
+)
+network.add_argument(
+    '--dns-cache-ttl',
+    type=float,
+    default=0,
+    metavar='SECONDS',
+    help="""
+    Cache the addresses resolved for each hostname in the config directory
+    for SECONDS, so that the following invocations don't resolve them again.
+    The default value, 0, disables the cache.
+
+    """
+)
+network.add_argument(
+    '--engine',
+    default=ENGINE_REQUESTS,
+    choices=ENGINES,
+    help="""
+    The engine sending the requests. "{asyncio}" is an HTTP/1.1 client built
+    on Python's asyncio that handles the I/O of all the connections on
+    a single event loop, which scales better to many concurrent requests
+    (e.g., with --batch and --parallel). "{h2}" speaks HTTP/2 on top of it,
+    with all the requests to a host multiplexed on one connection. It
+    negotiates HTTP/2 for https:// URLs, and assumes it for http:// ones.
+    It requires the "h2" package. The default is "{default}".
+
+    """.format(asyncio=ENGINE_ASYNCIO, h2=ENGINE_HTTP2,
+               default=ENGINE_REQUESTS)
+)
+network.add_argument(
+    '--pool-connections',
+    type=int,
+    default=None,
+    metavar='N',
+    help="""
+    The number of hosts to keep a connection pool for (e.g., with --batch).
+    The default is 10.
+
+    """
+)
+network.add_argument(
+    '--pool-maxsize',
+    type=int,
+    default=None,
+    metavar='N',
+    help="""
+    The number of idle connections kept open to each host. The default is
+    10, or the --parallel value with --batch.
+
+    """
+)
+network.add_argument(
+    '--pool-block',
+    default=False,
+    action='store_true',
+    help="""
+    Never open more than --pool-maxsize connections to a host at the same
+    time; wait for a connection to be released instead.
+
+    """
+)
+network.add_argument(
+    '--tcp-nodelay',
+    default='yes',
+    choices=['yes', 'no'],
+    help="""
+    Disable Nagle's algorithm (TCP_NODELAY), so that small writes are sent
+    right away. The default is "yes". With "no", the kernel may coalesce
+    small segments, which can help throughput on slow links.
+
+    """
+)
+network.add_argument(
+    '--tcp-keepalive',
+    type=keepalive_arg,
+    default=None,
+    metavar='IDLE[:INTERVAL[:COUNT]]',
+    help="""
+    Enable TCP keepalive probes (SO_KEEPALIVE) on new connections. They
+    start after IDLE seconds without traffic, and are sent every INTERVAL
+    seconds, up to COUNT times (by default, the system settings).
+
+    """
+)
+network.add_argument(
+    '--socket-send-buffer',
+    type=int,
+    default=None,
+    metavar='BYTES',
+    help="""
+    The size of the send buffer of new connections (SO_SNDBUF).
+
+    """
+)
+network.add_argument(
+    '--socket-recv-buffer',
+    type=int,
+    default=None,
+    metavar='BYTES',
+    help="""
+    The size of the receive buffer of new connections (SO_RCVBUF). Larger
+    buffers help large downloads over high-latency links.
+
+    """
+)
+network.add_argument(
+    '--max-retries',
+    type=int,
+    default=0,
+    metavar='N',
+    help="""
+    Retry a failed request up to N times (see --retry-on). The default, 0,
+    disables retries.
+
+    """
+)
+network.add_argument(
+    '--retry-on',
+    type=retry_on_arg,
+    default=retry_on_arg(DEFAULT_RETRY_ON),
+    metavar='CONDITIONS',
+    help="""
+    A comma-separated list of the failures to retry with --max-retries:
+    "connect" (no connection could be made), "read" (the connection broke
+    or timed out before the response), status codes (e.g., "429") and
+    status classes (e.g., "5xx"). Only connection failures are retried for
+    methods that aren't idempotent, like POST. The default is "{default}".
+
+    """.format(default=DEFAULT_RETRY_ON)
+)
+network.add_argument(
+    '--retry-backoff',
+    type=float,
+    default=DEFAULT_BACKOFF,
+    metavar='SECONDS',
+    help="""
+    The base of the exponential backoff between retries: the wait before
+    retry N is random, between 0 and SECONDS * 2^N (up to 30 s), unless
+    the response has a Retry-After header. The default is {default}.
+
+    """.format(default=DEFAULT_BACKOFF)
+)
+network.add_argument(
+    '--retry-budget',
+    type=float,
+    default=DEFAULT_BUDGET,
+    metavar='SECONDS',
+    help="""
+    Don't start a retry more than SECONDS after the first attempt. The
+    default is {default}.
+
+    """.format(default=DEFAULT_BUDGET)
+)
 network.add_argument(
     '--check-status',
     default=False,
@@ -575,3 +767,24 @@ troubleshooting.add_argument(
 
     """
 )
+troubleshooting.add_argument(
+    '--timings',
+    action='store_true',
+    default=False,
+    help="""
+    Write how long each phase of the exchange took to stderr: name
+    resolution, connecting, the TLS handshake, sending the request, waiting
+    for the first byte of the response (TTFB), receiving the response body,
+    and formatting it. Each redirect and retry gets its own line.
+
+    """
+)
+troubleshooting.add_argument(
+    '--timings-format',
+    choices=TIMINGS_FORMATS,
+    default=TIMINGS_FORMAT_TEXT,
+    help="""
+    With --timings, write the timings as a text table (default) or as JSON.
+
+    """
+)
@@ -1,5 +1,6 @@
 import json
 import sys
+import threading
 from pprint import pformat
 
 import requests
@@ -9,44 +10,301 @@ from httpie import sessions
 from httpie import __version__
 from httpie.compat import str
 from httpie.plugins import plugin_manager
+from httpie.plugins.manager import PluginDescriptor
+from httpie.resolver import get_resolver
 
 
 # https://urllib3.readthedocs.org/en/latest/security.html
 urllib3.disable_warnings()
 
 
+ENGINE_REQUESTS = 'requests'
+ENGINE_ASYNCIO = 'asyncio'
+ENGINE_HTTP2 = 'h2'
+ENGINES = [ENGINE_REQUESTS, ENGINE_ASYNCIO, ENGINE_HTTP2]
+
 FORM = 'application/x-www-form-urlencoded; charset=utf-8'
 JSON = 'application/json'
 DEFAULT_UA = f'HTTPie/{__version__}'
 
+# The HTTP(S) adapters are shared by all the requests made by this process,
+# so that their connection pools are reused, e.g., by the daemon (see
+# `httpie.daemon`). Keyed by the TLS options, so that a connection made
+# with certificate verification disabled never gets reused for a request
+# that requires it.
+_adapters = {}
+
+
+class LazyTransportAdapter(requests.adapters.BaseAdapter):
+    """
+    Mounted in place of the adapter of a transport plugin that hasn't been
+    imported yet. The plugin is only loaded once a request is actually
+    sent to its URL prefix.
+
+    """
+
+    def __init__(self, plugin):
+        super(LazyTransportAdapter, self).__init__()
+        self.plugin = plugin
+        self._adapter = None
+
+    @property
+    def adapter(self):
+        if self._adapter is None:
+            self._adapter = self.plugin().get_adapter()
+        return self._adapter
+
+    def send(self, *args, **kwargs):
+        return self.adapter.send(*args, **kwargs)
+
+    def close(self):
+        if self._adapter is not None:
+            self._adapter.close()
+
+
+_adapters_lock = threading.Lock()
+
+# The number of hosts to keep a connection pool for, the size of the pool
+# of each host, and whether requests wait for a free connection when the
+# pool is exhausted (see `configure_pools()`).
+_pool_options = {
+    'pool_connections': requests.adapters.DEFAULT_POOLSIZE,
+    'pool_maxsize': requests.adapters.DEFAULT_POOLSIZE,
+    'pool_block': requests.adapters.DEFAULT_POOLBLOCK,
+}
+
+
+def get_adapter(verify=True, cert=None, engine=ENGINE_REQUESTS,
+                resolver=None, socket_options=None, pool_overrides=()):
+    """
+    Return the shared `HTTPAdapter` for the given TLS options, engine,
+    `httpie.resolver.Resolver`, socket options (see
+    `httpie.transport.get_socket_options()`; `None` for the defaults),
+    and `(name, value)` pairs overriding `_pool_options`.
+
+    """
+    if isinstance(cert, list):
+        cert = tuple(cert)
+    pool_overrides = tuple(sorted(pool_overrides))
+    key = verify, cert, engine, resolver, socket_options, pool_overrides
+    with _adapters_lock:
+        try:
+            return _adapters[key]
+        except KeyError:
+            options = dict(_pool_options, **dict(pool_overrides))
+            if engine == ENGINE_ASYNCIO:
+                from httpie.aio import AsyncioAdapter
+                adapter = AsyncioAdapter(resolver=resolver,
+                                         socket_options=socket_options,
+                                         **options)
+            elif engine == ENGINE_HTTP2:
+                from httpie.http2 import HTTP2Adapter
+                adapter = HTTP2Adapter(resolver=resolver,
+                                       socket_options=socket_options,
+                                       **options)
+            elif resolver is not None:
+                from httpie.transport import ResolvingHTTPAdapter
+                adapter = ResolvingHTTPAdapter(resolver=resolver,
+                                               socket_options=socket_options,
+                                               **options)
+            else:
+                from httpie.transport import SessionHTTPAdapter
+                adapter = SessionHTTPAdapter(socket_options=socket_options,
+                                             **options)
+            _adapters[key] = adapter
+            return adapter
+
+
+def configure_pools(maxsize, block=False):
+    """
+    Keep up to `maxsize` connections to each host in the shared adapters.
+
+    With `block`, no more than `maxsize` connections to a host are ever open
+    at the same time; requests from other threads wait for a connection
+    to be released instead, which caps the concurrency per host.
+
+    The adapters created with explicit pool options (``--pool-maxsize``,
+    ``--pool-block``) keep them, and so do their pools. The pools of the
+    other adapters are replaced, and their connections closed, unless the
+    options are the same.
+
+    Return the previous options as keyword arguments for this function.
+
+    """
+    with _adapters_lock:
+        previous = {'maxsize': _pool_options['pool_maxsize'],
+                    'block': _pool_options['pool_block']}
+        _pool_options.update(pool_maxsize=maxsize, pool_block=block)
+        for key, adapter in _adapters.items():
+            pool_overrides = dict(key[-1])
+            pool_maxsize = pool_overrides.get('pool_maxsize', maxsize)
+            pool_block = pool_overrides.get('pool_block', block)
+            if (adapter._pool_maxsize, adapter._pool_block) == (
+                    pool_maxsize, pool_block):
+                # Keep the pools, and their kept-alive connections.
+                continue
+            poolmanager = adapter.poolmanager
+            adapter.init_poolmanager(
+                connections=adapter._pool_connections,
+                maxsize=pool_maxsize,
+                block=pool_block,
+            )
+            close_pools(poolmanager)
+    return previous
+
+
+def close_pools(poolmanager):
+    """
+    Close the pools of `poolmanager`, and so their idle connections (and
+    the others once they're released). Unlike with urllib3 1.x,
+    `PoolManager.clear()` leaves closing them to the garbage collector.
+
+    """
+    pools = poolmanager.pools
+    replaced = [pools.get(key) for key in pools.keys()]
+    poolmanager.clear()
+    for pool in replaced:
+        if pool is not None:
+            pool.close()
+
 
-def get_requests_session():
+def get_connection_stats():
+    """
+    Return the total number of connections made, and requests sent, through
+    the shared adapters so far.
+
+    """
+    connections = requests_count = 0
+    for adapter in _adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_count += pool.num_requests
+        if hasattr(adapter, 'pool'):
+            # `httpie.aio.AsyncioAdapter`
+            connections += adapter.pool.num_connections
+            requests_count += adapter.pool.num_requests
+    return connections, requests_count
+
+
+def get_requests_session(**adapter_kwargs):
+    """
+    Return a `requests.Session` using the shared adapter for
+    `adapter_kwargs` (see `get_adapter()`).
+
+    """
     requests_session = requests.Session()
-    for cls in plugin_manager.get_trasnsport_plugins():
+    adapter = get_adapter(**adapter_kwargs)
+    requests_session.mount('https://', adapter)
+    requests_session.mount('http://', adapter)
+    for cls in plugin_manager.get_transport_plugins():
+        if isinstance(cls, PluginDescriptor) and not cls.is_loaded:
+            requests_session.mount(prefix=cls.prefix,
+                                   adapter=LazyTransportAdapter(cls))
+            continue
         transport_plugin = cls()
         requests_session.mount(prefix=transport_plugin.prefix,
                                adapter=transport_plugin.get_adapter())
     return requests_session
 
 
-def get_response(args, config_dir):
-    """Send the request and return a `request.Response`."""
+def get_adapter_kwargs(args, config_dir):
+    """Return the `get_adapter()` keyword arguments for `args`."""
+    return {
+        'verify': get_verify(args),
+        'cert': get_cert(args),
+        'engine': args.engine,
+        'resolver': get_resolver(config_dir=config_dir,
+                                 ttl=args.dns_cache_ttl,
+                                 overrides=args.resolve),
+        'socket_options': get_socket_options(args),
+        'pool_overrides': get_pool_overrides(args),
+    }
 
-    requests_session = get_requests_session()
+
+def get_response(args, config_dir, requests_session=None):
+    """Send the request and return a `request.Response`.
+
+    A `requests_session` can be passed to share it between requests
+    (e.g., in batch mode).
+
+    """
+    adapter_kwargs = get_adapter_kwargs(args, config_dir)
+    if requests_session is None:
+        requests_session = get_requests_session(**adapter_kwargs)
+    else:
+        adapter = get_adapter(**adapter_kwargs)
+        requests_session.mount('https://', adapter)
+        requests_session.mount('http://', adapter)
+    if args.debug:
+        dump_adapter(get_adapter(**adapter_kwargs))
+        from httpie.racing import connect_attempts
+        attempts = []
+        connect_attempts.set(attempts)
 
     if args.session or args.session_read_only:
-        return sessions.get_response(
+        response = sessions.get_response(
             requests_session=requests_session,
             args=args,
             config_dir=config_dir,
             session_name=args.session or args.session_read_only,
             read_only=bool(args.session_read_only),
         )
+    else:
+        kwargs = get_requests_kwargs(args)
+        if args.debug:
+            dump_request(kwargs)
+        response = send_request(requests_session, kwargs, args)
 
-    kwargs = get_requests_kwargs(args)
     if args.debug:
-        dump_request(kwargs)
-    return requests_session.request(**kwargs)
+        dump_connect_attempts(attempts)
+        dump_tls_session(response)
+    return response
+
+
+def send_request(requests_session, kwargs, args):
+    """Send the request of `kwargs`, retrying it as per ``--max-retries``."""
+    if not args.max_retries:
+        return requests_session.request(**kwargs)
+    from httpie.retries import RetryPolicy, send_with_retries
+    policy = RetryPolicy(
+        max_retries=args.max_retries,
+        retry_on=args.retry_on,
+        backoff=args.retry_backoff,
+        budget=args.retry_budget,
+    )
+    return send_with_retries(
+        lambda: requests_session.request(**kwargs),
+        policy=policy,
+        method=kwargs['method'],
+        rewind=get_body_rewind(kwargs),
+        log=sys.stderr.write if args.debug else None,
+    )
+
+
+def get_body_rewind(kwargs):
+    """
+    Return a function rewinding the file objects of the request body of
+    `kwargs` to where they are now, or `None` if one of them can't be.
+
+    """
+    files = [kwargs['data']]
+    files.extend(value[1] if isinstance(value, tuple) else value
+                 for value in (kwargs['files'] or {}).values())
+    files = [f for f in files if hasattr(f, 'read')]
+    try:
+        positions = [(f, f.tell()) for f in files if f.seekable()]
+    except (AttributeError, OSError):
+        return None
+    if len(positions) < len(files):
+        return None
+
+    def rewind():
+        for f, position in positions:
+            f.seek(position)
+    return rewind
 
 
 def dump_request(kwargs):
@@ -54,6 +312,38 @@ def dump_request(kwargs):
                      % pformat(kwargs))
 
 
+def dump_adapter(adapter):
+    socket_options = getattr(adapter, 'socket_options', None)
+    if socket_options is not None:
+        from httpie.transport import format_socket_options
+        socket_options = format_socket_options(socket_options)
+    sys.stderr.write(
+        '\n>>> %s(pool_connections=%r, pool_maxsize=%r, pool_block=%r,'
+        ' socket_options=%s)\n\n' % (
+            type(adapter).__name__,
+            adapter._pool_connections,
+            adapter._pool_maxsize,
+            adapter._pool_block,
+            pformat(socket_options) if socket_options else 'default',
+        ))
+
+
+def dump_connect_attempts(attempts):
+    if attempts:
+        sys.stderr.write('\n%s\n\n' % '\n'.join(
+            '>>> Connect %s' % attempt for attempt in attempts))
+
+
+def dump_tls_session(response):
+    from httpie.tls import get_ssl_object
+    ssl_object = get_ssl_object(response)
+    if ssl_object is not None:
+        sys.stderr.write('\n>>> TLS session %s (%s)\n\n' % (
+            'resumed' if ssl_object.session_reused else 'not resumed',
+            ssl_object.version(),
+        ))
+
+
 def encode_headers(headers):
     # This allows for unicode headers which is non-standard but practical.
     # See: https://github.com/jakubroztocil/httpie/issues/212
@@ -82,6 +372,49 @@ def get_default_headers(args):
     return default_headers
 
 
+def get_verify(args):
+    return {'yes': True, 'no': False}.get(args.verify, args.verify)
+
+
+def get_socket_options(args):
+    """
+    Return the socket options for the ``--tcp-*`` and ``--socket-*``
+    arguments, or `None` when they're all left at their defaults.
+
+    """
+    nodelay = args.tcp_nodelay == 'yes'
+    if (nodelay and not args.tcp_keepalive and not args.socket_send_buffer
+            and not args.socket_recv_buffer):
+        return None
+    from httpie.transport import get_socket_options as build
+    return build(
+        nodelay=nodelay,
+        keepalive=args.tcp_keepalive,
+        send_buffer=args.socket_send_buffer,
+        recv_buffer=args.socket_recv_buffer,
+    )
+
+
+def get_pool_overrides(args):
+    """Return the ``--pool-*`` arguments that were given, for `get_adapter()`."""
+    overrides = [
+        ('pool_connections', args.pool_connections),
+        ('pool_maxsize', args.pool_maxsize),
+        ('pool_block', args.pool_block or None),
+    ]
+    return tuple((name, value) for name, value in overrides
+                 if value is not None)
+
+
+def get_cert(args):
+    cert = None
+    if args.cert:
+        cert = args.cert
+        if args.cert_key:
+            cert = cert, args.cert_key
+    return cert
+
+
 def get_requests_kwargs(args, base_headers=None):
     """
     Translate our `args` into `requests.request` keyword arguments.
@@ -90,7 +423,7 @@ def get_requests_kwargs(args, base_headers=None):
     # Serialize JSON data, if needed.
     data = args.data
     auto_json = data and not args.form
-    if args.json or auto_json and isinstance(data, dict):
+    if (args.json or auto_json) and isinstance(data, dict):
         data = json.dumps(data) if data else ''
     # Finalize headers.
     headers = get_default_headers(args)
@@ -104,20 +437,14 @@ def get_requests_kwargs(args, base_headers=None):
         auth_plugin = plugin_manager.get_auth_plugin(args.auth_type)()
         credentials = auth_plugin.get_auth(args.auth.key, args.auth.value)
 
-    cert = None
-    if args.cert:
-        cert = args.cert
-        if args.cert_key:
-            cert = cert, args.cert_key
-
     return {
         'stream': True,
         'method': args.method.lower(),
         'url': args.url,
         'headers': headers,
         'data': data,
-        'verify': {'yes': True, 'no': False}.get(args.verify, args.verify),
-        'cert': cert,
+        'verify': get_verify(args),
+        'cert': get_cert(args),
         'timeout': args.timeout,
         'auth': credentials,
         'proxies': {p.key: p.value for p in args.proxy},
@@ -1,6 +1,7 @@
 import os
 import json
 import errno
+from copy import deepcopy
 
 from httpie import __version__
 from httpie.compat import is_windows
@@ -13,6 +14,16 @@ DEFAULT_CONFIG_DIR = os.environ.get(
 )
 
 
+# Parsed config files by path, along with the `os.stat()` values they were
+# read with. Long-lived processes (e.g., the daemon) re-load the same files
+# for every request, but they only need parsing again when they change.
+_load_cache = {}
+
+
+def get_stat_key(stat):
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
 class BaseConfigDict(dict):
 
     name = None
@@ -28,29 +39,52 @@ class BaseConfigDict(dict):
 
     @property
     def path(self):
-        """Return the config file path creating basedir, if needed."""
-        path = self._get_path()
-        try:
-            os.makedirs(os.path.dirname(path), mode=0o700)
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                raise
-        return path
+        return self._get_path()
 
     def is_new(self):
         return not os.path.exists(self._get_path())
 
     def load(self):
+        """Load the file, if it exists. Never writes anything.
+
+        The file is only parsed again when it has changed since the last
+        time it was loaded by this process.
+
+        """
+        path = self.path
         try:
-            with open(self.path, 'rt') as f:
-                try:
-                    data = json.load(f)
-                except ValueError as e:
-                    raise ValueError(f'Invalid {type(self).__name__} JSON: {str(e)} [{self.path}]')
-                self.update(data)
-        except IOError as e:
+            stat = os.stat(path)
+        except OSError as e:
             if e.errno != errno.ENOENT:
                 raise
+            return
+
+        stat_key = get_stat_key(stat)
+        cached = _load_cache.get(path)
+        if cached is not None and cached[0] == stat_key:
+            data = cached[1]
+        else:
+            try:
+                with open(path, 'rt') as f:
+                    try:
+                        data = json.load(f)
+                    except ValueError as e:
+                        raise ValueError(f'Invalid {type(self).__name__} JSON: {str(e)} [{path}]')
+            except IOError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                return
+            _load_cache[path] = stat_key, data
+        # The cached data must not be changed through this instance.
+        self.update(deepcopy(data))
+
+    def ensure_directory(self):
+        """Create the directory of the file, if needed."""
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
 
     def save(self):
         self['__meta__'] = {
@@ -62,11 +96,14 @@ class BaseConfigDict(dict):
         if self.about:
             self['__meta__']['about'] = self.about
 
+        self.ensure_directory()
+        _load_cache.pop(self.path, None)
         with open(self.path, 'w') as f:
             json.dump(self, f, indent=4, sort_keys=True, ensure_ascii=True)
             f.write('\n')
 
     def delete(self):
+        _load_cache.pop(self.path, None)
         try:
             os.unlink(self.path)
         except OSError as e:
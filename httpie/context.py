@@ -1,7 +1,31 @@
+import os
 import sys
+import copy
+import struct
 
 from httpie.compat import is_windows
-from httpie.config import DEFAULT_CONFIG_DIR, Config
+from httpie.config import DEFAULT_CONFIG_DIR, Config, BaseConfigDict
+
+
+# Assumed when the terminal can't be probed.
+DEFAULT_COLORS = 256
+
+# The number of colors terminfo reports for direct-color terminals.
+TRUECOLOR = 2 ** 24
+
+# Compiled terminfo format constants, see term(5).
+TERMINFO_DIRS = [
+    '/etc/terminfo',
+    '/lib/terminfo',
+    '/usr/share/terminfo',
+    '/usr/lib/terminfo',
+    '/usr/share/lib/terminfo',
+]
+TERMINFO_MAGIC = 0o432
+TERMINFO_MAGIC_32BIT = 0o1036
+TERMINFO_HEADER_SIZE = 12
+# The position of ``colors`` among the numeric capabilities.
+TERMINFO_COLORS_INDEX = 13
 
 
 class Environment(object):
@@ -24,20 +48,8 @@ class Environment(object):
     stdout_encoding = None
     stderr = sys.stderr
     stderr_isatty = stderr.isatty()
-    colors = 256
-    if not is_windows:
-        import curses
-        try:
-            curses.setupterm()
-            try:
-                colors = curses.tigetnum('colors')
-            except TypeError:
-                # pypy3 (2.4.0)
-                colors = curses.tigetnum(b'colors')
-        except curses.error:
-            pass
-        del curses
-    else:
+    _colors = None
+    if is_windows:
         # noinspection PyUnresolvedReferences
         import colorama.initialise
         stdout = colorama.initialise.wrap_stream(
@@ -57,7 +69,8 @@ class Environment(object):
 
         """
         assert all(hasattr(type(self), attr) for attr in kwargs)
-        self.__dict__.update(**kwargs)
+        for attr, value in kwargs.items():
+            setattr(self, attr, value)
 
         # Keyword arguments > stream.encoding > default utf8
         if self.stdin_encoding is None:
@@ -73,12 +86,180 @@ class Environment(object):
             self.stdout_encoding = getattr(
                 actual_stdout, 'encoding', None) or 'utf8'
 
+    def copy(self, **kwargs):
+        """
+        Return a copy of this environment, with `kwargs` overwriting
+        its attributes like in `__init__()`.
+
+        """
+        assert all(hasattr(type(self), attr) for attr in kwargs)
+        env = copy.copy(self)
+        for attr, value in kwargs.items():
+            setattr(env, attr, value)
+        return env
+
     @property
     def config(self):
         if not hasattr(self, '_config'):
             self._config = Config(directory=self.config_dir)
-            if self._config.is_new():
-                self._config.save()
-            else:
-                self._config.load()
+            self._config.load()
         return self._config
+
+    @property
+    def colors(self):
+        """The color depth of the terminal, detected on first access."""
+        if self._colors is None and self.is_windows:
+            # Output is colored through `colorama`.
+            self._colors = DEFAULT_COLORS
+        elif self._colors is None:
+            self._colors = get_color_depth(
+                term=os.environ.get('TERM'),
+                colorterm=os.environ.get('COLORTERM'),
+                config_dir=self.config_dir,
+                fd=get_fileno(self.stdout),
+            )
+        return self._colors
+
+    @colors.setter
+    def colors(self, colors):
+        self._colors = colors
+
+
+class ColorDepthCache(BaseConfigDict):
+    """Terminal color depths by ``$TERM``, as reported by terminfo."""
+
+    about = 'HTTPie terminal color depth cache'
+
+    def __init__(self, directory):
+        super(ColorDepthCache, self).__init__()
+        self.directory = directory
+
+    def _get_path(self):
+        return os.path.join(self.directory, 'colors.json')
+
+
+def get_fileno(stream):
+    try:
+        return stream.fileno()
+    except (AttributeError, IOError, ValueError):
+        return -1
+
+
+def get_terminfo_dirs():
+    dirs = []
+    if os.environ.get('TERMINFO'):
+        dirs.append(os.environ['TERMINFO'])
+    dirs.append(os.path.expanduser('~/.terminfo'))
+    dirs.extend(d for d in os.environ.get('TERMINFO_DIRS', '').split(':')
+                if d)
+    dirs.extend(TERMINFO_DIRS)
+    return dirs
+
+
+def read_terminfo_colors(term):
+    """Read the ``colors`` capability from the compiled terminfo entry.
+
+    Unlike ``curses.setupterm()``, which can only be effectively called
+    once per process, this works for any number of different `term`s.
+    Return `None` if the entry can't be found or parsed.
+
+    """
+    if not term or os.path.sep in term:
+        return None
+    for directory in get_terminfo_dirs():
+        # Linux uses the first character, macOS its hex code.
+        for subdir in [term[0], '%02x' % ord(term[0])]:
+            try:
+                with open(os.path.join(directory, subdir, term), 'rb') as f:
+                    data = f.read()
+            except (IOError, OSError):
+                continue
+            return parse_terminfo_colors(data)
+    return None
+
+
+def parse_terminfo_colors(data):
+    """Parse the ``colors`` number out of compiled terminfo `data`.
+
+    See term(5) for the format.
+
+    """
+    try:
+        magic, names_size, bools_count, numbers_count = struct.unpack(
+            '<4h', data[:8])
+    except struct.error:
+        return None
+    if magic == TERMINFO_MAGIC:
+        number_format, number_size = '<h', 2
+    elif magic == TERMINFO_MAGIC_32BIT:
+        number_format, number_size = '<i', 4
+    else:
+        return None
+    if numbers_count <= TERMINFO_COLORS_INDEX:
+        return -1
+    offset = TERMINFO_HEADER_SIZE + names_size + bools_count
+    # Numbers are aligned to an even byte boundary.
+    offset += offset % 2
+    offset += TERMINFO_COLORS_INDEX * number_size
+    try:
+        colors, = struct.unpack(number_format,
+                                data[offset:offset + number_size])
+    except struct.error:
+        return None
+    return colors
+
+
+def probe_color_depth(term, fd=-1):
+    """Ask terminfo how many colors `term` supports.
+
+    Return `None` if unable to tell.
+
+    """
+    colors = read_terminfo_colors(term)
+    if colors is not None:
+        return colors
+
+    # E.g., terminfo stored in a hashed database. Fall back to curses.
+    import curses
+    try:
+        curses.setupterm(term, fd)
+        try:
+            return curses.tigetnum('colors')
+        except TypeError:
+            # pypy3 (2.4.0)
+            return curses.tigetnum(b'colors')
+    except (curses.error, IOError, ValueError):
+        return None
+
+
+def get_color_depth(term, colorterm, config_dir, fd=-1):
+    """Return the number of colors supported by the terminal.
+
+    Probing terminfo is slow, so it's done only when colors are used (see
+    `Environment.colors`), including for redirected output (e.g., piped
+    to ``less -R``), and only once for each ``$TERM`` value.
+
+    """
+    if colorterm in ('truecolor', '24bit'):
+        return TRUECOLOR
+    if not term:
+        return DEFAULT_COLORS
+
+    cache = ColorDepthCache(directory=config_dir)
+    try:
+        cache.load()
+    except ValueError:
+        pass
+
+    colors = cache.get(term)
+    if colors is None:
+        colors = probe_color_depth(term, fd)
+        if colors is None:
+            return DEFAULT_COLORS
+        cache[term] = colors
+        try:
+            cache.save()
+        except (IOError, OSError):
+            pass
+
+    return colors
@@ -12,16 +12,17 @@ Invocation flow:
 """
 import sys
 import errno
+import threading
 
 import requests
 from requests import __version__ as requests_version
-from pygments import __version__ as pygments_version
 
 from httpie import __version__ as httpie_version, ExitStatus
 from httpie.compat import str, bytes, is_py3
 from httpie.client import get_response
 from httpie.downloads import Download
 from httpie.context import Environment
+from httpie.input import ModeParser
 from httpie.plugins import plugin_manager
 from httpie.output.streams import (
     build_output_stream,
@@ -45,6 +46,8 @@ def get_exit_status(http_status, follow=False):
 
 
 def print_debug_info(env):
+    # Pygments is otherwise only imported when colors are used.
+    from pygments import __version__ as pygments_version
     env.stderr.writelines([
         'HTTPie %s\n' % httpie_version,
         'HTTPie data: %s\n' % env.config.directory,
@@ -67,6 +70,26 @@ def decode_args(args, stdin_encoding):
     ]
 
 
+# The parsers keep the state of the current invocation on themselves.
+_parse_lock = threading.Lock()
+
+
+def parse_args(args, env):
+    """
+    Parse `args` with the fast-path parser if possible,
+    and with the full one otherwise.
+
+    """
+    from httpie.fastparser import parser as fast_parser, FallbackToFullParser
+    with _parse_lock:
+        try:
+            return fast_parser.parse_args(args=args, env=env)
+        except FallbackToFullParser:
+            # Only importing `httpie.cli` builds the full parser.
+            from httpie.cli import parser
+            return parser.parse_args(args=args, env=env)
+
+
 def main(args=sys.argv[1:], env=Environment(), error=None):
     """Run the main program and write the output to ``env.stdout``.
 
@@ -74,9 +97,7 @@ def main(args=sys.argv[1:], env=Environment(), error=None):
 
     """
     args = decode_args(args, env.stdin_encoding)
-    plugin_manager.load_installed_plugins()
-
-    from httpie.cli import parser
+    plugin_manager.load_installed_plugins(config_dir=env.config_dir)
 
     if env.config.default_options:
         args = env.config.default_options + args
@@ -91,17 +112,73 @@ def main(args=sys.argv[1:], env=Environment(), error=None):
 
     debug = '--debug' in args
     traceback = debug or '--traceback' in args
-    exit_status = ExitStatus.OK
 
     if debug:
         print_debug_info(env)
         if args == ['--debug']:
-            return exit_status
+            return ExitStatus.OK
+
+    try:
+        mode_args, args = get_mode_parser().parse_args(args=args, env=env)
+    except SystemExit as e:
+        if traceback:
+            raise
+        env.stderr.write('\n')
+        return ExitStatus.ERROR
+    if mode_args.batch is not None:
+        from httpie.batch import run_batch
+        return run_batch(mode_args, args=args, env=env, error=error,
+                         traceback=traceback)
+    if mode_args.bench:
+        from httpie.bench import run_bench
+        return run_bench(mode_args, args=args, env=env, error=error,
+                         traceback=traceback)
+
+    return run(args=args, env=env, error=error, traceback=traceback)
+
+
+def get_mode_parser():
+    """
+    Return a new `ModeParser` for the ``--batch`` and ``--bench`` options,
+    with the same definitions as `httpie.cli.parser` (which only has them
+    for ``--help``), so that the full parser isn't needed to tell whether
+    to run a batch or a benchmark.
+
+    """
+    from httpie.batch import add_batch_arguments
+    from httpie.bench import add_bench_arguments
+    parser = ModeParser()
+    add_batch_arguments(parser)
+    add_bench_arguments(parser)
+    return parser
+
 
+def run(args, env, error, traceback, requests_session=None,
+        parsed_args=None):
+    """Parse `args`, run the request-response exchange, and write the
+    output to ``env.stdout``.
+
+    `parsed_args` are `args` already parsed (or the exception raised by
+    parsing them, which is handled like when it's raised here).
+
+    Return exit status code.
+
+    """
+    exit_status = ExitStatus.OK
     download = None
+    timings = None
 
     try:
-        args = parser.parse_args(args=args, env=env)
+        if parsed_args is None:
+            args = parse_args(args=args, env=env)
+        elif isinstance(parsed_args, BaseException):
+            raise parsed_args
+        else:
+            args = parsed_args
+
+        if args.timings:
+            from httpie.timings import start_timings
+            timings = start_timings()
 
         if args.download:
             args.follow = True  # --download implies --follow.
@@ -112,7 +189,8 @@ def main(args=sys.argv[1:], env=Environment(), error=None):
             )
             download.pre_request(args.headers)
 
-        response = get_response(args, config_dir=env.config.directory)
+        response = get_response(args, config_dir=env.config.directory,
+                                requests_session=requests_session)
 
         if args.check_status or download:
 
@@ -129,7 +207,8 @@ def main(args=sys.argv[1:], env=Environment(), error=None):
 
         write_kwargs = {
             'stream': build_output_stream(
-                args, env, response.request, response),
+                args, env, response.request, response,
+                timings=timings[-1] if timings else None),
 
             # This will in fact be `stderr` with `--download`
             'outfile': env.stdout,
@@ -166,6 +245,10 @@ def main(args=sys.argv[1:], env=Environment(), error=None):
                 env.stderr.write('\n')
             else:
                 raise
+        finally:
+            # Release the connection back to the (possibly shared) pool
+            # even when the body hasn't been read.
+            response.close()
     except KeyboardInterrupt:
         if traceback:
             raise
@@ -197,5 +280,12 @@ def main(args=sys.argv[1:], env=Environment(), error=None):
     finally:
         if download and not download.finished:
             download.failed()
+        # Close the files opened for the request body (e.g., ``@file``).
+        body = getattr(args, 'data', None)
+        if hasattr(body, 'close'):
+            body.close()
+        if timings:
+            from httpie.timings import format_timings
+            env.stderr.write(format_timings(timings, args.timings_format))
 
     return exit_status
@@ -0,0 +1,549 @@
+"""
+An opt-in, long-lived HTTPie process that runs requests for thin clients.
+
+Every ``http`` invocation normally pays for the interpreter start-up, the
+imports, plugin discovery, and a fresh connection to the server. With
+``HTTPIE_DAEMON=1`` set, ``http`` instead connects to a daemon listening
+on a Unix socket in the config directory (starting it if needed), and the
+daemon runs the request with warm imports and with the connection pools
+(see `httpie.client.get_adapter`) left over from the previous requests.
+
+The client sends its argv, working directory and environment variables,
+along with its actual stdin, stdout and stderr file descriptors. The
+daemon writes the output directly to them, so the output is byte-for-byte
+the same as without the daemon, and the TTY detection works unchanged.
+The daemon tells the client when it starts running the request, and then
+replies with the exit status. A client only runs a request in-process
+(e.g., when the daemon can't set it up) if the daemon hasn't started it,
+so that a request is never sent twice.
+
+Requests are handled one at a time, because the daemon temporarily takes
+over the client's working directory, environment and standard streams.
+
+The daemon exits after being idle for ``HTTPIE_DAEMON_IDLE_TIMEOUT``
+seconds, and it can also be run in the foreground or stopped explicitly::
+
+    $ python -m httpie.daemon
+    $ python -m httpie.daemon --stop
+
+This module must stay cheap to import, because it's imported by the
+client before anything else (see `httpie.__main__`).
+
+"""
+import array
+import errno
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from httpie import __version__
+from httpie.compat import is_windows
+
+
+DAEMON_ENV_VAR = 'HTTPIE_DAEMON'
+IDLE_TIMEOUT_ENV_VAR = 'HTTPIE_DAEMON_IDLE_TIMEOUT'
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+SOCKET_FILE_NAME = 'daemon.sock'
+
+# Bump when the format of the messages changes.
+PROTOCOL_VERSION = 2
+
+# How long the client waits for a newly started daemon.
+STARTUP_TIMEOUT = 5
+
+HEADER_SIZE = struct.calcsize('!I')
+MAX_FDS = 4
+
+# Client messages sent while a request is running.
+MESSAGE_INTERRUPT = b'INT\n'
+
+
+def is_enabled(environ=os.environ):
+    return (environ.get(DAEMON_ENV_VAR, '').lower() not in ('', '0', 'no')
+            and hasattr(socket, 'AF_UNIX')
+            and hasattr(socket, 'SCM_RIGHTS')
+            and not is_windows)
+
+
+def get_socket_path(config_dir):
+    return os.path.join(config_dir, SOCKET_FILE_NAME)
+
+
+#######################################################################
+# Wire protocol
+#######################################################################
+
+def send_message(sock, message, fds=()):
+    data = json.dumps(message).encode('utf8')
+    data = struct.pack('!I', len(data)) + data
+    ancillary = []
+    if fds:
+        ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                      array.array('i', fds))]
+    sent = sock.sendmsg([data], ancillary)
+    if sent < len(data):
+        sock.sendall(data[sent:])
+
+
+def receive_message(sock):
+    """Return `(message, fds)`, or `(None, [])` on EOF."""
+    fds = array.array('i')
+    # Not more than the header, so as not to read into the next message.
+    data, ancdata, flags, address = sock.recvmsg(
+        HEADER_SIZE, socket.CMSG_SPACE(MAX_FDS * fds.itemsize))
+    for level, type_, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            cmsg_data = cmsg_data[:len(cmsg_data)
+                                  - (len(cmsg_data) % fds.itemsize)]
+            fds.frombytes(cmsg_data)
+    if not data:
+        return None, list(fds)
+    while len(data) < HEADER_SIZE:
+        data += _recv(sock, HEADER_SIZE - len(data))
+    size, = struct.unpack('!I', data[:HEADER_SIZE])
+    data = data[HEADER_SIZE:]
+    while len(data) < size:
+        data += _recv(sock, size - len(data))
+    return json.loads(data.decode('utf8')), list(fds)
+
+
+def _recv(sock, size):
+    chunk = sock.recv(size)
+    if not chunk:
+        raise EOFError('Connection closed by the peer.')
+    return chunk
+
+
+#######################################################################
+# Client
+#######################################################################
+
+def connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (IOError, OSError):
+        sock.close()
+        raise
+    return sock
+
+
+def start_daemon(config_dir):
+    """Start a detached daemon for `config_dir`."""
+    env = dict(os.environ)
+    env.pop(DAEMON_ENV_VAR, None)
+    with open(os.devnull, 'r+b') as devnull:
+        subprocess.Popen(
+            [sys.executable, '-m', 'httpie.daemon',
+             '--config-dir', config_dir],
+            stdin=devnull, stdout=devnull, stderr=devnull,
+            env=env, close_fds=True, start_new_session=True,
+        )
+
+
+def connect_or_start(config_dir):
+    """Connect to the daemon, starting it first if it isn't running."""
+    path = get_socket_path(config_dir)
+    try:
+        return connect(path)
+    except (IOError, OSError):
+        pass
+    start_daemon(config_dir)
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(0.01)
+        try:
+            return connect(path)
+        except (IOError, OSError):
+            pass
+    return None
+
+
+def get_stream_encoding(stream):
+    return getattr(stream, 'encoding', None) or 'utf8'
+
+
+def run_client(args, config_dir):
+    """
+    Let the daemon run ``http`` with `args`.
+
+    Return the exit status, or `None` if the daemon isn't available, in
+    which case the request should be run in-process.
+
+    """
+    try:
+        sock = connect_or_start(config_dir)
+    except (IOError, OSError):
+        sock = None
+    if sock is None:
+        return None
+
+    fds = [sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()]
+    tty_fd = None
+    accepted = False
+    try:
+        # For password prompts (the daemon has no controlling terminal).
+        tty_fd = os.open('/dev/tty', os.O_RDWR | os.O_NOCTTY)
+        fds.append(tty_fd)
+    except (IOError, OSError):
+        pass
+
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        send_message(sock, {
+            'protocol': PROTOCOL_VERSION,
+            'httpie': __version__,
+            'prog': os.path.basename(sys.argv[0]),
+            'args': args,
+            'cwd': os.getcwd(),
+            'environ': dict(os.environ),
+            'stdin_encoding': get_stream_encoding(sys.stdin),
+            'stdout_encoding': get_stream_encoding(sys.stdout),
+        }, fds=fds)
+        if tty_fd is not None:
+            os.close(tty_fd)
+        while True:
+            try:
+                reply, _ = receive_message(sock)
+            except KeyboardInterrupt:
+                # Let the daemon handle it as if it was in-process.
+                sock.sendall(MESSAGE_INTERRUPT)
+                continue
+            if reply is not None and reply.get('accepted'):
+                accepted = True
+                continue
+            break
+        if reply is None:
+            return get_lost_exit_status(accepted)
+        return reply['exit_status']
+    except (IOError, OSError, EOFError, ValueError):
+        return get_lost_exit_status(accepted)
+    finally:
+        sock.close()
+
+
+def get_lost_exit_status(accepted):
+    """
+    Return the exit status of a request whose daemon went away without
+    replying: `None` (run it in-process) if the daemon hadn't started it,
+    since then it hasn't been sent, and an error otherwise.
+
+    """
+    if not accepted:
+        return None
+    from httpie import ExitStatus
+    sys.stderr.write('\nhttp: error: The HTTPie daemon stopped while'
+                     ' running the request.\n')
+    return ExitStatus.ERROR
+
+
+def stop_daemon(config_dir):
+    """Ask the daemon to exit. Return `True` if it was running."""
+    try:
+        sock = connect(get_socket_path(config_dir))
+    except (IOError, OSError):
+        return False
+    try:
+        send_message(sock, {'protocol': PROTOCOL_VERSION, 'stop': True})
+        receive_message(sock)
+    except (IOError, OSError, EOFError, ValueError):
+        pass
+    finally:
+        sock.close()
+    return True
+
+
+#######################################################################
+# Server
+#######################################################################
+
+def tty_getpass(tty, prompt='Password: '):
+    """Like `getpass.getpass()`, but for the given terminal file."""
+    import termios
+    fd = tty.fileno()
+    old = termios.tcgetattr(fd)
+    new = list(old)
+    new[3] &= ~termios.ECHO
+    tty.write(prompt)
+    tty.flush()
+    try:
+        termios.tcsetattr(fd, termios.TCSAFLUSH, new)
+        password = tty.readline()
+    finally:
+        termios.tcsetattr(fd, termios.TCSAFLUSH, old)
+        tty.write('\n')
+        tty.flush()
+    return password.rstrip('\n')
+
+
+class InterruptWatcher(threading.Thread):
+    """
+    Turn interrupt messages from the client (and its disconnection) into
+    a `KeyboardInterrupt` in the main thread, which runs the request.
+
+    """
+
+    def __init__(self, conn):
+        super(InterruptWatcher, self).__init__()
+        self.daemon = True
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.finished = False
+
+    def run(self):
+        try:
+            self.conn.recv(len(MESSAGE_INTERRUPT))
+        except (IOError, OSError):
+            pass
+        with self.lock:
+            if not self.finished:
+                import signal
+                os.kill(os.getpid(), signal.SIGINT)
+
+    def finish(self):
+        with self.lock:
+            self.finished = True
+
+
+class Daemon(object):
+
+    def __init__(self, config_dir, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.config_dir = config_dir
+        self.path = get_socket_path(config_dir)
+        self.idle_timeout = idle_timeout
+        self.sock = None
+
+    def bind(self):
+        """Return `False` if another daemon is already running."""
+        try:
+            connect(self.path).close()
+            return False
+        except (IOError, OSError):
+            pass
+        try:
+            os.makedirs(self.config_dir, mode=0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        sock.listen(16)
+        self.sock = sock
+        return True
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def serve_forever(self):
+        import signal
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        # Warm up.
+        import httpie.core  # noqa
+        import httpie.cli  # noqa
+        from httpie.plugins import plugin_manager
+        plugin_manager.load_installed_plugins(config_dir=self.config_dir)
+
+        self.sock.settimeout(self.idle_timeout)
+        try:
+            while True:
+                try:
+                    conn, address = self.sock.accept()
+                except socket.timeout:
+                    break
+                # Don't let a stuck client block the daemon.
+                conn.settimeout(STARTUP_TIMEOUT)
+                try:
+                    if not self.handle(conn):
+                        break
+                finally:
+                    conn.close()
+        finally:
+            self.close()
+
+    def handle(self, conn):
+        """Handle a single client. Return `False` to stop the daemon."""
+        try:
+            message, fds = receive_message(conn)
+        except (IOError, OSError, EOFError, ValueError):
+            return True
+        if message is None:
+            # E.g., another daemon checking whether this one is running.
+            return True
+        try:
+            if message.get('protocol') != PROTOCOL_VERSION:
+                # An incompatible client. It falls back to running the
+                # request in-process, and the daemon makes way for a new one.
+                return False
+            if message.get('stop'):
+                send_message(conn, {'stopped': True})
+                return False
+            if message.get('httpie') != __version__:
+                return False
+            conn.settimeout(None)
+            watcher = InterruptWatcher(conn)
+            watcher.start()
+            accepted = []
+
+            def accept():
+                send_message(conn, {'accepted': True})
+                accepted.append(True)
+
+            try:
+                exit_status = self.run_request(message, fds, accept)
+            except Exception:
+                if not accepted:
+                    raise
+                # The request may have been sent already, so the client
+                # must not run it again.
+                from httpie import ExitStatus
+                exit_status = ExitStatus.ERROR
+            finally:
+                watcher.finish()
+            send_message(conn, {'exit_status': exit_status})
+        except Exception:
+            # The request couldn't be set up (e.g., the client's working
+            # directory no longer exists). The client gets no reply and
+            # runs the request in-process instead.
+            pass
+        finally:
+            for fd in fds:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            del fds[:]
+        return True
+
+    def run_request(self, message, fds, accept):
+        """Run the request in the client's environment, calling `accept()`
+        once it's set up, just before running it."""
+        import getpass
+        import traceback
+        from httpie import ExitStatus
+        from httpie.core import main
+        from httpie.context import Environment
+        from httpie.cli import parser
+
+        stdin_fd, stdout_fd, stderr_fd = fds[:3]
+        tty_fd = fds[3] if len(fds) > 3 else None
+        stdin = open(stdin_fd, 'r', closefd=False,
+                     encoding=message['stdin_encoding'])
+        stdout_isatty = os.isatty(stdout_fd)
+        # Line-buffered, like the actual standard streams.
+        stdout = open(stdout_fd, 'w', buffering=1 if stdout_isatty else -1,
+                      encoding=message['stdout_encoding'], closefd=False)
+        stderr = open(stderr_fd, 'w', buffering=1,
+                      encoding=message['stdout_encoding'], closefd=False)
+        tty = None
+        if tty_fd is not None:
+            tty = open(tty_fd, 'w+', closefd=False)
+
+        env = Environment(
+            config_dir=self.config_dir,
+            stdin=stdin,
+            stdin_isatty=os.isatty(stdin_fd),
+            stdout=stdout,
+            stdout_isatty=stdout_isatty,
+            stderr=stderr,
+            stderr_isatty=os.isatty(stderr_fd),
+        )
+
+        saved_streams = sys.stdin, sys.stdout, sys.stderr
+        saved_environ = dict(os.environ)
+        saved_getpass = getpass.getpass
+        saved_prog = parser.prog
+        try:
+            parser.prog = message['prog']
+            os.chdir(message['cwd'])
+            os.environ.clear()
+            os.environ.update(message['environ'])
+            sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+            if tty is not None:
+                getpass.getpass = lambda prompt='Password: ', stream=None: \
+                    tty_getpass(tty, prompt)
+            accept()
+            try:
+                exit_status = main(args=message['args'], env=env)
+            except KeyboardInterrupt:
+                # With --traceback.
+                traceback.print_exc()
+                exit_status = ExitStatus.ERROR
+            except SystemExit as e:
+                exit_status = e.code if isinstance(e.code, int) else 1
+            except Exception:
+                traceback.print_exc()
+                exit_status = ExitStatus.ERROR
+            for stream in [env.stdout, stdout, stderr]:
+                try:
+                    stream.flush()
+                except (IOError, OSError, ValueError):
+                    pass
+            return exit_status
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = saved_streams
+            getpass.getpass = saved_getpass
+            parser.prog = saved_prog
+            os.environ.clear()
+            os.environ.update(saved_environ)
+            os.chdir('/')
+            for stream in [stdin, stdout, stderr, tty]:
+                if stream is not None:
+                    try:
+                        stream.close()
+                    except (IOError, OSError, ValueError):
+                        pass
+
+
+def main(args=None):
+    import argparse
+    from httpie.config import DEFAULT_CONFIG_DIR
+
+    parser = argparse.ArgumentParser(
+        prog='python -m httpie.daemon',
+        description='Run HTTPie requests for thin clients '
+                    '(enabled with %s=1).' % DAEMON_ENV_VAR)
+    parser.add_argument('--config-dir', default=DEFAULT_CONFIG_DIR)
+    parser.add_argument('--stop', action='store_true',
+                        help='stop the running daemon')
+    parser.add_argument(
+        '--idle-timeout', type=float,
+        default=float(os.environ.get(IDLE_TIMEOUT_ENV_VAR,
+                                     DEFAULT_IDLE_TIMEOUT)),
+        help='exit after being idle for this many seconds')
+    args = parser.parse_args(args)
+
+    if args.stop:
+        return 0 if stop_daemon(args.config_dir) else 1
+
+    daemon = Daemon(config_dir=args.config_dir,
+                    idle_timeout=args.idle_timeout)
+    if not daemon.bind():
+        sys.stderr.write('http: daemon already running\n')
+        return 1
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+A hand-written parser for the most common invocations.
+
+Building the full `httpie.cli.parser` (with all its help texts) and running
+`argparse` over the arguments is a noticeable part of the start-up time,
+yet most invocations look like ``http [flags] [METHOD] URL [ITEM ...]``
+with a few common flags. `FastPathParser` handles exactly those, producing
+the same raw namespace that `argparse` would, and then runs the very same
+post-processing (`Parser.parse_args`).
+
+For anything it doesn't recognize, or when anything goes wrong, it raises
+`FallbackToFullParser`, so that the full parser can handle the arguments
+(and report errors) instead.
+
+The option definitions and defaults here mirror `httpie.cli`;
+`tests/test_fastparser.py` checks that they agree.
+
+"""
+# noinspection PyCompatibility
+from argparse import Namespace, ArgumentError, ArgumentTypeError
+
+from httpie.client import ENGINES, ENGINE_REQUESTS
+from httpie.input import (Parser, KeyValueArgType, AuthCredentialsArgType,
+                          SessionNameValidator, readable_file_arg, resolve_arg,
+                          keepalive_arg, retry_on_arg, SEP_GROUP_ALL_ITEMS,
+                          SEP_CREDENTIALS, SEP_PROXY,
+                          OUT_RESP_HEAD, OUT_RESP_BODY, OUTPUT_OPTIONS,
+                          PRETTY_MAP, PRETTY_STDOUT_TTY_ONLY)
+from httpie.output.formatters.styles import AVAILABLE_STYLES, DEFAULT_STYLE
+from httpie.plugins import plugin_manager
+from httpie.retries import DEFAULT_BACKOFF, DEFAULT_BUDGET, DEFAULT_RETRY_ON
+from httpie.timings import TIMINGS_FORMAT_TEXT, TIMINGS_FORMATS
+
+
+class FallbackToFullParser(Exception):
+    """The arguments need to be parsed by the full parser."""
+
+
+STORE = 'store'
+STORE_TRUE = 'store_true'
+STORE_CONST = 'store_const'
+APPEND = 'append'
+
+
+def choices(*values):
+    def check(value):
+        if value not in values:
+            raise ValueError(value)
+        return value
+    return check
+
+
+def check_style(value):
+    if value not in AVAILABLE_STYLES:
+        raise ValueError(value)
+    return value
+
+
+def check_auth_type(value):
+    if value not in plugin_manager.get_auth_plugin_mapping():
+        raise ValueError(value)
+    return value
+
+
+_session_name_validator = SessionNameValidator(
+    'Session name contains invalid characters.')
+
+# (option strings, dest, action, type or const)
+OPTIONS = [
+    (['--json', '-j'], 'json', STORE_TRUE, None),
+    (['--form', '-f'], 'form', STORE_TRUE, None),
+    (['--pretty'], 'prettify', STORE, choices(*PRETTY_MAP)),
+    (['--style', '-s'], 'style', STORE, check_style),
+    (['--print', '-p'], 'output_options', STORE, str),
+    (['--verbose', '-v'], 'output_options', STORE_CONST,
+     ''.join(OUTPUT_OPTIONS)),
+    (['--headers', '-h'], 'output_options', STORE_CONST, OUT_RESP_HEAD),
+    (['--body', '-b'], 'output_options', STORE_CONST, OUT_RESP_BODY),
+    (['--stream', '-S'], 'stream', STORE_TRUE, None),
+    (['--session'], 'session', STORE, _session_name_validator),
+    (['--session-read-only'], 'session_read_only', STORE,
+     _session_name_validator),
+    (['--auth', '-a'], 'auth', STORE, AuthCredentialsArgType(SEP_CREDENTIALS)),
+    (['--auth-type'], 'auth_type', STORE, check_auth_type),
+    (['--proxy'], 'proxy', APPEND, KeyValueArgType(SEP_PROXY)),
+    (['--follow'], 'follow', STORE_TRUE, None),
+    (['--verify'], 'verify', STORE, str),
+    (['--cert'], 'cert', STORE, readable_file_arg),
+    (['--cert-key'], 'cert_key', STORE, readable_file_arg),
+    (['--resolve'], 'resolve', APPEND, resolve_arg),
+    (['--dns-cache-ttl'], 'dns_cache_ttl', STORE, float),
+    (['--timeout'], 'timeout', STORE, float),
+    (['--engine'], 'engine', STORE, choices(*ENGINES)),
+    (['--pool-connections'], 'pool_connections', STORE, int),
+    (['--pool-maxsize'], 'pool_maxsize', STORE, int),
+    (['--pool-block'], 'pool_block', STORE_TRUE, None),
+    (['--tcp-nodelay'], 'tcp_nodelay', STORE, choices('yes', 'no')),
+    (['--tcp-keepalive'], 'tcp_keepalive', STORE, keepalive_arg),
+    (['--socket-send-buffer'], 'socket_send_buffer', STORE, int),
+    (['--socket-recv-buffer'], 'socket_recv_buffer', STORE, int),
+    (['--max-retries'], 'max_retries', STORE, int),
+    (['--retry-on'], 'retry_on', STORE, retry_on_arg),
+    (['--retry-backoff'], 'retry_backoff', STORE, float),
+    (['--retry-budget'], 'retry_budget', STORE, float),
+    (['--check-status'], 'check_status', STORE_TRUE, None),
+    (['--ignore-stdin'], 'ignore_stdin', STORE_TRUE, None),
+    (['--traceback'], 'traceback', STORE_TRUE, None),
+    (['--debug'], 'debug', STORE_TRUE, None),
+    (['--timings'], 'timings', STORE_TRUE, None),
+    (['--timings-format'], 'timings_format', STORE,
+     choices(*TIMINGS_FORMATS)),
+]
+
+OPTIONS_BY_STRING = {
+    option_string: (dest, action, arg)
+    for option_strings, dest, action, arg in OPTIONS
+    for option_string in option_strings
+}
+
+# The defaults of all the `httpie.cli` arguments (incl. the unsupported
+# ones, e.g., `--download`). `auth_type` is filled in at parse time.
+DEFAULTS = {
+    'method': None,
+    'url': None,
+    'items': None,
+    'json': False,
+    'form': False,
+    'prettify': PRETTY_STDOUT_TTY_ONLY,
+    'style': DEFAULT_STYLE,
+    'output_options': None,
+    'stream': False,
+    'output_file': None,
+    'download': False,
+    'download_resume': False,
+    'batch': None,
+    'parallel': 1,
+    'parallel_per_host': None,
+    'unordered': False,
+    'pipeline': 1,
+    'bench': False,
+    'requests': 1,
+    'concurrency': 1,
+    'bench_format': 'text',
+    'session': None,
+    'session_read_only': None,
+    'auth': None,
+    'auth_type': None,
+    'proxy': [],
+    'follow': False,
+    'verify': 'yes',
+    'cert': None,
+    'cert_key': None,
+    'resolve': [],
+    'dns_cache_ttl': 0,
+    'timeout': 30,
+    'engine': ENGINE_REQUESTS,
+    'pool_connections': None,
+    'pool_maxsize': None,
+    'pool_block': False,
+    'tcp_nodelay': 'yes',
+    'tcp_keepalive': None,
+    'socket_send_buffer': None,
+    'socket_recv_buffer': None,
+    'max_retries': 0,
+    'retry_on': retry_on_arg(DEFAULT_RETRY_ON),
+    'retry_backoff': DEFAULT_BACKOFF,
+    'retry_budget': DEFAULT_BUDGET,
+    'check_status': False,
+    'ignore_stdin': False,
+    'traceback': False,
+    'debug': False,
+    'timings': False,
+    'timings_format': TIMINGS_FORMAT_TEXT,
+}
+
+ITEM_ARG_TYPE = KeyValueArgType(*SEP_GROUP_ALL_ITEMS)
+
+
+def get_defaults():
+    defaults = dict(DEFAULTS, proxy=[], resolve=[])
+    defaults['auth_type'] = plugin_manager.get_auth_plugins()[0].auth_type
+    return defaults
+
+
+class FastPathParser(Parser):
+    """
+    A `Parser` that parses the common invocations without `argparse`.
+
+    It has no arguments of its own; `parse_known_args()` parses the options
+    listed in `OPTIONS` by hand, and any `error()` there means the full
+    parser is needed. Once they're parsed, the fast path is committed to:
+    processing them has side effects (opening files, reading stdin,
+    prompting for a password) that mustn't happen twice, so an `error()`
+    then is reported the way the full parser reports it.
+
+    """
+
+    processing = False
+
+    def parse_known_args(self, args=None, namespace=None):
+        self.processing = False
+        namespace = Namespace(**get_defaults())
+        positionals = []
+        positionals_finished = False
+        args = list(args)
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            i += 1
+            if not arg.startswith('-') or arg == '-':
+                if positionals_finished:
+                    # Positionals interleaved with options.
+                    raise FallbackToFullParser()
+                positionals.append(arg)
+                continue
+
+            if positionals:
+                positionals_finished = True
+            option_string, sep, value = arg.partition('=')
+            if sep and not option_string.startswith('--'):
+                # E.g., `-p=Hh`.
+                raise FallbackToFullParser()
+            try:
+                dest, action, arg_type = OPTIONS_BY_STRING[option_string]
+            except KeyError:
+                # Includes combined short flags, abbreviations,
+                # `--no-OPTION`, `--` and all the other options.
+                raise FallbackToFullParser()
+
+            if action == STORE_TRUE:
+                if sep:
+                    raise FallbackToFullParser()
+                setattr(namespace, dest, True)
+            elif action == STORE_CONST:
+                if sep:
+                    raise FallbackToFullParser()
+                setattr(namespace, dest, arg_type)
+            else:
+                if not sep:
+                    if i == len(args) or args[i].startswith('-'):
+                        raise FallbackToFullParser()
+                    value = args[i]
+                    i += 1
+                value = self._convert(arg_type, value)
+                if action == APPEND:
+                    getattr(namespace, dest).append(value)
+                else:
+                    setattr(namespace, dest, value)
+
+        if namespace.session and namespace.session_read_only:
+            # Mutually exclusive.
+            raise FallbackToFullParser()
+
+        # METHOD is optional, URL is required, and ITEMs are optional.
+        if not positionals:
+            raise FallbackToFullParser()
+        if len(positionals) > 1:
+            namespace.method = positionals.pop(0)
+        namespace.url = positionals.pop(0)
+        namespace.items = [self._convert(ITEM_ARG_TYPE, item)
+                           for item in positionals]
+        self.processing = True
+        return namespace, []
+
+    def _convert(self, arg_type, value):
+        try:
+            return arg_type(value)
+        except (ArgumentError, ArgumentTypeError, ValueError, TypeError):
+            raise FallbackToFullParser()
+
+    def error(self, message):
+        if self.processing:
+            from httpie.cli import parser
+            parser.env = self.env
+            parser.error(message)
+        raise FallbackToFullParser(message)
+
+
+parser = FastPathParser()
@@ -0,0 +1,477 @@
+"""
+An HTTP/2 transport built on the `asyncio` engine (``--engine=h2``).
+
+HTTPS connections offer ``h2`` through ALPN. Origins that pick HTTP/1.1
+instead are remembered, and their requests are sent by the `asyncio`
+engine (the connection that was opened isn't wasted, it becomes an idle
+connection of its pool). Plain HTTP connections speak HTTP/2 right away
+("prior knowledge" h2c), as there's no negotiation without TLS. Servers
+that don't answer with their HTTP/2 connection preface (e.g., they respond
+``505 HTTP Version Not Supported``, or close the connection) are remembered
+too, and their requests are sent with HTTP/1.1. The first request to them
+is sent only once the preface is received, so it never reaches them.
+
+All the requests to an origin share a single connection, each one on
+its own stream, so concurrent requests (e.g., with ``--batch`` and
+``--parallel``) are multiplexed on it. The response body of each stream
+is read through the same `httpie.aio.ResponseBody` as with HTTP/1.1.
+
+It requires the `h2` package (``pip install httpie[http2]``).
+
+"""
+import asyncio
+import http.client
+import socket
+from collections import deque
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+    from h2.errors import ErrorCodes
+except ImportError:
+    h2 = None
+
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from httpie.aio import (AsyncioAdapter, Connection, ConnectionPool,
+                        ResponseHead, get_timeouts, iter_request_body,
+                        run, get_loop, NO_BODY_METHODS, NO_BODY_STATUSES)
+from httpie.tls import save_session
+
+
+ALPN_PROTOCOLS = ('h2', 'http/1.1')
+
+# Connection-specific headers, which HTTP/2 forbids (RFC 7540, 8.1.2.2).
+CONNECTION_HEADERS = frozenset([
+    'connection', 'host', 'keep-alive', 'proxy-connection',
+    'transfer-encoding', 'upgrade',
+])
+
+READ_SIZE = 64 * 1024
+
+
+class HTTP2Unavailable(Exception):
+    """The `h2` package isn't installed."""
+
+
+def get_request_headers(request, url):
+    """Return the HTTP/2 headers of `request`, pseudo-headers first."""
+    authority = request.headers.get('Host') or url.netloc.rsplit('@', 1)[-1]
+    if isinstance(authority, bytes):
+        authority = authority.decode('iso-8859-1')
+    headers = [
+        (':method', request.method),
+        (':scheme', url.scheme.lower()),
+        (':authority', authority),
+        (':path', request.path_url),
+    ]
+    for name, value in request.headers.items():
+        if isinstance(name, bytes):
+            name = name.decode('iso-8859-1')
+        name = name.lower()
+        if name in CONNECTION_HEADERS:
+            continue
+        if name == 'te' and value.lower() not in ('trailers', b'trailers'):
+            continue
+        headers.append((name, value))
+    return headers
+
+
+def get_response_head(headers):
+    """Return a `ResponseHead` for the HTTP/2 response `headers`."""
+    msg = http.client.HTTPMessage()
+    status = None
+    for name, value in headers:
+        name = name.decode('ascii')
+        value = value.decode('iso-8859-1')
+        if name == ':status':
+            status = int(value)
+        elif not name.startswith(':'):
+            msg[name] = value
+    if status is None:
+        raise http.client.BadStatusLine('Missing :status in the response')
+    return ResponseHead(20, status, http.client.responses.get(status, ''),
+                        msg)
+
+
+class Stream(object):
+    """A request-response exchange on an `HTTP2Connection`.
+
+    It's the "connection" of the `httpie.aio.ResponseBody` of the response.
+
+    """
+
+    def __init__(self, connection, stream_id):
+        self.connection = connection
+        self.stream_id = stream_id
+        self.headers = None
+        self.data = deque()
+        self.ended = False
+        self.error = None
+        self.read_timeout = None
+        self._changed = asyncio.Event()
+
+    def changed(self):
+        self._changed.set()
+
+    async def _wait(self, ready, timeout):
+        while not ready() and self.error is None:
+            self._changed.clear()
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        if self.error is not None and not ready():
+            raise self.error
+
+    async def send_body(self, data, end_stream=True):
+        await self.connection.send_data(self, data, end_stream)
+
+    async def read_head(self, request, read_timeout):
+        self.read_timeout = read_timeout
+        try:
+            await self._wait(lambda: self.headers is not None, read_timeout)
+        except asyncio.TimeoutError as e:
+            self.close()
+            raise ReadTimeout(e, request=request)
+        except (OSError, http.client.HTTPException) as e:
+            raise ConnectionError(e, request=request)
+        head = get_response_head(self.headers)
+        head.ssl_object = self.connection.ssl_object
+        head.complete = (
+            request.method in NO_BODY_METHODS
+            or head.status in NO_BODY_STATUSES
+            or (self.ended and not self.data)
+        )
+        if head.complete:
+            self.close()
+        return head
+
+    async def read_body(self, size):
+        """Return `(data, complete)`, like `httpie.aio.Connection`."""
+        try:
+            await self._wait(lambda: self.data or self.ended,
+                             self.read_timeout)
+        except asyncio.TimeoutError:
+            self.close()
+            # `urllib3` turns it into a `ReadTimeoutError`.
+            raise socket.timeout('Read timed out.')
+        data = b''
+        if self.data:
+            data = self.data.popleft()
+            if len(data) > size:
+                self.data.appendleft(data[size:])
+                data = data[:size]
+            self.connection.acknowledge(self, len(data))
+        complete = self.ended and not self.data
+        if complete:
+            self.close()
+        return data, complete
+
+    def close(self):
+        """Reset the stream, unless the response is complete."""
+        self.connection.close_stream(self)
+
+    def close_threadsafe(self):
+        get_loop().call_soon_threadsafe(self.close)
+
+
+class HTTP2Connection(object):
+    """An HTTP/2 connection multiplexing `Stream`s.
+
+    All its methods run on the event loop. Frames are read by a task of
+    its own, which dispatches the events to the streams.
+
+    """
+
+    def __init__(self, pool, key, reader, writer):
+        self.pool = pool
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.ssl_object = writer.get_extra_info('ssl_object')
+        self.streams = {}
+        self.closed = False
+        self.error = None
+        # Set once the server's connection preface (SETTINGS) is received,
+        # or the connection is closed.
+        self.preface_received = False
+        self._preface = asyncio.Event()
+        # Notified when streams close and flow control windows open.
+        self._changed = asyncio.Condition()
+        self.h2 = h2.connection.H2Connection(config=h2.config.H2Configuration(
+            client_side=True, header_encoding=None))
+        self.h2.initiate_connection()
+        self._flush()
+        self._reader_task = asyncio.get_running_loop().create_task(
+            self._read_frames())
+
+    @property
+    def is_usable(self):
+        return not (self.closed or self.writer.is_closing()
+                    or self.h2.highest_outbound_stream_id
+                    and self.h2.highest_outbound_stream_id >= 2 ** 31 - 3)
+
+    async def wait_for_preface(self, timeout):
+        """
+        Return whether the server has answered with its connection preface,
+        i.e., whether it speaks HTTP/2, once it has answered or closed the
+        connection. Raise `asyncio.TimeoutError` after `timeout` seconds.
+
+        """
+        await asyncio.wait_for(self._preface.wait(), timeout)
+        return self.preface_received
+
+    def _flush(self):
+        data = self.h2.data_to_send()
+        if data:
+            self.writer.write(data)
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def open_stream(self, headers, end_stream):
+        """Send the request `headers` on a new stream and return it."""
+        async with self._changed:
+            await self._changed.wait_for(
+                lambda: self.closed or self.h2.open_outbound_streams
+                < self.h2.remote_settings.max_concurrent_streams)
+        if self.closed:
+            raise self.error or ConnectionResetError('Connection closed')
+        stream_id = self.h2.get_next_available_stream_id()
+        stream = self.streams[stream_id] = Stream(self, stream_id)
+        self.h2.send_headers(stream_id, headers, end_stream=end_stream)
+        self._flush()
+        await self.writer.drain()
+        return stream
+
+    async def send_data(self, stream, data, end_stream):
+        """Send `data` on `stream`, as the flow control windows allow."""
+        view = memoryview(data)
+        while view or end_stream:
+            if self.closed:
+                raise self.error or ConnectionResetError('Connection closed')
+            if stream.error is not None:
+                # E.g., the server has responded without reading the body.
+                return
+            size = min(len(view), self.h2.max_outbound_frame_size,
+                       self.h2.local_flow_control_window(stream.stream_id))
+            if view and size <= 0:
+                async with self._changed:
+                    await self._changed.wait()
+                continue
+            last = end_stream and size == len(view)
+            self.h2.send_data(stream.stream_id, view[:size].tobytes(),
+                              end_stream=last)
+            self._flush()
+            await self.writer.drain()
+            view = view[size:]
+            if last:
+                break
+
+    def acknowledge(self, stream, size):
+        """Open the flow control windows for `size` bytes read."""
+        if not self.closed and size:
+            self.h2.acknowledge_received_data(size, stream.stream_id)
+            self._flush()
+
+    def close_stream(self, stream):
+        if self.streams.pop(stream.stream_id, None) is None:
+            return
+        if not stream.ended and not self.closed:
+            try:
+                self.h2.reset_stream(stream.stream_id,
+                                     error_code=ErrorCodes.CANCEL)
+            except h2.exceptions.StreamClosedError:
+                pass
+            self._flush()
+        asyncio.get_running_loop().create_task(self._notify())
+
+    async def _read_frames(self):
+        error = None
+        try:
+            while True:
+                data = await self.reader.read(READ_SIZE)
+                if not data:
+                    error = ConnectionResetError(
+                        'Remote end closed the connection')
+                    break
+                try:
+                    events = self.h2.receive_data(data)
+                except h2.exceptions.ProtocolError as e:
+                    error = http.client.HTTPException(e)
+                    self._flush()
+                    break
+                for event in events:
+                    self._handle(event)
+                self._flush()
+                if self.closed:
+                    break
+                await self._notify()
+        except OSError as e:
+            error = e
+        finally:
+            self.close(error)
+
+    def _handle(self, event):
+        stream = self.streams.get(getattr(event, 'stream_id', None))
+        if isinstance(event, h2.events.RemoteSettingsChanged):
+            self.preface_received = True
+            self._preface.set()
+        elif isinstance(event, h2.events.ResponseReceived):
+            if stream is not None:
+                stream.headers = event.headers
+        elif isinstance(event, h2.events.DataReceived):
+            if stream is not None:
+                stream.data.append(event.data)
+                # Padding counts towards flow control, but isn't data.
+                padding = event.flow_controlled_length - len(event.data)
+                if padding:
+                    self.h2.acknowledge_received_data(padding,
+                                                      event.stream_id)
+            elif event.flow_controlled_length:
+                self.h2.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded):
+            if stream is not None:
+                stream.ended = True
+        elif isinstance(event, h2.events.StreamReset):
+            if stream is not None and not stream.ended:
+                stream.error = ConnectionResetError(
+                    'Stream reset by the server (error code %s)'
+                    % event.error_code)
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.error = ConnectionResetError(
+                'Connection closed by the server (error code %s)'
+                % event.error_code)
+            self.closed = True
+            # Streams the server hasn't processed can be retried.
+            for stream_id, other in self.streams.items():
+                if stream_id > (event.last_stream_id or 0):
+                    other.error = self.error
+        if stream is not None:
+            stream.changed()
+
+    def close(self, error=None):
+        if self.error is None:
+            self.error = error or ConnectionResetError('Connection closed')
+        self.closed = True
+        self._preface.set()
+        for stream in self.streams.values():
+            if not stream.ended and stream.error is None:
+                stream.error = self.error
+            stream.changed()
+        self.pool.discard(self)
+        if self.ssl_object is not None:
+            save_session(self.ssl_object)
+        if not self.writer.is_closing():
+            self.writer.close()
+        if asyncio.current_task() is not self._reader_task:
+            self._reader_task.cancel()
+        asyncio.get_running_loop().create_task(self._notify())
+
+
+class HTTP2ConnectionPool(ConnectionPool):
+    """
+    An `HTTP2Connection` by key, and the idle HTTP/1.1 connections
+    of the origins that don't support HTTP/2.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(HTTP2ConnectionPool, self).__init__(*args, **kwargs)
+        self.connections = {}
+        self.http1_keys = set()
+        self._locks = {}
+
+    async def get_http2(self, request, key, ssl_context, connect_timeout):
+        """
+        Return the HTTP/2 connection to `key`, or `None` when the server
+        only speaks HTTP/1.1.
+
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key in self.http1_keys:
+                return None
+            connection = self.connections.get(key)
+            if connection is not None and connection.is_usable:
+                self.num_requests += 1
+                return connection
+            reader, writer = await self.connect(
+                request, key, ssl_context, connect_timeout)
+            self.num_requests += 1
+            ssl_object = writer.get_extra_info('ssl_object')
+            if (ssl_object is not None
+                    and ssl_object.selected_alpn_protocol() != 'h2'):
+                self.http1_keys.add(key)
+                self.num_requests -= 1
+                self.put(Connection(self, key, reader, writer))
+                return None
+            connection = HTTP2Connection(self, key, reader, writer)
+            if ssl_object is None:
+                # h2c: without ALPN, the server's connection preface tells
+                # whether it speaks HTTP/2.
+                try:
+                    is_http2 = await connection.wait_for_preface(
+                        connect_timeout)
+                except asyncio.TimeoutError:
+                    connection.close()
+                    raise ConnectionError(
+                        'The server did not answer the HTTP/2 connection'
+                        ' preface; it may not support HTTP/2 without TLS'
+                        ' (h2c)', request=request)
+                if not is_http2:
+                    connection.close()
+                    self.http1_keys.add(key)
+                    self.num_requests -= 1
+                    return None
+            self.connections[key] = connection
+            return connection
+
+    def discard(self, connection):
+        if self.connections.get(connection.key) is connection:
+            del self.connections[connection.key]
+
+
+class HTTP2Adapter(AsyncioAdapter):
+    """A transport adapter sending HTTP/2 requests through `asyncio`."""
+
+    pool_class = HTTP2ConnectionPool
+
+    def __init__(self, *args, **kwargs):
+        if h2 is None:
+            raise HTTP2Unavailable(
+                'HTTP/2 requires the "h2" package: pip install httpie[http2]')
+        super(HTTP2Adapter, self).__init__(*args, **kwargs)
+
+    def exchange(self, request, url, key, timeout):
+        connect_timeout, read_timeout = get_timeouts(timeout)
+        ssl_context = self.get_ssl_context(request, key,
+                                           protocols=ALPN_PROTOCOLS)
+        connection = run(self.pool.get_http2(
+            request, key, ssl_context, connect_timeout))
+        if connection is None:
+            return super(HTTP2Adapter, self).exchange(
+                request, url, key, timeout)
+        stream = self._send(request, url, connection)
+        return stream, run(stream.read_head(request, read_timeout))
+
+    def _send(self, request, url, connection):
+        body = request.body
+        headers = get_request_headers(request, url)
+        try:
+            stream = run(connection.open_stream(headers,
+                                                end_stream=not body))
+            if body:
+                if isinstance(body, str):
+                    body = body.encode('iso-8859-1')
+                if isinstance(body, bytes):
+                    run(stream.send_body(body))
+                else:
+                    for chunk in iter_request_body(body, chunked=False):
+                        run(stream.send_body(chunk, end_stream=False))
+                    run(stream.send_body(b''))
+        except OSError as e:
+            raise ConnectionError(e, request=request)
+        return stream
@@ -7,17 +7,20 @@ import re
 import errno
 import mimetypes
 import getpass
-from io import BytesIO
 from collections import namedtuple, Iterable
 # noinspection PyCompatibility
-from argparse import ArgumentParser, ArgumentTypeError, ArgumentError
+from argparse import (ArgumentParser, ArgumentTypeError, ArgumentError,
+                      SUPPRESS)
 
 # TODO: Use MultiDict for headers once added to `requests`.
 # https://github.com/jakubroztocil/httpie/issues/130
 from requests.structures import CaseInsensitiveDict
 
 from httpie.compat import OrderedDict, urlsplit, str, is_pypy, is_py27
+from httpie.resolver import is_ip_address
 from httpie.sessions import VALID_SESSION_NAME_PATTERN
+from httpie.uploads import (BODY_PREVIEW_SIZE, MultipartBody,
+                            get_streamed_body)
 from httpie.utils import load_json_preserve_order
 
 
@@ -119,8 +122,7 @@ class Parser(ArgumentParser):
     def parse_args(self, env, args=None, namespace=None):
 
         self.env = env
-        self.args, no_options = super(Parser, self)\
-                .parse_known_args(args, namespace)
+        self.args, no_options = self.parse_known_args(args, namespace)
 
         if self.args.debug:
             self.args.traceback = True
@@ -129,6 +131,8 @@ class Parser(ArgumentParser):
         self._apply_no_options(no_options)
         self._apply_config()
         self._validate_download_options()
+        self._validate_batch_options()
+        self._validate_bench_options()
         self._setup_standard_streams()
         self._process_output_options()
         self._process_pretty_options()
@@ -253,16 +257,42 @@ class Parser(ArgumentParser):
         if invalid:
             self.error(f"unrecognized arguments: {' '.join(invalid)}")
 
-    def _body_from_file(self, fd):
+    def _body_from_file(self, fd, close_fd=False):
         """There can only be one source of request data.
 
-        Bytes are always read.
+        Bytes are always read, and only as the request is sent; see
+        `httpie.uploads`. With `close_fd` (``@file``), `fd` is closed once
+        the request is over.
 
         """
         if self.args.data:
+            if close_fd:
+                fd.close()
             self.error('Request body (from stdin or a file) and request '
                        'data (key=value) cannot be mixed.')
-        self.args.data = getattr(fd, 'buffer', fd).read()
+        body = get_streamed_body(fd, self._get_preview_size(), close_fd)
+        if body is not None:
+            # Otherwise, there's no body (and no JSON defaults).
+            self.args.data = body
+
+    def _multipart_body(self):
+        """Encode `args.data` and `args.files` (``--form``) as they're sent.
+
+        It replaces `requests`' encoding, which reads it all in memory.
+
+        """
+        body = MultipartBody(self.args.data, self.args.files,
+                             preview_size=self._get_preview_size())
+        self.args.data = body
+        self.args.files = {}
+        if 'Content-Type' not in self.args.headers:
+            self.args.headers['Content-Type'] = body.content_type
+
+    def _get_preview_size(self):
+        """Return how much of a streamed body to keep for the output."""
+        if OUT_REQ_BODY in self.args.output_options:
+            return BODY_PREVIEW_SIZE
+        return 0
 
     def _guess_method(self):
         """Set `args.method` if not specified to either POST or GET
@@ -326,6 +356,8 @@ class Parser(ArgumentParser):
             # `http url @/path/to/file`
             file_fields = list(self.args.files.keys())
             if file_fields != ['']:
+                for fn, fd in self.args.files.values():
+                    fd.close()
                 self.error(
                     f"Invalid file fields (perhaps you meant --form?): {','.join(file_fields)}"
                 )
@@ -333,7 +365,7 @@ class Parser(ArgumentParser):
             fn, fd = self.args.files['']
             self.args.files = {}
 
-            self._body_from_file(fd)
+            self._body_from_file(fd, close_fd=True)
 
             if 'Content-Type' not in self.args.headers:
                 mime, encoding = mimetypes.guess_type(fn, strict=False)
@@ -343,6 +375,10 @@ class Parser(ArgumentParser):
                         content_type = f'{mime}; charset={encoding}'
                     self.args.headers['Content-Type'] = content_type
 
+        elif self.args.files:
+            # `http --form url field@/path/to/file`
+            self._multipart_body()
+
     def _process_output_options(self):
         """Apply defaults to output options, or validate the provided ones.
 
@@ -386,6 +422,51 @@ class Parser(ArgumentParser):
             self.error('--continue requires --output to be specified')
 
 
+    def _validate_batch_options(self):
+        # With --batch, these are parsed out of the arguments before
+        # the arguments of each request (see `ModeParser`).
+        if (self.args.parallel != 1 or self.args.parallel_per_host
+                or self.args.unordered or self.args.pipeline != 1):
+            self.error('--parallel, --parallel-per-host, --unordered and'
+                       ' --pipeline only work with --batch')
+
+    def _validate_bench_options(self):
+        # With --bench, these are parsed out of the arguments before
+        # the rest of them (see `ModeParser`).
+        if (self.args.requests != 1 or self.args.concurrency != 1
+                or self.args.bench_format != 'text'):
+            self.error('--requests, --concurrency and --bench-format'
+                       ' only work with --bench')
+
+
+class ModeParser(Parser):
+    """
+    Parses the options of ``--batch`` and ``--bench`` out of the arguments,
+    before (and without) the full parser, as they apply to the whole run
+    rather than to a single request (see `httpie.core.get_mode_parser()`).
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs['usage'] = SUPPRESS
+        # Other options (e.g., ``--re``) mustn't be taken for abbreviations.
+        kwargs['allow_abbrev'] = False
+        super(ModeParser, self).__init__(*args, **kwargs)
+
+    # noinspection PyMethodOverriding
+    def parse_args(self, env, args=None, namespace=None):
+        """Return `(mode_args, remaining_args)`."""
+        self.env = env
+        self.args, remaining_args = self.parse_known_args(args, namespace)
+        if self.args.batch is None:
+            self._validate_batch_options()
+        elif self.args.pipeline > 1 and self.args.parallel > 1:
+            self.error('--pipeline cannot be used with --parallel')
+        if not self.args.bench:
+            self._validate_bench_options()
+        return self.args, remaining_args
+
+
 class ParseError(Exception):
     pass
 
@@ -612,6 +693,21 @@ def parse_items(items,
     params = []
 
     headers = []
+    try:
+        _append_items(items, headers, data, files, params)
+    except ParseError:
+        for name, (filename, fd) in files:
+            fd.close()
+        raise
+
+    return RequestItems(headers_class(headers),
+                        data_class(data),
+                        files_class(files),
+                        params_class(params))
+
+
+def _append_items(items, headers, data, files, params):
+    """Append `items` to the lists of `(key, value)` pairs they belong to."""
     for item in items:
         value = item.value
 
@@ -621,9 +717,9 @@ def parse_items(items,
             target = params
         elif item.sep == SEP_FILES:
             try:
-                with open(os.path.expanduser(value), 'rb') as f:
-                    value = (os.path.basename(value),
-                             BytesIO(f.read()))
+                # Read only as the request is sent (see `httpie.uploads`).
+                value = (os.path.basename(value),
+                         open(os.path.expanduser(value), 'rb'))
             except IOError as e:
                 raise ParseError(f'"{item.orig}": {e}')
             target = files
@@ -653,11 +749,6 @@ def parse_items(items,
 
         target.append((item.key, value))
 
-    return RequestItems(headers_class(headers),
-                        data_class(data),
-                        files_class(files),
-                        params_class(params))
-
 
 def readable_file_arg(filename):
     try:
@@ -665,3 +756,72 @@ def readable_file_arg(filename):
     except IOError as ex:
         raise ArgumentTypeError(f'{filename}: {ex.args[1]}')
     return filename
+
+
+def resolve_arg(value):
+    """
+    Parse a ``--resolve HOST:PORT:ADDRESS`` value into
+    `(host, port, address)`. IPv6 addresses can be in brackets.
+
+    """
+    try:
+        host, port, address = value.split(':', 2)
+        port = int(port)
+    except ValueError:
+        raise ArgumentTypeError(
+            f'{value!r} is not a valid value (HOST:PORT:ADDRESS expected)')
+    if address.startswith('[') and address.endswith(']'):
+        address = address[1:-1]
+    if not host or not is_ip_address(address):
+        raise ArgumentTypeError(
+            f'{value!r} is not a valid value (HOST:PORT:ADDRESS expected)')
+    return host, port, address
+
+
+def positive_int_arg(value):
+    """Parse a number of at least 1, e.g., of ``--parallel``."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ArgumentTypeError(
+            f'{value!r} is not a valid value (a number of at least 1 '
+            f'expected)')
+    return number
+
+
+def keepalive_arg(value):
+    """
+    Parse a ``--tcp-keepalive IDLE[:INTERVAL[:COUNT]]`` value into
+    `(idle, interval, count)`, where the latter two may be `None`.
+
+    """
+    try:
+        parts = [int(part) for part in value.split(':')]
+    except ValueError:
+        parts = []
+    if not 1 <= len(parts) <= 3 or any(part < 1 for part in parts):
+        raise ArgumentTypeError(
+            f'{value!r} is not a valid value (IDLE[:INTERVAL[:COUNT]] '
+            f'expected, in seconds)')
+    return tuple(parts + [None] * (3 - len(parts)))
+
+
+RETRY_CONDITION_RE = re.compile(r'^(connect|read|[1-5]xx|[1-5]\d\d)$')
+
+
+def retry_on_arg(value):
+    """
+    Parse a ``--retry-on`` value, e.g., ``5xx,429,connect,read``, into
+    a tuple of conditions.
+
+    """
+    conditions = tuple(part.strip().lower() for part in value.split(','))
+    for condition in conditions:
+        if not RETRY_CONDITION_RE.match(condition):
+            raise ArgumentTypeError(
+                f'{condition!r} is not a valid retry condition (connect, '
+                f'read, a status code such as 503, or a class such as 5xx '
+                f'expected)')
+    return conditions
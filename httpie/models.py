@@ -1,3 +1,5 @@
+import codecs
+
 from httpie.compat import urlsplit, str
 
 
@@ -93,10 +95,10 @@ class HTTPRequest(HTTPMessage):
     """A :class:`requests.models.Request` wrapper."""
 
     def iter_body(self, chunk_size):
-        yield self.body
+        yield self.body + self.omitted_note
 
     def iter_lines(self, chunk_size):
-        yield self.body, b''
+        yield self.body, self.omitted_note
 
     @property
     def headers(self):
@@ -132,7 +134,25 @@ class HTTPRequest(HTTPMessage):
     @property
     def body(self):
         body = self._orig.body
+        if hasattr(body, 'preview'):
+            # A body streamed from stdin or a file; only its start is kept,
+            # which may end in the middle of a character.
+            omitted, body = body.omitted, body.preview
+            if omitted:
+                try:
+                    body = codecs.getincrementaldecoder('utf8')().decode(
+                        body).encode('utf8')
+                except UnicodeDecodeError:
+                    pass
         if isinstance(body, str):
             # Happens with JSON/form request data parsed from the command line.
             body = body.encode('utf8')
         return body or b''
+
+    @property
+    def omitted_note(self):
+        """A `bytes` note about the end of a streamed body not being shown."""
+        omitted = getattr(self._orig.body, 'omitted', 0)
+        if not omitted:
+            return b''
+        return b'\n\n[%d more bytes not shown]' % omitted
@@ -7,14 +7,9 @@ from pygments.formatters.terminal import TerminalFormatter
 from pygments.formatters.terminal256 import Terminal256Formatter
 from pygments.util import ClassNotFound
 
+from httpie.context import TRUECOLOR
 from httpie.plugins import FormatterPlugin
-
-
-# Colors on Windows via colorama don't look that
-# great and fruity seems to give the best result there.
-AVAILABLE_STYLES = set(pygments.styles.STYLE_MAP.keys())
-AVAILABLE_STYLES.add('solarized')
-DEFAULT_STYLE = 'monokai'
+from httpie.output.formatters.styles import AVAILABLE_STYLES, DEFAULT_STYLE
 
 
 class ColorFormatter(FormatterPlugin):
@@ -41,8 +36,7 @@ class ColorFormatter(FormatterPlugin):
         except ClassNotFound:
             style_class = Solarized256Style
 
-        fmt_class = Terminal256Formatter if env.colors == 256 else TerminalFormatter
-        self.formatter = fmt_class(style=style_class)
+        self.formatter = get_formatter_class(env.colors)(style=style_class)
 
     def format_headers(self, headers):
         return pygments.highlight(headers, HTTPLexer(), self.formatter).strip()
@@ -59,6 +53,22 @@ class ColorFormatter(FormatterPlugin):
         return self.lexer_cache[mime]
 
 
+def get_formatter_class(colors):
+    if colors >= TRUECOLOR:
+        try:
+            # Pygments >= 2.1
+            from pygments.formatters.terminal256 import (
+                TerminalTrueColorFormatter
+            )
+        except ImportError:
+            pass
+        else:
+            return TerminalTrueColorFormatter
+    if colors >= 256:
+        return Terminal256Formatter
+    return TerminalFormatter
+
+
 def get_lexer(mime):
     mime_types, lexer_names = [mime], []
     type_, subtype = mime.split('/')
@@ -0,0 +1,94 @@
+"""
+Pygments color style names, available without importing Pygments.
+
+Importing Pygments is one of the most expensive parts of HTTPie's start-up,
+yet the style names are needed on every run to validate ``--style``.
+They are therefore read from a small generated module, `_styles`,
+whatever the installed version of Pygments, and Pygments is only consulted
+for names that aren't listed there (e.g., styles added in a newer version).
+A listed style that the installed Pygments doesn't have (e.g., an older
+version) is accepted, and formatted with the ``solarized`` style instead,
+like any other unknown style.
+
+To regenerate the module after upgrading Pygments, run::
+
+    $ python -m httpie.output.formatters.styles
+
+"""
+import os
+
+
+DEFAULT_STYLE = 'monokai'
+
+# Bundled with HTTPie, see `colors.Solarized256Style`.
+SOLARIZED_STYLE = 'solarized'
+
+STYLES_MODULE_PATH = os.path.join(os.path.dirname(__file__), '_styles.py')
+
+STYLES_MODULE_TEMPLATE = '''\
+# Generated by `python -m httpie.output.formatters.styles`. Do not edit.
+PYGMENTS_VERSION = {version!r}
+
+STYLE_NAMES = [
+{names}]
+'''
+
+
+def is_pygments_style(name):
+    """Ask Pygments itself whether `name` is a known style."""
+    import pygments.styles
+    return name in pygments.styles.STYLE_MAP
+
+
+class AvailableStyles(object):
+    """
+    A lazy, read-only set of style names usable as ``--style`` choices.
+
+    """
+
+    def __init__(self, names):
+        self.names = set(names)
+        self.names.add(SOLARIZED_STYLE)
+
+    def __contains__(self, name):
+        if name in self.names:
+            return True
+        if is_pygments_style(name):
+            self.names.add(name)
+            return True
+        return False
+
+    def __iter__(self):
+        return iter(sorted(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+
+def get_available_styles():
+    try:
+        from httpie.output.formatters._styles import STYLE_NAMES
+    except ImportError:
+        # The module hasn't been generated yet.
+        import pygments.styles
+        STYLE_NAMES = pygments.styles.STYLE_MAP.keys()
+    return AvailableStyles(STYLE_NAMES)
+
+
+def generate_styles_module(path=STYLES_MODULE_PATH):
+    """(Re)write the `_styles` module for the installed Pygments."""
+    import pygments
+    import pygments.styles
+    with open(path, 'w') as f:
+        f.write(STYLES_MODULE_TEMPLATE.format(
+            version=pygments.__version__,
+            names=''.join('    %r,\n' % name
+                          for name in sorted(pygments.styles.STYLE_MAP)),
+        ))
+
+
+AVAILABLE_STYLES = get_available_styles()
+
+
+if __name__ == '__main__':
+    generate_styles_module()
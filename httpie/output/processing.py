@@ -15,9 +15,9 @@ class Conversion(object):
 
     def get_converter(self, mime):
         if is_valid_mime(mime):
-            for converter_class in plugin_manager.get_converters():
-                if converter_class.supports(mime):
-                    return converter_class(mime)
+            converter_class = plugin_manager.get_converter(mime)
+            if converter_class:
+                return converter_class(mime)
 
 
 class Formatting(object):
@@ -33,7 +33,7 @@ class Formatting(object):
         available_plugins = plugin_manager.get_formatters_grouped()
         self.enabled_plugins = []
         for group in groups:
-            for cls in available_plugins[group]:
+            for cls in available_plugins.get(group, []):
                 p = cls(env=env, **kwargs)
                 if p.enabled:
                     self.enabled_plugins.append(p)
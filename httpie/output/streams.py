@@ -1,3 +1,4 @@
+import time
 from itertools import chain
 from functools import partial
 
@@ -55,10 +56,13 @@ def write_with_colors_win_py3(stream, outfile, flush):
             outfile.flush()
 
 
-def build_output_stream(args, env, request, response):
+def build_output_stream(args, env, request, response, timings=None):
     """Build and return a chain of iterators over the `request`-`response`
     exchange each of which yields `bytes` chunks.
 
+    With ``--timings``, `timings` is the `httpie.timings.Timings` of
+    `response`.
+
     """
     req_h = OUT_REQ_HEAD in args.output_options
     req_b = OUT_REQ_BODY in args.output_options
@@ -84,7 +88,8 @@ def build_output_stream(args, env, request, response):
         output.append(Stream(
             msg=HTTPResponse(response),
             with_headers=resp_h,
-            with_body=resp_b))
+            with_body=resp_b,
+            timings=timings))
 
     if env.stdout_isatty and resp_b:
         # Ensure a blank line after the response body.
@@ -124,11 +129,13 @@ class BaseStream(object):
     """Base HTTP message output stream class."""
 
     def __init__(self, msg, with_headers=True, with_body=True,
-                 on_body_chunk_downloaded=None):
+                 on_body_chunk_downloaded=None, timings=None):
         """
         :param msg: a :class:`models.HTTPMessage` subclass
         :param with_headers: if `True`, headers will be included
         :param with_body: if `True`, body will be included
+        :param timings: a :class:`httpie.timings.Timings` to add the time
+                        spent receiving and formatting the body to
 
         """
         assert with_headers or with_body
@@ -136,6 +143,7 @@ class BaseStream(object):
         self.with_headers = with_headers
         self.with_body = with_body
         self.on_body_chunk_downloaded = on_body_chunk_downloaded
+        self.timings = timings
 
     def get_headers(self):
         """Return the headers' bytes."""
@@ -145,6 +153,13 @@ class BaseStream(object):
         """Return an iterator over the message body."""
         raise NotImplementedError()
 
+    def timed(self, chunks, phase='transfer'):
+        """Return `chunks`, adding the time spent waiting for them to
+        `phase` with ``--timings``."""
+        if self.timings is None:
+            return chunks
+        return self.timings.iter_timed(chunks, phase)
+
     def __iter__(self):
         """Return an iterator over `self.msg`."""
         if self.with_headers:
@@ -174,7 +189,7 @@ class RawStream(BaseStream):
         self.chunk_size = chunk_size
 
     def iter_body(self):
-        return self.msg.iter_body(self.chunk_size)
+        return self.timed(self.msg.iter_body(self.chunk_size))
 
 
 class EncodedStream(BaseStream):
@@ -203,7 +218,7 @@ class EncodedStream(BaseStream):
 
     def iter_body(self):
 
-        for line, lf in self.msg.iter_lines(self.CHUNK_SIZE):
+        for line, lf in self.timed(self.msg.iter_lines(self.CHUNK_SIZE)):
 
             if b'\0' in line:
                 raise BinarySuppressedError()
@@ -235,7 +250,7 @@ class PrettyStream(EncodedStream):
 
     def iter_body(self):
         first_chunk = True
-        iter_lines = self.msg.iter_lines(self.CHUNK_SIZE)
+        iter_lines = self.timed(self.msg.iter_lines(self.CHUNK_SIZE))
         for line, lf in iter_lines:
             if b'\0' in line:
                 if first_chunk:
@@ -254,6 +269,15 @@ class PrettyStream(EncodedStream):
             first_chunk = False
 
     def process_body(self, chunk):
+        if self.timings is None:
+            return self._process_body(chunk)
+        start = time.perf_counter()
+        try:
+            return self._process_body(chunk)
+        finally:
+            self.timings.add('format', time.perf_counter() - start)
+
+    def _process_body(self, chunk):
         if not isinstance(chunk, str):
             # Text when a converter has been used,
             # otherwise it will always be bytes.
@@ -278,7 +302,7 @@ class BufferedPrettyStream(PrettyStream):
         converter = None
         body = bytearray()
 
-        for chunk in self.msg.iter_body(self.CHUNK_SIZE):
+        for chunk in self.timed(self.msg.iter_body(self.CHUNK_SIZE)):
             if not converter and b'\0' in chunk:
                 converter = self.conversion.get_converter(self.mime)
                 if not converter:
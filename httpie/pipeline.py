@@ -0,0 +1,280 @@
+"""
+HTTP/1.1 request pipelining for ``--batch --pipeline K``.
+
+When a host is far away, sending many small requests one after another
+over a keep-alive connection is dominated by the round trips. With
+pipelining, up to K requests are written on the connection back to back,
+and their responses are read in the same order.
+
+Only requests that are safe to replay are pipelined (``GET`` and ``HEAD``
+without a body, session, proxy or authentication challenge; see
+`get_pipeline_request()`). A `PipelineAdapter` is mounted for the origin of
+a run of such consecutive batch requests, so that each one still goes
+through `httpie.core.run()`, and its response through the usual output
+streams. The adapter hands out the pipelined responses in order, and sends
+any request it has no response for (e.g., a redirect being followed, or
+a request left over after the server closed the connection or sent
+something it couldn't parse) with the shared adapter instead, which is
+the same as running the batch without ``--pipeline``.
+
+"""
+import collections
+import http.client
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.packages.urllib3 import HTTPResponse
+from requests.packages.urllib3._collections import HTTPHeaderDict
+from requests.packages.urllib3.util.wait import wait_for_read
+from requests.utils import select_proxy
+
+from httpie.racing import create_connection
+from httpie.timings import finish_hop, start_hop
+from httpie.tls import get_ssl_context
+
+
+PIPELINE_METHODS = frozenset(['GET', 'HEAD'])
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class PipelineBroken(Exception):
+    """The server closed the connection or sent an invalid response."""
+
+
+class SharedReader(object):
+    """
+    The buffered reader of a pipelined connection, passed as the "socket"
+    of each `http.client.HTTPResponse` read from it.
+
+    `http.client` reads a response through a buffered file made from its
+    socket, which can read ahead into the next response. Sharing a single
+    one across the responses keeps what has been read ahead, and closing
+    a response must not close it.
+
+    """
+
+    def __init__(self, sock):
+        self.fp = sock.makefile('rb')
+
+    def makefile(self, mode):
+        return self
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+
+class PipelinedResponse(http.client.HTTPResponse):
+    """A response that reads the rest of its body when it's closed, so
+    that the next response can be read after it."""
+
+    def close(self):
+        if self.fp is not None and not self.isclosed():
+            try:
+                self.read()
+            except (OSError, http.client.HTTPException):
+                pass
+        super(PipelinedResponse, self).close()
+
+
+def get_origin(url):
+    """Return the ``scheme://netloc/`` prefix of `url`, to mount on."""
+    url = urlsplit(url)
+    return '%s://%s/' % (url.scheme, url.netloc)
+
+
+def get_pipeline_request(requests_session, args, config_dir):
+    """
+    Return `(key, prepared_request)` for the batch request `args` if it can
+    be pipelined, or `None`. Requests with the same `key` can be pipelined
+    on the same connection.
+
+    """
+    from httpie.client import (ENGINE_REQUESTS, get_adapter_kwargs,
+                               get_requests_kwargs)
+
+    if (args.session or args.session_read_only or args.download
+            or args.engine != ENGINE_REQUESTS):
+        return None
+    kwargs = get_requests_kwargs(args)
+    method = kwargs['method'].upper()
+    if method not in PIPELINE_METHODS or kwargs['data'] or kwargs['files']:
+        return None
+    prepared = requests_session.prepare_request(requests.Request(
+        method=method,
+        url=kwargs['url'],
+        headers=kwargs['headers'],
+        params=kwargs['params'] or {},
+        auth=kwargs['auth'],
+    ))
+    scheme = urlsplit(prepared.url).scheme
+    if scheme not in DEFAULT_PORTS or any(prepared.hooks['response']):
+        # E.g., digest authentication, which needs a round trip.
+        return None
+    settings = requests_session.merge_environment_settings(
+        prepared.url, kwargs['proxies'], True, kwargs['verify'],
+        kwargs['cert'])
+    if select_proxy(prepared.url, settings['proxies']):
+        return None
+    adapter_kwargs = get_adapter_kwargs(args, config_dir)
+    key = (get_origin(prepared.url), settings['verify'], settings['cert'],
+           adapter_kwargs['resolver'], adapter_kwargs['socket_options'],
+           kwargs['timeout'])
+    return key, prepared
+
+
+class PipelineAdapter(BaseAdapter):
+    """
+    Pipelines requests on a connection to one origin, and returns their
+    responses when `requests` sends them; other requests are sent by
+    `fallback`, a shared `HTTPAdapter`.
+
+    """
+
+    def __init__(self, key, fallback):
+        super(PipelineAdapter, self).__init__()
+        self.origin, self.verify, self.cert, self.resolver, \
+            self.socket_options, self.timeout = key
+        self.fallback = fallback
+        self.sock = None
+        self.reader = None
+        # `(method, url)` of the requests written and not answered yet.
+        self.pending = collections.deque()
+        self.response = None
+        self.responses = 0
+        self.closing = False
+        # Set when the server misbehaved; no more pipelining then.
+        self.disabled = False
+        self.pipelined = 0
+
+    def connect(self):
+        url = urlsplit(self.origin)
+        port = url.port or DEFAULT_PORTS[url.scheme]
+        hosts = [url.hostname]
+        if self.resolver is not None:
+            hosts = self.resolver.resolve(url.hostname, port)
+        sock = create_connection(hosts, port, self.timeout,
+                                 socket_options=self.socket_options)
+        if url.scheme == 'https':
+            try:
+                sock = get_ssl_context(self.verify, self.cert).wrap_socket(
+                    sock, server_hostname=url.hostname)
+            except BaseException:
+                sock.close()
+                raise
+        self.sock = sock
+        self.reader = SharedReader(sock)
+        self.responses = 0
+        self.closing = False
+
+    def pipeline(self, requests):
+        """
+        Write the `requests.PreparedRequest` objects `requests` on the
+        connection, and return whether they were.
+
+        """
+        from httpie.aio import get_request_head
+
+        if self.disabled:
+            return False
+        if self.sock is not None and wait_for_read(self.sock, timeout=0):
+            # Closed by the server while idle (or it sent something
+            # unexpected).
+            self.close()
+        try:
+            if self.sock is None:
+                self.connect()
+            self.sock.sendall(b''.join(
+                get_request_head(request, urlsplit(request.url))
+                for request in requests))
+        except OSError:
+            self.disable()
+            return False
+        self.pending.extend((request.method, request.url)
+                            for request in requests)
+        self.pipelined += len(requests)
+        return True
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        if self.pending and self.pending[0] == (request.method, request.url):
+            self.pending.popleft()
+            try:
+                response = self.read_response(request)
+            except PipelineBroken:
+                # Send it again, like the requests after it.
+                pass
+            else:
+                start_hop(request)
+                return finish_hop(
+                    self.fallback.build_response(request, response))
+        return self.fallback.send(request, stream=stream, timeout=timeout,
+                                  verify=verify, cert=cert, proxies=proxies)
+
+    def read_response(self, request):
+        """Return the `urllib3.HTTPResponse` to `request`, the next one."""
+        if self.response is not None:
+            # The previous response must have been read in full.
+            self.response.close()
+            self.response = None
+        try:
+            self.sock.settimeout(self.timeout)
+            response = PipelinedResponse(self.reader, method=request.method)
+            response.begin()
+        except (OSError, http.client.HTTPException) as e:
+            if self.responses and isinstance(e, ConnectionResetError):
+                # The server closed the connection after answering some of
+                # the requests (e.g., because of a limit of requests per
+                # connection). The next ones get a new connection.
+                self.close()
+            else:
+                self.disable()
+            raise PipelineBroken(e)
+        self.responses += 1
+        self.response = response
+        if response.will_close:
+            # The requests written after it won't be answered.
+            self.pending.clear()
+            self.closing = True
+        return HTTPResponse(
+            body=response,
+            headers=HTTPHeaderDict(response.msg.items()),
+            status=response.status,
+            version=response.version,
+            reason=response.reason,
+            preload_content=False,
+            decode_content=False,
+            original_response=response,
+            request_method=request.method,
+        )
+
+    def finish(self):
+        """
+        Called once the batch requests that `pipeline()` wrote have been
+        run; the connection is kept for the next ones if it can be.
+
+        """
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+        if self.pending or self.closing:
+            # Responses are left unread, or the server closes it.
+            self.close()
+
+    def disable(self):
+        self.disabled = True
+        self.close()
+
+    def close(self):
+        self.pending.clear()
+        self.response = None
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = self.reader = None
@@ -7,12 +7,14 @@ from httpie.plugins.base import (
     AuthPlugin, FormatterPlugin,
     ConverterPlugin, TransportPlugin
 )
-from httpie.plugins.manager import PluginManager
+from httpie.plugins.manager import (
+    PluginManager, PluginDescriptor, PLUGIN_KIND_FORMATTER
+)
+from httpie.plugins.index import EntryPoint
 from httpie.plugins.builtin import BasicAuthPlugin, DigestAuthPlugin
 from httpie.output.formatters.headers import HeadersFormatter
 from httpie.output.formatters.json import JSONFormatter
 from httpie.output.formatters.xml import XMLFormatter
-from httpie.output.formatters.colors import ColorFormatter
 
 
 plugin_manager = PluginManager()
@@ -20,5 +22,16 @@ plugin_manager.register(BasicAuthPlugin,
                         DigestAuthPlugin)
 plugin_manager.register(HeadersFormatter,
                         JSONFormatter,
-                        XMLFormatter,
-                        ColorFormatter)
+                        XMLFormatter)
+# The color formatter imports Pygments, which is slow,
+# so it is imported only once colors are actually enabled.
+plugin_manager.register(PluginDescriptor(
+    kind=PLUGIN_KIND_FORMATTER,
+    entry_point=EntryPoint(
+        group='httpie.plugins.formatter.v1',
+        name='colors',
+        value='httpie.output.formatters.colors:ColorFormatter',
+        dist=None,
+    ),
+    group_name='colors',
+))
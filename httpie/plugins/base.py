@@ -51,6 +51,11 @@ class TransportPlugin(BasePlugin):
 
 class ConverterPlugin(object):
 
+    # Optional list of MIME type prefixes (e.g., ``['application/msgpack']``
+    # or ``['image/']``) outside which `supports()` is never true. It allows
+    # skipping the converter without calling (and importing) it.
+    mime_prefixes = None
+
     def __init__(self, mime):
         self.mime = mime
 
@@ -64,6 +69,13 @@ class ConverterPlugin(object):
 
 class FormatterPlugin(object):
 
+    # The group the formatter is enabled by, e.g., via --pretty=format.
+    group_name = 'format'
+
+    # Formatters within a group are applied in ascending order of priority,
+    # and those with the same priority in the order they were registered.
+    priority = 0
+
     def __init__(self, **kwargs):
         """
         :param env: an class:`Environment` instance
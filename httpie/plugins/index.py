@@ -0,0 +1,200 @@
+"""
+A persistent index of the entry points of installed plugins.
+
+Discovering entry points means walking the metadata of every installed
+distribution, and with `pkg_resources` it also means importing it, which
+is slow. The result is therefore stored in the config directory and reused
+for as long as the installed packages don't change.
+
+Along with each entry point, the index also stores the plugin attributes
+that are needed before the plugin is actually used (`PLUGIN_ATTRIBUTES`),
+so that plugins can be registered without being imported.
+
+"""
+import os
+import sys
+from importlib import import_module
+
+from httpie import __version__
+from httpie.config import BaseConfigDict
+
+
+INDEX_FILE_NAME = 'plugins.json'
+
+# Bump when the structure of the index changes.
+INDEX_VERSION = 3
+
+PLUGIN_ATTRIBUTES = [
+    'name',
+    'description',
+    'auth_type',
+    'group_name',
+    'priority',
+    'mime_prefixes',
+    'prefix',
+]
+
+
+class EntryPoint(object):
+    """An installed plugin's entry point.
+
+    ``value`` is the object reference in the ``module:attr`` format.
+
+    """
+
+    def __init__(self, group, name, value, dist, attrs=None):
+        self.group = group
+        self.name = name
+        self.value = value
+        self.dist = dist
+        # The values of `PLUGIN_ATTRIBUTES` of the referenced plugin.
+        self.attrs = attrs or {}
+
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+
+    def __repr__(self):
+        return repr(self.__dict__)
+
+    def load(self):
+        """Import and return the referenced object."""
+        # Drop extras, e.g., "module:attr [extra]".
+        value = self.value.split('[')[0].strip()
+        module_name, _, attrs = value.partition(':')
+        obj = import_module(module_name.strip())
+        for attr in attrs.strip().split('.'):
+            if attr:
+                obj = getattr(obj, attr)
+        return obj
+
+    def describe(self):
+        """Load the plugin and remember its `PLUGIN_ATTRIBUTES`."""
+        plugin = self.load()
+        self.attrs = {attr: getattr(plugin, attr, None)
+                      for attr in PLUGIN_ATTRIBUTES}
+
+
+class PluginIndex(BaseConfigDict):
+
+    about = 'HTTPie plugin index (generated automatically, do not edit)'
+
+    def __init__(self, directory):
+        super(PluginIndex, self).__init__()
+        self.directory = directory
+
+    def _get_path(self):
+        return os.path.join(self.directory, INDEX_FILE_NAME)
+
+
+def get_fingerprint(groups):
+    """
+    Return a JSON-serializable value that changes whenever a distribution
+    gets installed, upgraded or removed.
+
+    Installing a package always adds or removes `*.dist-info` or
+    `*.egg-info` entries, which updates the mtime of the directory on
+    `sys.path` that contains them.
+
+    """
+    mtimes = []
+    for path in sys.path:
+        if not path:
+            # The current working directory.
+            continue
+        try:
+            mtimes.append([path, os.stat(path).st_mtime])
+        except OSError:
+            pass
+    return {
+        'version': INDEX_VERSION,
+        'httpie': __version__,
+        'python': sys.version,
+        'groups': list(groups),
+        'paths': mtimes,
+    }
+
+
+def iter_entry_points(groups):
+    """Scan the installed distributions for entry points in `groups`.
+
+    `importlib.metadata` is used when available because it is much faster
+    than `pkg_resources`, which is only a fallback.
+
+    """
+    try:
+        # noinspection PyCompatibility
+        from importlib import metadata
+    except ImportError:
+        try:
+            # noinspection PyUnresolvedReferences
+            import importlib_metadata as metadata
+        except ImportError:
+            metadata = None
+
+    found = {group: [] for group in groups}
+
+    if metadata is not None:
+        seen = set()
+        for dist in metadata.distributions():
+            dist_name = (dist.metadata['Name'] or '').lower()
+            if not dist_name or dist_name in seen:
+                # The first one on `sys.path` wins, like with `pkg_resources`.
+                continue
+            seen.add(dist_name)
+            for entry_point in dist.entry_points:
+                if entry_point.group in found:
+                    found[entry_point.group].append(EntryPoint(
+                        group=entry_point.group,
+                        name=entry_point.name,
+                        value=entry_point.value,
+                        dist=dist_name,
+                    ))
+    else:
+        from pkg_resources import iter_entry_points as pkg_iter_entry_points
+        for group in groups:
+            for entry_point in pkg_iter_entry_points(group):
+                found[group].append(EntryPoint(
+                    group=group,
+                    name=entry_point.name,
+                    value='%s:%s' % (entry_point.module_name,
+                                     '.'.join(entry_point.attrs)),
+                    dist=entry_point.dist.key,
+                ))
+
+    for group in groups:
+        for entry_point in found[group]:
+            yield entry_point
+
+
+def get_entry_points(groups, config_dir):
+    """
+    Return a list of `EntryPoint`s for `groups`, using the index stored
+    in `config_dir` if it's still up to date, and updating it otherwise.
+
+    """
+    index = PluginIndex(directory=config_dir)
+    try:
+        index.load()
+    except ValueError:
+        # Corrupted index, it will be rebuilt.
+        pass
+
+    fingerprint = get_fingerprint(groups)
+    if index.get('fingerprint') != fingerprint:
+        entry_points = list(iter_entry_points(groups))
+        for entry_point in entry_points:
+            # Importing all plugins is the price of building the index.
+            entry_point.describe()
+        index['fingerprint'] = fingerprint
+        index['entry_points'] = [
+            entry_point.__dict__ for entry_point in entry_points
+        ]
+        try:
+            index.save()
+        except (IOError, OSError):
+            # E.g., a read-only config directory. Not fatal, the plugins
+            # will simply be scanned for again on the next run.
+            pass
+
+    return [EntryPoint(**entry_point)
+            for entry_point in index['entry_points']]
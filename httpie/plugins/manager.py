@@ -1,7 +1,7 @@
-from itertools import groupby
-from pkg_resources import iter_entry_points
+from httpie.config import DEFAULT_CONFIG_DIR
 from httpie.plugins import AuthPlugin, FormatterPlugin, ConverterPlugin
 from httpie.plugins.base import TransportPlugin
+from httpie.plugins.index import get_entry_points
 
 
 ENTRY_POINT_NAMES = [
@@ -11,55 +11,234 @@ ENTRY_POINT_NAMES = [
     'httpie.plugins.transport.v1',
 ]
 
+PLUGIN_KIND_AUTH = 'auth'
+PLUGIN_KIND_FORMATTER = 'formatter'
+PLUGIN_KIND_CONVERTER = 'converter'
+PLUGIN_KIND_TRANSPORT = 'transport'
+
+ENTRY_POINT_KINDS = dict(zip(ENTRY_POINT_NAMES, [
+    PLUGIN_KIND_AUTH,
+    PLUGIN_KIND_FORMATTER,
+    PLUGIN_KIND_CONVERTER,
+    PLUGIN_KIND_TRANSPORT,
+]))
+
+PLUGIN_BASE_CLASSES = [
+    (PLUGIN_KIND_AUTH, AuthPlugin),
+    (PLUGIN_KIND_FORMATTER, FormatterPlugin),
+    (PLUGIN_KIND_CONVERTER, ConverterPlugin),
+    (PLUGIN_KIND_TRANSPORT, TransportPlugin),
+]
+
+
+class PluginDescriptor(object):
+    """A plugin that has been registered, but not imported yet.
+
+    It carries the plugin attributes that are needed before the plugin is
+    actually used (e.g., for ``--help``, or for choosing a transport by URL
+    prefix). The plugin class is imported on first use; calling the
+    descriptor or accessing any other attribute is delegated to it, so a
+    descriptor can be used wherever a plugin class is expected.
+
+    """
+
+    def __init__(self, kind, entry_point, package_name=None,
+                 name=None, description=None, auth_type=None,
+                 group_name=None, priority=None, mime_prefixes=None,
+                 prefix=None):
+        """
+        :param kind: one of the ``PLUGIN_KIND_*`` constants
+        :param entry_point: an :class:`httpie.plugins.index.EntryPoint`
+        :param package_name: the distribution providing the plugin
+
+        """
+        self.kind = kind
+        self.entry_point = entry_point
+        self.package_name = package_name
+        self.name = name
+        self.description = description
+        self.auth_type = auth_type
+        self.group_name = group_name
+        self.priority = priority
+        self.mime_prefixes = mime_prefixes
+        self.prefix = prefix
+        self._plugin = None
+
+    @classmethod
+    def from_entry_point(cls, entry_point):
+        return cls(kind=ENTRY_POINT_KINDS[entry_point.group],
+                   entry_point=entry_point,
+                   package_name=entry_point.dist,
+                   **entry_point.attrs)
+
+    @property
+    def is_loaded(self):
+        return self._plugin is not None
+
+    def load(self):
+        """Import the plugin class (only once) and return it."""
+        if self._plugin is None:
+            plugin = self.entry_point.load()
+            plugin.package_name = self.package_name
+            self._plugin = plugin
+        return self._plugin
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+
+    def __repr__(self):
+        return '<PluginDescriptor %s>' % self.entry_point.value
+
+
+def get_plugin_kind(plugin):
+    """Return the ``PLUGIN_KIND_*`` of a plugin class or descriptor."""
+    if isinstance(plugin, PluginDescriptor):
+        return plugin.kind
+    for kind, base_class in PLUGIN_BASE_CLASSES:
+        if issubclass(plugin, base_class):
+            return kind
+
 
 class PluginManager(object):
+    """The plugin registry.
+
+    The lookup tables used when processing a request (auth plugins by
+    type, formatters by group, converters by MIME type, and transports)
+    are built only when plugins are registered, so that the lookups
+    themselves are just dictionary hits.
+
+    """
 
     def __init__(self):
         self._plugins = []
+        self._installed_plugins_loaded = False
+        self._build_tables()
 
     def __iter__(self):
         return iter(self._plugins)
 
     def register(self, *plugins):
+        """Register plugin classes and/or `PluginDescriptor`s."""
         for plugin in plugins:
             self._plugins.append(plugin)
+        self._build_tables()
+
+    def load_installed_plugins(self, config_dir=DEFAULT_CONFIG_DIR):
+        """Register the installed plugins without importing them."""
+        if self._installed_plugins_loaded:
+            return
+        self._installed_plugins_loaded = True
+        self.register(*[
+            PluginDescriptor.from_entry_point(entry_point)
+            for entry_point in get_entry_points(ENTRY_POINT_NAMES, config_dir)
+        ])
+
+    def _build_tables(self):
+        by_kind = {kind: [] for kind, base_class in PLUGIN_BASE_CLASSES}
+        for plugin in self._plugins:
+            kind = get_plugin_kind(plugin)
+            if kind in by_kind:
+                by_kind[kind].append(plugin)
+        self._by_kind = by_kind
+
+        # Auth plugins registered later override earlier ones.
+        self._auth_plugin_mapping = {
+            plugin.auth_type: plugin
+            for plugin in by_kind[PLUGIN_KIND_AUTH]
+        }
+
+        # Formatters by group, sorted by priority. `sorted()` is stable,
+        # so registration order is kept for equal priorities.
+        groups = {}
+        for plugin in by_kind[PLUGIN_KIND_FORMATTER]:
+            group_name = getattr(plugin, 'group_name', None) or 'format'
+            groups.setdefault(group_name, []).append(plugin)
+        self._formatter_groups = {
+            group_name: sorted(
+                plugins, key=lambda p: getattr(p, 'priority', None) or 0)
+            for group_name, plugins in groups.items()
+        }
+
+        # Converters by the major part of their MIME type prefixes
+        # ("image/png" => "image"). Those without any prefixes are
+        # candidates for every MIME type.
+        self._converters_by_major_type = {}
+        self._converters_any_type = []
+        for position, plugin in enumerate(by_kind[PLUGIN_KIND_CONVERTER]):
+            mime_prefixes = getattr(plugin, 'mime_prefixes', None)
+            if not mime_prefixes:
+                self._converters_any_type.append((position, None, plugin))
+                continue
+            for prefix in mime_prefixes:
+                major_type = prefix.split('/')[0]
+                self._converters_by_major_type.setdefault(
+                    major_type, []).append((position, prefix, plugin))
+        self._converter_cache = {}
 
-    def load_installed_plugins(self):
-        for entry_point_name in ENTRY_POINT_NAMES:
-            for entry_point in iter_entry_points(entry_point_name):
-                plugin = entry_point.load()
-                plugin.package_name = entry_point.dist.key
-                self.register(entry_point.load())
+    def filter(self, kind):
+        return list(self._by_kind[kind])
 
     # Auth
     def get_auth_plugins(self):
-        return [plugin for plugin in self if issubclass(plugin, AuthPlugin)]
+        return self.filter(PLUGIN_KIND_AUTH)
 
     def get_auth_plugin_mapping(self):
-        return {plugin.auth_type: plugin for plugin in self.get_auth_plugins()}
+        return dict(self._auth_plugin_mapping)
 
     def get_auth_plugin(self, auth_type):
-        return self.get_auth_plugin_mapping()[auth_type]
+        return load_plugin(self._auth_plugin_mapping[auth_type])
 
     # Output processing
     def get_formatters(self):
-        return [plugin for plugin in self
-                if issubclass(plugin, FormatterPlugin)]
+        return self.filter(PLUGIN_KIND_FORMATTER)
 
     def get_formatters_grouped(self):
-        return {
-            group_name: list(group)
-            for group_name, group in groupby(
-                self.get_formatters(),
-                key=lambda p: getattr(p, 'group_name', 'format'),
-            )
-        }
+        return {group_name: list(plugins)
+                for group_name, plugins in self._formatter_groups.items()}
 
     def get_converters(self):
-        return [plugin for plugin in self
-                if issubclass(plugin, ConverterPlugin)]
+        return self.filter(PLUGIN_KIND_CONVERTER)
+
+    def get_converter(self, mime):
+        """Return the first converter class that supports `mime`, if any.
+
+        The result is cached for each MIME type.
+
+        """
+        try:
+            return self._converter_cache[mime]
+        except KeyError:
+            pass
+
+        candidates = self._converters_any_type + [
+            candidate for candidate in self._converters_by_major_type.get(
+                mime.split('/')[0], [])
+            if mime.startswith(candidate[1])
+        ]
+        converter = None
+        for position, prefix, plugin in sorted(candidates,
+                                               key=lambda c: c[0]):
+            if plugin.supports(mime):
+                converter = load_plugin(plugin)
+                break
+        self._converter_cache[mime] = converter
+        return converter
 
     # Adapters
-    def get_trasnsport_plugins(self):
-        return [plugin for plugin in self
-                if issubclass(plugin, TransportPlugin)]
+    def get_transport_plugins(self):
+        return self._by_kind[PLUGIN_KIND_TRANSPORT]
+
+    # Backwards compatibility with the original misspelled name.
+    get_trasnsport_plugins = get_transport_plugins
+
+
+def load_plugin(plugin):
+    """Return the plugin class for a plugin class or `PluginDescriptor`."""
+    if isinstance(plugin, PluginDescriptor):
+        return plugin.load()
+    return plugin
@@ -0,0 +1,190 @@
+"""
+Connection racing ("Happy Eyeballs", RFC 8305).
+
+When a hostname resolves to IPv6 and IPv4 addresses and one of the paths
+is broken, connecting to the addresses one after the other waits for the
+whole connect timeout before trying the next one. `create_connection()`
+interleaves the address families instead, and starts connecting to the
+next address every `CONNECTION_ATTEMPT_DELAY` seconds (or as soon as an
+attempt fails) while the earlier attempts are still pending. The first
+connection made wins and the other attempts are cancelled.
+
+With ``--debug``, the attempts are collected in `connect_attempts`.
+With ``--timings``, the end of name resolution is marked (see
+`httpie.timings`).
+
+"""
+import contextvars
+import errno
+import os
+import selectors
+import socket
+import time
+
+from httpie.timings import mark
+
+
+# How long to wait for an attempt before starting the next one
+# (RFC 8305, section 5).
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+# A list that the attempts of the current request are appended to, if set.
+connect_attempts = contextvars.ContextVar('connect_attempts', default=None)
+
+IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN}
+
+
+class Attempt(object):
+    """A connection attempt to `sockaddr`, for ``--debug``."""
+
+    def __init__(self, sockaddr):
+        self.sockaddr = sockaddr
+        self.started = time.monotonic()
+        self.elapsed = None
+        self.result = None
+
+    def finish(self, result):
+        self.elapsed = time.monotonic() - self.started
+        self.result = result
+
+    @property
+    def address(self):
+        host, port = self.sockaddr[:2]
+        if ':' in host:
+            return '[%s]:%d' % (host, port)
+        return '%s:%d' % (host, port)
+
+    def __str__(self):
+        return '%s %s after %d ms' % (self.address, self.result,
+                                      self.elapsed * 1000)
+
+
+def interleave(addrinfos):
+    """
+    Reorder `addrinfos` to alternate between the address families,
+    starting with the family of the first one (RFC 8305, section 4).
+
+    """
+    by_family = {}
+    for addrinfo in addrinfos:
+        by_family.setdefault(addrinfo[0], []).append(addrinfo)
+    queues = list(by_family.values())
+    result = []
+    while any(queues):
+        for queue in queues:
+            if queue:
+                result.append(queue.pop(0))
+    return result
+
+
+def get_addrinfos(hosts, port, family=socket.AF_UNSPEC):
+    """
+    Resolve `hosts` and return their unique addresses, interleaved.
+
+    Raise the `socket.gaierror` of the last host if none resolves.
+
+    """
+    addrinfos = []
+    error = None
+    for host in hosts:
+        try:
+            resolved = socket.getaddrinfo(host, port, family,
+                                          socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            error = e
+            continue
+        for addrinfo in resolved:
+            if addrinfo not in addrinfos:
+                addrinfos.append(addrinfo)
+    if not addrinfos:
+        raise error
+    return interleave(addrinfos)
+
+
+def start_attempt(addrinfo, source_address, socket_options):
+    """Start connecting to `addrinfo` and return the non-blocking socket."""
+    family, type_, proto, canonname, sockaddr = addrinfo
+    sock = socket.socket(family, type_, proto)
+    try:
+        for option in socket_options or ():
+            sock.setsockopt(*option)
+        if source_address:
+            sock.bind(source_address)
+        sock.setblocking(False)
+        error = sock.connect_ex(sockaddr)
+        if error and error not in IN_PROGRESS:
+            raise OSError(error, os.strerror(error))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def create_connection(hosts, port, timeout=None, source_address=None,
+                      socket_options=None, family=socket.AF_UNSPEC,
+                      delay=CONNECTION_ATTEMPT_DELAY):
+    """
+    Race connections to the addresses of `hosts` and return the socket of
+    the first one made, with `timeout` set (like `socket.create_connection`).
+
+    Raise `socket.gaierror` if no host resolves, `socket.timeout` if
+    `timeout` expires first, and the error of the last attempt otherwise.
+
+    """
+    addrinfos = get_addrinfos(hosts, port, family)
+    mark('resolved')
+    attempts = connect_attempts.get()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    selector = selectors.DefaultSelector()
+    pending = {}
+    next_attempt = 0
+    error = None
+    try:
+        while addrinfos or pending:
+            now = time.monotonic()
+            if addrinfos and (not pending or now >= next_attempt):
+                addrinfo = addrinfos.pop(0)
+                attempt = Attempt(addrinfo[4])
+                if attempts is not None:
+                    attempts.append(attempt)
+                try:
+                    sock = start_attempt(addrinfo, source_address,
+                                         socket_options)
+                except OSError as e:
+                    attempt.finish('failed (%s)' % e)
+                    error = e
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE, attempt)
+                pending[sock] = attempt
+                next_attempt = now + delay
+                continue
+
+            wait = max(0, next_attempt - now) if addrinfos else None
+            if deadline is not None:
+                remaining = deadline - now
+                if remaining <= 0:
+                    for attempt in pending.values():
+                        attempt.finish('timed out')
+                    raise socket.timeout('timed out')
+                wait = remaining if wait is None else min(wait, remaining)
+            for key, events in selector.select(wait):
+                sock, attempt = key.fileobj, key.data
+                selector.unregister(sock)
+                del pending[sock]
+                result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if not result:
+                    attempt.finish('connected')
+                    sock.settimeout(timeout)
+                    return sock
+                sock.close()
+                error = OSError(result, os.strerror(result))
+                attempt.finish('failed (%s)' % error)
+                # Don't wait for the delay to try the next address.
+                next_attempt = 0
+        raise error
+    finally:
+        for sock, attempt in pending.items():
+            if attempt.result is None:
+                attempt.finish('cancelled')
+            sock.close()
+        selector.close()
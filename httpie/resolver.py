@@ -0,0 +1,133 @@
+"""
+Hostname resolution for the transports.
+
+With ``--resolve HOST:PORT:ADDRESS``, connections to ``HOST:PORT`` go to
+``ADDRESS`` without resolving ``HOST`` at all. With ``--dns-cache-ttl``,
+the addresses a hostname resolves to are cached in the config directory,
+so that the following invocations don't have to wait for the resolver.
+
+"""
+import os
+import socket
+import threading
+import time
+
+from httpie.config import BaseConfigDict
+
+
+class DNSCache(BaseConfigDict):
+    """Resolved addresses by hostname, with the time they expire."""
+
+    about = 'HTTPie DNS cache'
+
+    def __init__(self, directory):
+        super(DNSCache, self).__init__()
+        self.directory = directory
+
+    def _get_path(self):
+        return os.path.join(self.directory, 'dns-cache.json')
+
+
+def is_ip_address(host):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+        except (OSError, ValueError):
+            continue
+        return True
+    return False
+
+
+def get_addresses(host, port):
+    """Resolve `host`, returning its unique addresses in resolver order."""
+    addresses = []
+    for family, type_, proto, canonname, sockaddr in socket.getaddrinfo(
+            host, port, 0, socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class Resolver(object):
+    """Return the addresses to connect to for a host and port.
+
+    `overrides` is a list of `(host, port, address)` (``--resolve``). With
+    a `ttl` in seconds, resolved addresses are cached in `config_dir`.
+
+    """
+
+    def __init__(self, config_dir, ttl=0, overrides=()):
+        self.config_dir = config_dir
+        self.ttl = ttl
+        self.overrides = {
+            (host.lower(), port): address
+            for host, port, address in overrides
+        }
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """
+        Return a list of the addresses to try, in order. Without an override
+        or a cache, that's just `host`, which the transport resolves itself.
+
+        """
+        address = self.overrides.get((host.lower(), port))
+        if address:
+            return [address]
+        if not self.ttl or is_ip_address(host):
+            return [host]
+
+        now = time.time()
+        with self._lock:
+            entry = self._get_cache().get(host)
+            if entry and entry['expires'] > now:
+                return entry['addresses']
+
+        addresses = get_addresses(host, port)
+        with self._lock:
+            cache = self._get_cache()
+            for name, entry in list(cache.items()):
+                if name != '__meta__' and entry['expires'] <= now:
+                    del cache[name]
+            cache[host] = {
+                'addresses': addresses,
+                'expires': now + self.ttl,
+            }
+            try:
+                cache.save()
+            except (IOError, OSError):
+                pass
+        return addresses
+
+    def _get_cache(self):
+        if self._cache is None:
+            self._cache = DNSCache(directory=self.config_dir)
+            try:
+                self._cache.load()
+            except ValueError:
+                pass
+        return self._cache
+
+
+_resolvers = {}
+
+
+def get_resolver(config_dir, ttl=0, overrides=()):
+    """
+    Return the shared `Resolver` for the given options, or `None` when
+    hostnames are resolved as usual.
+
+    The transports keep separate connection pools for each resolver,
+    so that a connection is never reused for a different address.
+
+    """
+    if not ttl and not overrides:
+        return None
+    key = config_dir, ttl, tuple(sorted(overrides))
+    try:
+        return _resolvers[key]
+    except KeyError:
+        resolver = _resolvers[key] = Resolver(
+            config_dir=config_dir, ttl=ttl, overrides=overrides)
+        return resolver
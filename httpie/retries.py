@@ -0,0 +1,182 @@
+"""
+Retrying failed requests (``--max-retries``).
+
+A request is retried when it fails in one of the ``--retry-on`` ways:
+``connect`` (no connection could be made), ``read`` (the connection broke
+or timed out while waiting for the response), a status code (``429``) or
+a class of them (``5xx``). Requests that aren't idempotent are only retried
+on connection failures, as the server may have processed them otherwise.
+
+The waits between the attempts grow exponentially from ``--retry-backoff``
+seconds, with "full jitter": each wait is a random duration between zero
+and the exponential value, so that clients failing at the same time don't
+all come back at the same time. A ``Retry-After`` response header takes
+precedence, and no retry is started once it would begin more than
+``--retry-budget`` seconds after the first attempt.
+
+Pooled keep-alive connections that the server has closed are taken care
+of by the transports, whatever the options (see
+`httpie.transport.StaleConnectionRetry`).
+
+"""
+import random
+import time
+
+import requests
+from requests.packages.urllib3.exceptions import NewConnectionError
+
+
+RETRY_CONNECT = 'connect'
+RETRY_READ = 'read'
+
+DEFAULT_RETRY_ON = '5xx,429,connect,read'
+DEFAULT_BACKOFF = 0.5
+DEFAULT_BUDGET = 60
+
+# The longest wait computed from the backoff (not from ``Retry-After``).
+MAX_BACKOFF = 30
+
+IDEMPOTENT_METHODS = frozenset(
+    ['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'TRACE'])
+
+
+def get_error_kind(error):
+    """
+    Return `RETRY_CONNECT` or `RETRY_READ` for a `requests` exception
+    `error`, or `None` if it isn't worth retrying (e.g., a TLS error).
+
+    """
+    if isinstance(error, (requests.ConnectTimeout,
+                          requests.exceptions.ProxyError)):
+        return RETRY_CONNECT
+    if isinstance(error, requests.ReadTimeout):
+        return RETRY_READ
+    if isinstance(error, requests.exceptions.SSLError):
+        return None
+    if isinstance(error, requests.ConnectionError):
+        reason = error.args[0] if error.args else None
+        # `urllib3.exceptions.MaxRetryError`
+        reason = getattr(reason, 'reason', reason)
+        if isinstance(reason, NewConnectionError):
+            return RETRY_CONNECT
+        return RETRY_READ
+    return None
+
+
+def parse_retry_after(value, now=None):
+    """
+    Return the seconds to wait for a ``Retry-After`` header `value`
+    (seconds or an HTTP date), or `None` if it's invalid.
+
+    """
+    from email.utils import parsedate_to_datetime
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0, date.timestamp() - now)
+
+
+class RetryPolicy(object):
+    """When to retry a request and how long to wait before doing so."""
+
+    def __init__(self, max_retries=0, retry_on=DEFAULT_RETRY_ON.split(','),
+                 backoff=DEFAULT_BACKOFF, budget=DEFAULT_BUDGET):
+        self.max_retries = max_retries
+        self.retry_on = frozenset(retry_on)
+        self.backoff = backoff
+        self.budget = budget
+
+    def get_reason(self, method, response=None, error=None):
+        """
+        Return why the attempt that ended with `response` or `error` should
+        be retried (e.g., ``'connect'`` or ``'503'``), or `None`.
+
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        if error is not None:
+            kind = get_error_kind(error)
+            if kind not in self.retry_on:
+                return None
+            if kind == RETRY_READ and not idempotent:
+                return None
+            return kind
+        status = response.status_code
+        if idempotent and (str(status) in self.retry_on
+                           or '%dxx' % (status // 100) in self.retry_on):
+            return str(status)
+        return None
+
+    def get_wait(self, retry, response=None):
+        """Return the seconds to wait before retry number `retry` (from 0)."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                seconds = parse_retry_after(retry_after)
+                if seconds is not None:
+                    return seconds
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** retry))
+
+
+def send_with_retries(send, policy, method, rewind=None, log=None,
+                      sleep=time.sleep, clock=time.monotonic):
+    """
+    Call `send()` until it returns a response that `policy` doesn't want
+    retried, or until retries run out, and return that response (or raise
+    the last `requests.RequestException`).
+
+    `rewind()` is called before each retry to rewind the request body;
+    with `rewind=None`, the body can't be sent again, so only connection
+    failures are retried. `log()` is given ``--debug`` lines.
+
+    """
+    start = clock()
+    waited = 0
+    retry = 0
+    while True:
+        response = error = None
+        try:
+            response = send()
+        except requests.RequestException as e:
+            error = e
+
+        reason = None
+        if retry < policy.max_retries:
+            reason = policy.get_reason(method, response, error)
+            if rewind is None and reason != RETRY_CONNECT:
+                reason = None
+        if reason is not None:
+            wait = policy.get_wait(retry, response)
+            if clock() - start + wait > policy.budget:
+                if log:
+                    log('>>> Not retrying (%s): waiting %.2f s would exceed'
+                        ' the retry budget of %s s\n'
+                        % (reason, wait, policy.budget))
+                reason = None
+
+        if reason is None:
+            if log and policy.max_retries:
+                log('>>> %d attempt(s), %.2f s spent waiting for retries\n\n'
+                    % (retry + 1, waited))
+            if error is not None:
+                raise error
+            return response
+
+        if log:
+            log('>>> Retry %d/%d in %.2f s (%s)\n' % (
+                retry + 1, policy.max_retries, wait,
+                '%s: %s' % (type(error).__name__, error)
+                if error is not None else reason))
+        if response is not None:
+            response.close()
+        sleep(wait)
+        waited += wait
+        retry += 1
+        if rewind is not None:
+            rewind()
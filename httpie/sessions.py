@@ -26,7 +26,7 @@ def get_response(requests_session, session_name,
     aspects of the session to the request.
 
     """
-    from .client import get_requests_kwargs, dump_request
+    from .client import get_requests_kwargs, dump_request, send_request
     if os.path.sep in session_name:
         path = os.path.expanduser(session_name)
     else:
@@ -62,7 +62,7 @@ def get_response(requests_session, session_name,
     requests_session.cookies = session.cookies
 
     try:
-        response = requests_session.request(**kwargs)
+        response = send_request(requests_session, kwargs, args)
     except Exception:
         raise
     else:
@@ -0,0 +1,182 @@
+"""
+Per-request phase timings (``--timings``).
+
+`start_timings()` sets `current_timings` to an empty list, and each request
+sent from then on by the transport adapters (every redirect hop and retry)
+appends a `Timings` to it. The connections of the default engine `mark()`
+the phases of the exchange as they happen: resolving the hostname,
+connecting, the TLS handshake, sending the request, and receiving the
+response head. The output streams add the time spent receiving and
+formatting the response body.
+
+Only timestamps are taken while the request is in flight; everything else
+happens in `format_timings()`, once the exchange is over. When
+`current_timings` isn't set, `mark()` is all that runs.
+
+"""
+import contextvars
+import json
+import time
+
+
+TIMINGS_FORMAT_TEXT = 'text'
+TIMINGS_FORMAT_JSON = 'json'
+TIMINGS_FORMATS = [TIMINGS_FORMAT_TEXT, TIMINGS_FORMAT_JSON]
+
+# The phases in the order they happen, with their column titles.
+PHASES = [
+    ('dns', 'DNS'),
+    ('connect', 'Connect'),
+    ('tls', 'TLS'),
+    ('send', 'Send'),
+    ('ttfb', 'TTFB'),
+    ('transfer', 'Transfer'),
+    ('format', 'Format'),
+]
+
+# A list that the `Timings` of the current exchange are appended to, if set.
+current_timings = contextvars.ContextVar('current_timings', default=None)
+
+
+class Timings(object):
+    """
+    The timestamps (`time.perf_counter()`) of a request, and the time spent
+    reading and formatting its response body.
+
+    """
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.status = None
+        self.marks = {'start': time.perf_counter()}
+        self.durations = {}
+
+    def add(self, phase, seconds):
+        self.durations[phase] = self.durations.get(phase, 0) + seconds
+
+    def iter_timed(self, iterable, phase):
+        """Yield from `iterable`, adding the time spent waiting for it."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(phase, time.perf_counter() - start)
+                return
+            self.add(phase, time.perf_counter() - start)
+            yield item
+
+    @property
+    def reused_connection(self):
+        return 'connect_start' not in self.marks
+
+    def get_phases(self):
+        """Return the seconds spent in each of `PHASES` (`None` if unknown)."""
+        marks = self.marks
+
+        def between(start, end):
+            if start in marks and end in marks:
+                return marks[end] - marks[start]
+            return None
+
+        send = None
+        if 'sent' in marks:
+            # With plain HTTP, the connection is made in the middle of
+            # sending the request.
+            send_start = max(marks.get(name, 0) for name in [
+                'start', 'send_start', 'connected', 'tls'])
+            send = marks['sent'] - send_start
+        return {
+            'dns': between('connect_start', 'resolved'),
+            'connect': between('resolved', 'connected'),
+            'tls': between('connected', 'tls'),
+            'send': send,
+            'ttfb': between('sent', 'headers'),
+            'transfer': self.durations.get('transfer'),
+            'format': self.durations.get('format'),
+        }
+
+    def get_total(self):
+        """Return the seconds from sending the request to the end of the
+        response body (or the response head, if the body wasn't read)."""
+        total = (self.marks.get('headers', self.marks['start'])
+                 - self.marks['start'])
+        return total + sum(self.durations.values())
+
+
+def start_timings():
+    """Collect the `Timings` of the requests sent from now on, and return
+    the list they are appended to."""
+    timings = []
+    current_timings.set(timings)
+    return timings
+
+
+def mark(name):
+    """Record that the current request has reached `name` (e.g., ``'sent'``)."""
+    timings = current_timings.get()
+    if timings:
+        timings[-1].marks[name] = time.perf_counter()
+
+
+def start_hop(request):
+    """Called by the adapters before sending a `requests.PreparedRequest`."""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.append(Timings(request.method, request.url))
+
+
+def finish_hop(response):
+    """Called by the adapters with the response to the last request sent;
+    return `response`."""
+    timings = current_timings.get()
+    if timings:
+        timings[-1].status = response.status_code
+        timings[-1].marks.setdefault('headers', time.perf_counter())
+    return response
+
+
+def format_timings(timings, output_format=TIMINGS_FORMAT_TEXT):
+    """Return the report of `timings`, a list of `Timings`, as `str`."""
+
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 3)
+
+    if output_format == TIMINGS_FORMAT_JSON:
+        return json.dumps([
+            {
+                'method': hop.method,
+                'url': hop.url,
+                'status': hop.status,
+                'reused_connection': hop.reused_connection,
+                'timings_ms': dict(
+                    [(phase, ms(seconds))
+                     for phase, seconds in hop.get_phases().items()]
+                    + [('total', ms(hop.get_total()))]
+                ),
+            }
+            for hop in timings
+        ], indent=4) + '\n'
+
+    titles = ['Hop', 'Status'] + [title for phase, title in PHASES] + [
+        'Total']
+    rows = []
+    for number, hop in enumerate(timings, 1):
+        phases = hop.get_phases()
+        row = [str(number), str(hop.status or '-')]
+        row.extend('-' if phases[phase] is None else '%.2f' % ms(phases[phase])
+                   for phase, title in PHASES)
+        row.append('%.2f' % ms(hop.get_total()))
+        row.append('%s %s' % (hop.method, hop.url))
+        rows.append(row)
+    widths = [max([len(title)] + [len(row[i]) for row in rows])
+              for i, title in enumerate(titles)]
+    lines = ['  '.join(title.rjust(width)
+                       for title, width in zip(titles, widths))
+             + '  Request (times in ms)']
+    lines.extend('  '.join([cell.rjust(width)
+                            for cell, width in zip(row, widths)] + row[-1:])
+                 for row in rows)
+    return '\n%s\n\n' % '\n'.join(lines)
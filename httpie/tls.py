@@ -0,0 +1,212 @@
+"""
+TLS contexts and session resumption.
+
+Preparing an `ssl.SSLContext` (mostly, loading the CA bundle) takes a lot
+longer than a TLS handshake with a nearby server, so `get_ssl_context()`
+prepares one per set of TLS options and process, shared by all the
+connections and both engines.
+
+A `SessionSSLContext` remembers the TLS session of the last connection to
+each host and port, and offers it to the server on the following
+connection, which then skips the full handshake (and a round trip or
+two). The sessions live as long as the context does, that is, as long
+as the shared transport adapter of the process (see `httpie.client`).
+That covers every request of a ``--batch`` run and, with the daemon
+(``HTTPIE_DAEMON=1``), repeated invocations.
+
+The `ssl` module has no way to serialize a session, so they are never
+stored on disk.
+
+"""
+import contextvars
+import os
+import ssl
+import threading
+import weakref
+
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+
+
+# The port that the `asyncio` engine connects to, for `wrap_bio()`, which
+# only gets the hostname. `wrap_socket()` uses the peer address instead.
+connection_port = contextvars.ContextVar('connection_port', default=None)
+
+# The ALPN protocols offered by default.
+DEFAULT_PROTOCOLS = ('http/1.1',)
+
+# `SessionSSLContext` by `(verify, cert, protocols)`.
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+def is_resumable(session):
+    return session is not None and (session.has_ticket or bool(session.id))
+
+
+class SessionCache(object):
+    """TLS sessions by `(hostname, port)`.
+
+    The session of a connection is only final once the server has sent its
+    session tickets, which with TLS 1.3 happens after the handshake. So the
+    cache keeps a weak reference to the last connection to each key and
+    asks it for its current session, falling back to the session saved
+    when the connection was closed.
+
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            ref = self._connections.get(key)
+            session = self._sessions.get(key)
+        connection = ref() if ref is not None else None
+        if connection is not None:
+            try:
+                current = connection.session
+            except (OSError, ValueError):
+                current = None
+            if is_resumable(current):
+                return current
+        return session
+
+    def add(self, key, connection):
+        """Track `connection`, an `SSLSocket` or an `SSLObject`."""
+        with self._lock:
+            self._connections[key] = weakref.ref(connection)
+
+    def save(self, key, connection):
+        """Save the session of `connection` before it's closed."""
+        try:
+            session = connection.session
+        except (OSError, ValueError):
+            return
+        if is_resumable(session):
+            with self._lock:
+                self._sessions[key] = session
+
+
+class SessionSSLSocket(ssl.SSLSocket):
+
+    session_key = None
+
+    def close(self):
+        if self.session_key is not None and not self._closed:
+            self.context.sessions.save(self.session_key, self)
+        super(SessionSSLSocket, self).close()
+
+
+class SessionSSLContext(ssl.SSLContext):
+    """An `ssl.SSLContext` resuming TLS sessions on new connections."""
+
+    sslsocket_class = SessionSSLSocket
+
+    def __init__(self, *args, **kwargs):
+        super(SessionSSLContext, self).__init__()
+        self.sessions = SessionCache()
+
+    def wrap_socket(self, sock, server_side=False, *args, **kwargs):
+        key = None
+        if not server_side and kwargs.get('server_hostname'):
+            try:
+                port = sock.getpeername()[1]
+            except (OSError, IndexError):
+                port = None
+            key = kwargs['server_hostname'], port
+            if kwargs.get('session') is None:
+                kwargs['session'] = self.sessions.get(key)
+        ssl_socket = super(SessionSSLContext, self).wrap_socket(
+            sock, server_side, *args, **kwargs)
+        if key is not None:
+            ssl_socket.session_key = key
+            self.sessions.add(key, ssl_socket)
+        return ssl_socket
+
+    def wrap_bio(self, incoming, outgoing, server_side=False,
+                 server_hostname=None, session=None):
+        key = None
+        if not server_side and server_hostname:
+            key = server_hostname, connection_port.get()
+            if session is None:
+                session = self.sessions.get(key)
+        ssl_object = super(SessionSSLContext, self).wrap_bio(
+            incoming, outgoing, server_side=server_side,
+            server_hostname=server_hostname, session=session)
+        if key is not None:
+            ssl_object.session_key = key
+            self.sessions.add(key, ssl_object)
+        return ssl_object
+
+
+def create_ssl_context(verify, cert, protocols=DEFAULT_PROTOCOLS):
+    """Return a new `SessionSSLContext` for the `requests` TLS options."""
+    context = SessionSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if verify is False:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        ca_path = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+        if os.path.isdir(ca_path):
+            context.load_verify_locations(capath=ca_path)
+        else:
+            context.load_verify_locations(cafile=ca_path)
+    if cert:
+        if isinstance(cert, (tuple, list)):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+    context.set_alpn_protocols(list(protocols))
+    return context
+
+
+def get_ssl_context(verify, cert, protocols=DEFAULT_PROTOCOLS):
+    """
+    Return the shared `SessionSSLContext` for the `requests` TLS options,
+    creating it on first use.
+
+    Raise `OSError` or `ssl.SSLError` when the CA bundle or the client
+    certificate can't be loaded.
+
+    """
+    if isinstance(cert, list):
+        cert = tuple(cert)
+    key = verify, cert, tuple(protocols)
+    with _contexts_lock:
+        try:
+            return _contexts[key]
+        except KeyError:
+            context = _contexts[key] = create_ssl_context(
+                verify, cert, protocols)
+            return context
+
+
+def save_session(ssl_object):
+    """Save the session of `ssl_object` (e.g., from `asyncio`) on close."""
+    key = getattr(ssl_object, 'session_key', None)
+    if key is not None:
+        ssl_object.context.sessions.save(key, ssl_object)
+
+
+def get_ssl_object(response):
+    """
+    Return the `SSLSocket` or `SSLObject` that a `requests` response was
+    received on, if it's still available.
+
+    """
+    raw = response.raw
+    original = getattr(raw, '_original_response', None)
+    ssl_object = getattr(getattr(raw, 'connection', None), 'sock', None)
+    if ssl_object is None:
+        # `httpie.aio.ResponseHead`
+        ssl_object = getattr(original, 'ssl_object', None)
+    if ssl_object is None:
+        # A connection closed after the response head (``Connection: close``)
+        # is still read from through the file object of its socket.
+        socket_io = getattr(getattr(original, 'fp', None), 'raw', None)
+        ssl_object = getattr(socket_io, '_sock', None)
+    if hasattr(ssl_object, 'session_reused'):
+        return ssl_object
+    return None
@@ -0,0 +1,320 @@
+"""
+`requests` transport adapters with custom `urllib3` connections.
+
+`SessionHTTPAdapter` uses the shared TLS contexts of `httpie.tls`, which
+have the certificates loaded already and resume TLS sessions, races
+connections to the addresses of a host (see `httpie.racing`), and retries
+idempotent requests sent on stale keep-alive connections.
+
+Both take the socket options built by `get_socket_options()`, which
+replace the default ones of `urllib3` (just ``TCP_NODELAY``).
+
+`ResolvingHTTPAdapter` also connects to the addresses returned by
+a `httpie.resolver.Resolver` instead of resolving the hostname in each
+new connection. The hostname is still used for everything else
+(``Host``, TLS SNI and certificate verification).
+
+"""
+import socket
+import ssl
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import SSLError
+from requests.packages.urllib3.connection import (HTTPConnection,
+                                                  HTTPSConnection)
+from requests.packages.urllib3.exceptions import (ConnectTimeoutError,
+                                                  NewConnectionError,
+                                                  ProtocolError)
+from requests.packages.urllib3.poolmanager import PoolManager
+from requests.packages.urllib3.util.connection import allowed_gai_family
+from requests.packages.urllib3.util.retry import Retry
+
+from httpie.racing import create_connection
+from httpie.timings import finish_hop, mark, start_hop
+from httpie.tls import get_ssl_context
+from httpie.uploads import FileBody
+
+
+def get_socket_options(nodelay=True, keepalive=None, send_buffer=None,
+                       recv_buffer=None):
+    """
+    Return a tuple of `(level, option, value)` socket options.
+
+    `keepalive` is `(idle, interval, count)` in seconds; `interval`
+    and `count` may be `None` to keep the system defaults.
+
+    """
+    options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(nodelay))]
+    if keepalive:
+        idle, interval, count = keepalive
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        # macOS calls `TCP_KEEPIDLE` `TCP_KEEPALIVE`.
+        idle_option = getattr(socket, 'TCP_KEEPIDLE',
+                              getattr(socket, 'TCP_KEEPALIVE', None))
+        for option, value in [(idle_option, idle),
+                              (getattr(socket, 'TCP_KEEPINTVL', None),
+                               interval),
+                              (getattr(socket, 'TCP_KEEPCNT', None), count)]:
+            if option is not None and value is not None:
+                options.append((socket.IPPROTO_TCP, option, value))
+    if send_buffer:
+        options.append((socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer))
+    if recv_buffer:
+        options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer))
+    return tuple(options)
+
+
+def format_socket_options(options):
+    """Return `options` as ``NAME=VALUE`` strings."""
+    names = {
+        (socket.SOL_SOCKET, getattr(socket, name)): name
+        for name in ['SO_KEEPALIVE', 'SO_SNDBUF', 'SO_RCVBUF']
+    }
+    names.update({
+        (socket.IPPROTO_TCP, getattr(socket, name)): name
+        for name in ['TCP_NODELAY', 'TCP_KEEPIDLE', 'TCP_KEEPALIVE',
+                     'TCP_KEEPINTVL', 'TCP_KEEPCNT']
+        if hasattr(socket, name)
+    })
+    return ['%s=%s' % (names.get((level, option), (level, option)), value)
+            for level, option, value in options]
+
+
+def is_resendable(body):
+    """Return whether a request `body` can be sent again (`urllib3` rewinds
+    the file objects that can be)."""
+    if body is None or isinstance(body, (bytes, str)):
+        return True
+    seekable = getattr(body, 'seekable', None)
+    return seekable is not None and seekable()
+
+
+class RacingConnectionMixin(object):
+    """
+    Connect with `httpie.racing.create_connection()`, and mark the phases
+    of the exchange for ``--timings`` (see `httpie.timings`).
+
+    The errors of an exchange have a `resendable` attribute for
+    `StaleConnectionRetry`: whether the connection was reused (so the
+    server may have closed it meanwhile) and the request can be sent again.
+
+    """
+
+    # The number of requests sent since the connection was (re)opened.
+    requests_sent = 0
+    resendable = False
+
+    def get_hosts(self):
+        """Return the hosts to connect to (what `urllib3` resolves)."""
+        return [self._dns_host]
+
+    def connect(self):
+        mark('connect_start')
+        self.requests_sent = 0
+        self.resendable = False
+        super(RacingConnectionMixin, self).connect()
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        mark('send_start')
+        # Reset by `connect()` when the connection is (re)opened as the
+        # request is sent.
+        self.resendable = self.requests_sent > 0 and is_resendable(body)
+        try:
+            if (isinstance(body, FileBody) and body.len
+                    and not kwargs.get('chunked')):
+                # Send the head (with the `Content-Length` set by
+                # `requests`), and then the file, without reading it.
+                super(RacingConnectionMixin, self).request(
+                    method, url, None, headers, **kwargs)
+                self.sock.sendfile(*body.get_sendfile_args())
+            else:
+                super(RacingConnectionMixin, self).request(
+                    method, url, body, headers, **kwargs)
+        except Exception as e:
+            e.resendable = self.resendable
+            raise
+        self.requests_sent += 1
+        mark('sent')
+
+    def getresponse(self, *args, **kwargs):
+        try:
+            response = super(RacingConnectionMixin, self).getresponse(
+                *args, **kwargs)
+        except Exception as e:
+            e.resendable = self.resendable
+            raise
+        mark('headers')
+        return response
+
+    def _new_conn(self):
+        # `urllib3` passes its own default timeout sentinel.
+        timeout = self.timeout
+        if not isinstance(timeout, (int, float)):
+            timeout = socket.getdefaulttimeout()
+        try:
+            sock = create_connection(
+                self.get_hosts(), self.port, timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options,
+                family=allowed_gai_family(),
+            )
+        except socket.gaierror as e:
+            raise NewConnectionError(
+                self, 'Failed to resolve %r (%s)' % (self.host, e))
+        except socket.timeout:
+            raise ConnectTimeoutError(
+                self, 'Connection to %s timed out. (connect timeout=%s)'
+                % (self.host, timeout))
+        except OSError as e:
+            raise NewConnectionError(
+                self, 'Failed to establish a new connection: %s' % e)
+        mark('connected')
+        return sock
+
+
+class RacingHTTPConnection(RacingConnectionMixin, HTTPConnection):
+    pass
+
+
+class RacingHTTPSConnection(RacingConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        super(RacingHTTPSConnection, self).connect()
+        mark('tls')
+
+
+class ResolvingConnectionMixin(object):
+
+    def __init__(self, *args, **kwargs):
+        self.resolver = kwargs.pop('resolver')
+        super(ResolvingConnectionMixin, self).__init__(*args, **kwargs)
+
+    def get_hosts(self):
+        try:
+            return self.resolver.resolve(self._dns_host, self.port)
+        except OSError as e:
+            raise NewConnectionError(
+                self, 'Failed to establish a new connection: %s' % e)
+
+
+class ResolvingHTTPConnection(ResolvingConnectionMixin, RacingHTTPConnection):
+    pass
+
+
+class ResolvingHTTPSConnection(ResolvingConnectionMixin,
+                               RacingHTTPSConnection):
+    pass
+
+
+class RacingPoolManager(PoolManager):
+
+    connection_classes_by_scheme = {
+        'http': RacingHTTPConnection,
+        'https': RacingHTTPSConnection,
+    }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(RacingPoolManager, self)._new_pool(
+            scheme, host, port, request_context=request_context)
+        pool.ConnectionCls = self.connection_classes_by_scheme[scheme]
+        return pool
+
+
+class ResolvingPoolManager(RacingPoolManager):
+
+    connection_classes_by_scheme = {
+        'http': ResolvingHTTPConnection,
+        'https': ResolvingHTTPSConnection,
+    }
+
+    def __init__(self, resolver, *args, **kwargs):
+        super(ResolvingPoolManager, self).__init__(*args, **kwargs)
+        self.resolver = resolver
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(ResolvingPoolManager, self)._new_pool(
+            scheme, host, port, request_context=request_context)
+        pool.conn_kw['resolver'] = self.resolver
+        return pool
+
+
+class StaleConnectionRetry(Retry):
+    """
+    Retry an idempotent request once when its reused keep-alive connection
+    breaks before the response, which is what happens when the server has
+    closed it meanwhile, and when its body can be sent again. Other errors
+    (e.g., on a new connection) aren't retried, as with the default retries
+    of `requests` (see also `httpie.retries`).
+
+    """
+
+    def __init__(self, total=1, connect=0, read=1, redirect=0, status=0,
+                 respect_retry_after_header=False, **kwargs):
+        super(StaleConnectionRetry, self).__init__(
+            total=total, connect=connect, read=read, redirect=redirect,
+            status=status,
+            respect_retry_after_header=respect_retry_after_header, **kwargs)
+
+    def increment(self, *args, **kwargs):
+        error = kwargs.get('error')
+        # `urllib3` wraps the error of the connection.
+        cause = error.args[-1] if isinstance(error, ProtocolError) else None
+        if not getattr(cause, 'resendable', False):
+            return Retry(0, read=False).increment(*args, **kwargs)
+        return super(StaleConnectionRetry, self).increment(*args, **kwargs)
+
+
+class SessionHTTPAdapter(HTTPAdapter):
+    """An `HTTPAdapter` using the shared TLS contexts of `httpie.tls`."""
+
+    def __init__(self, socket_options=None, *args, **kwargs):
+        self.socket_options = socket_options
+        kwargs.setdefault('max_retries', StaleConnectionRetry())
+        super(SessionHTTPAdapter, self).__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        # Also called by `httpie.client.configure_pools()`.
+        # Like `HTTPAdapter.init_poolmanager()`, but with our pool manager.
+        if self.socket_options is not None:
+            pool_kwargs.setdefault('socket_options',
+                                   list(self.socket_options))
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = self.create_poolmanager(
+            num_pools=connections, maxsize=maxsize, block=block,
+            **pool_kwargs)
+
+    def create_poolmanager(self, **kwargs):
+        return RacingPoolManager(**kwargs)
+
+    def send(self, request, *args, **kwargs):
+        start_hop(request)
+        return finish_hop(super(SessionHTTPAdapter, self).send(
+            request, *args, **kwargs))
+
+    def cert_verify(self, conn, url, verify, cert):
+        super(SessionHTTPAdapter, self).cert_verify(conn, url, verify, cert)
+        if not url.lower().startswith('https'):
+            return
+        try:
+            context = get_ssl_context(verify, cert)
+        except (OSError, ssl.SSLError) as e:
+            raise SSLError(e)
+        # `urllib3` would otherwise load the certificates into the context
+        # for every new connection.
+        conn.conn_kw['ssl_context'] = context
+        conn.ca_certs = conn.ca_cert_dir = None
+        conn.cert_file = conn.key_file = None
+
+
+class ResolvingHTTPAdapter(SessionHTTPAdapter):
+    """A `SessionHTTPAdapter` resolving hostnames with `resolver`."""
+
+    def __init__(self, resolver, *args, **kwargs):
+        self.resolver = resolver
+        super(ResolvingHTTPAdapter, self).__init__(*args, **kwargs)
+
+    def create_poolmanager(self, **kwargs):
+        return ResolvingPoolManager(self.resolver, **kwargs)
@@ -0,0 +1,309 @@
+"""
+Streamed request bodies.
+
+A request body read from stdin (or a file) is sent while it's being read,
+in blocks of up to `READ_SIZE` bytes, instead of being read in full first.
+When its size is known (e.g., stdin is redirected from a regular file), it's
+sent with a ``Content-Length``; otherwise (e.g., a pipe), with chunked
+transfer encoding. An empty stdin or file (e.g., ``< /dev/null``) means no
+body at all, so a pipe is read from until its first block is available.
+
+A `FileBody` (a regular file, e.g., ``@file`` or ``< file``) is sent by the
+connections of the ``requests`` and ``asyncio`` engines with
+``sendfile()``, which copies it from the file to the socket in the kernel
+for plain HTTP (it's still read in blocks for HTTPS).
+
+A `MultipartBody` (``--form`` with ``field@file``) is encoded as it's sent,
+and the files are read from the disk in blocks too. Its ``Content-Length``
+is the size of the files plus that of the rest of the body.
+
+Only the first `BODY_PREVIEW_SIZE` bytes that are sent are kept, so that
+``--verbose`` can show them once the request is over.
+
+The files opened for a body (``@file`` and ``field@file``, but not stdin)
+are closed by its `close()`, once the request is over.
+
+"""
+import collections
+import io
+import os
+import stat
+
+from requests.packages.urllib3.fields import RequestField
+from requests.packages.urllib3.filepost import choose_boundary
+
+
+READ_SIZE = 64 * 1024
+
+BODY_PREVIEW_SIZE = 64 * 1024
+
+
+class StreamedBody(object):
+    """
+    A request body read from the binary file object `fd` as it's sent.
+
+    `requests` sends a body that is iterable as it iterates over it, with
+    a ``Content-Length`` of its `len` when that's not `None`, and chunked
+    otherwise. The other engines use `read()`.
+
+    `close()` closes `fd` when `close_fd` is true (i.e., it was opened
+    for the body).
+
+    """
+
+    len = None
+
+    def __init__(self, fd, preview_size=BODY_PREVIEW_SIZE, peeked=b'',
+                 close_fd=False):
+        self.fd = fd
+        self.close_fd = close_fd
+        self.preview_size = preview_size
+        # Read from `fd` already (see `get_streamed_body()`).
+        self.peeked = peeked
+        # The start of the body, and how much of it has been read.
+        self.preview = b''
+        self.sent = 0
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        """
+        Return up to `size` bytes of the body, or what's left of it if
+        `size` is negative. Like a raw file, return as soon as some data
+        is available, so that what's piped in is sent without delay.
+
+        """
+        if self.peeked:
+            if size is None or size < 0:
+                chunk, self.peeked = self.peeked + self.fd.read(), b''
+            else:
+                chunk, self.peeked = self.peeked[:size], self.peeked[size:]
+        elif size is None or size < 0:
+            chunk = self.fd.read()
+        else:
+            chunk = getattr(self.fd, 'read1', self.fd.read)(size)
+        if self.sent == len(self.preview) < self.preview_size:
+            self.preview += chunk[:self.preview_size - self.sent]
+        self.sent += len(chunk)
+        return chunk
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        if self.close_fd:
+            self.fd.close()
+
+    @property
+    def omitted(self):
+        """The number of bytes sent and not kept in `preview`."""
+        return self.sent - len(self.preview)
+
+
+class SeekableStreamedBody(StreamedBody):
+    """
+    A `StreamedBody` of a known size, `len`, that can be rewound (e.g., to
+    retry the request, or to follow a 307 redirect).
+
+    """
+
+    def __init__(self, fd, size, preview_size=BODY_PREVIEW_SIZE,
+                 close_fd=False):
+        super(SeekableStreamedBody, self).__init__(fd, preview_size,
+                                                   close_fd=close_fd)
+        self.start = fd.tell()
+        self.len = size
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.sent
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.sent
+        elif whence == io.SEEK_END:
+            offset += self.len
+        self.fd.seek(self.start + offset)
+        self.sent = offset
+        self.preview = self.preview[:offset]
+        return offset
+
+
+class FileBody(SeekableStreamedBody):
+    """A `SeekableStreamedBody` of a regular file, which can be sent with
+    ``sendfile()``."""
+
+    def get_sendfile_args(self):
+        """
+        Return `(file, offset, count)` for `socket.socket.sendfile()` (or
+        `asyncio.AbstractEventLoop.sendfile()`) to send the rest of the
+        body, which is then considered sent.
+
+        """
+        offset = self.start + self.sent
+        count = self.len - self.sent
+        if self.sent == len(self.preview) < self.preview_size:
+            self.fd.seek(offset)
+            self.preview += self.fd.read(self.preview_size - self.sent)
+        self.sent = self.len
+        return self.fd, offset, count
+
+
+class ChainedReader(object):
+    """A binary file object reading `parts`, a list of `bytes` and binary
+    file objects, one after another."""
+
+    def __init__(self, parts):
+        self.parts = collections.deque(parts)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(READ_SIZE), b''))
+        while self.parts:
+            part = self.parts[0]
+            if isinstance(part, bytes):
+                chunk, self.parts[0] = part[:size], part[size:]
+            else:
+                chunk = part.read(size)
+            if chunk:
+                return chunk
+            self.parts.popleft()
+        return b''
+
+
+class MultipartBody(StreamedBody):
+    """
+    A ``multipart/form-data`` body of the form `fields` and `files` (see
+    `get_multipart_parts()`), encoded as it's sent. When the size of each
+    file is known, so is `len`, and the body can be rewound.
+
+    """
+
+    def __init__(self, fields, files, boundary=None,
+                 preview_size=BODY_PREVIEW_SIZE):
+        self.boundary = boundary or choose_boundary()
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        self.parts = get_multipart_parts(fields, files, self.boundary)
+        sizes = [len(part) if isinstance(part, bytes) else get_size(part)
+                 for part in self.parts]
+        if None not in sizes:
+            self.len = sum(sizes)
+            self.starts = {part: part.tell() for part in self.parts
+                           if not isinstance(part, bytes)}
+        super(MultipartBody, self).__init__(ChainedReader(self.parts),
+                                            preview_size)
+
+    def seekable(self):
+        return self.len is not None
+
+    def close(self):
+        """Close the files, which are all opened for the body."""
+        for part in self.parts:
+            if not isinstance(part, bytes):
+                part.close()
+
+    def tell(self):
+        return self.sent
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if not self.seekable() or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('seek')
+        for part, start in self.starts.items():
+            part.seek(start)
+        self.fd = ChainedReader(self.parts)
+        self.sent = 0
+        self.preview = b''
+        while self.sent < offset:
+            if not self.read(min(READ_SIZE, offset - self.sent)):
+                break
+        return self.sent
+
+
+def get_multipart_parts(fields, files, boundary):
+    """
+    Return the ``multipart/form-data`` encoding of `fields` (e.g., a
+    `httpie.input.ParamsDict`) and `files` (e.g., a `httpie.input.DataDict`
+    of `(filename, file)`), as a list of `bytes` and the files, in the same
+    order, with the same headers, as `requests` encodes them.
+
+    """
+    parts = []
+
+    def add(field, data):
+        parts.append(('--%s\r\n' % boundary).encode('latin-1'))
+        parts.append(field.render_headers().encode('utf8'))
+        parts.append(data)
+        parts.append(b'\r\n')
+
+    for name, values in (fields or {}).items():
+        if isinstance(values, (str, bytes)) or not hasattr(values, '__iter__'):
+            values = [values]
+        for value in values:
+            if value is None:
+                continue
+            if not isinstance(value, bytes):
+                value = str(value).encode('utf8')
+            field = RequestField(name=name, data=value)
+            field.make_multipart()
+            add(field, value)
+
+    for name, (filename, fd) in (files or {}).items():
+        field = RequestField(name=name, data=b'', filename=filename)
+        field.make_multipart()
+        add(field, getattr(fd, 'buffer', fd))
+
+    parts.append(('--%s--\r\n' % boundary).encode('latin-1'))
+    return parts
+
+
+def get_size(fd):
+    """Return the number of bytes left to read from `fd`, or `None` when
+    it's unknown (e.g., `fd` is a pipe or a terminal)."""
+    try:
+        st = os.fstat(fd.fileno())
+    except (AttributeError, OSError):
+        # Not backed by a file descriptor (e.g., `io.BytesIO`).
+        st = None
+    if st is not None and not stat.S_ISREG(st.st_mode):
+        return None
+    try:
+        position = fd.tell()
+        end = st.st_size if st is not None else fd.seek(0, io.SEEK_END)
+        fd.seek(position)
+    except (AttributeError, OSError):
+        return None
+    return max(0, end - position)
+
+
+def get_streamed_body(fd, preview_size=BODY_PREVIEW_SIZE, close_fd=False):
+    """Return a `StreamedBody` sending what's left to read from `fd`
+    (`sys.stdin` or another file object), or `None` if that's nothing.
+
+    With `close_fd`, `fd` is closed by the body, or right away if it's
+    `None`.
+
+    """
+    fd = getattr(fd, 'buffer', fd)
+    size = get_size(fd)
+    if size is None:
+        # Whether there's anything to read is only known once it's read.
+        peeked = getattr(fd, 'read1', fd.read)(READ_SIZE)
+        if peeked:
+            return StreamedBody(fd, preview_size, peeked, close_fd=close_fd)
+    elif size:
+        try:
+            fd.fileno()
+        except (AttributeError, OSError):
+            return SeekableStreamedBody(fd, size, preview_size,
+                                        close_fd=close_fd)
+        return FileBody(fd, size, preview_size, close_fd=close_fd)
+    if close_fd:
+        fd.close()
+    return None
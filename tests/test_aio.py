@@ -0,0 +1,193 @@
+"""asyncio engine tests."""
+import io
+import threading
+import time
+from http.client import BadStatusLine, parse_headers
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from httpie import ExitStatus
+from httpie.aio import (parse_status_line, get_framing, is_keep_alive,
+                        iter_request_body, FRAMING_NONE, FRAMING_LENGTH,
+                        FRAMING_CHUNKED, FRAMING_CLOSE)
+from httpie.client import get_adapter, ENGINE_ASYNCIO
+from utils import http, HTTP_OK
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Serve bodies with the different framings over HTTP/1.1."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in [b'abc', b'def' * 1000, b'ghi']:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\nX-Trailer: 1\r\n\r\n')
+        elif self.path == '/close':
+            self.send_response(200)
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(b'until close')
+            self.close_connection = True
+        elif self.path == '/slow':
+            time.sleep(1)
+            self.send_response(204)
+            self.end_headers()
+        else:
+            body = self.path.encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    server.daemon_threads = True
+    server.requests = 0
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def aio_http(*args, **kwargs):
+    return http('--engine=asyncio', *args, **kwargs)
+
+
+class TestProtocol:
+
+    @pytest.mark.parametrize('line, expected', [
+        (b'HTTP/1.1 200 OK\r\n', (11, 200, 'OK')),
+        (b'HTTP/1.0 404 Not Found\r\n', (10, 404, 'Not Found')),
+        (b'HTTP/1.1 204\r\n', (11, 204, '')),
+    ])
+    def test_parse_status_line(self, line, expected):
+        assert parse_status_line(line) == expected
+
+    @pytest.mark.parametrize('line', [b'', b'HTTP/2 200 OK\r\n',
+                                      b'HTTP/1.1 OK\r\n'])
+    def test_parse_invalid_status_line(self, line):
+        with pytest.raises(BadStatusLine):
+            parse_status_line(line)
+
+    @pytest.mark.parametrize('method, status, headers, expected', [
+        ('GET', 200, b'Content-Length: 5\r\n', (FRAMING_LENGTH, 5)),
+        ('GET', 200, b'Content-Length: 0\r\n', (FRAMING_NONE, 0)),
+        ('GET', 200, b'Transfer-Encoding: chunked\r\n',
+         (FRAMING_CHUNKED, None)),
+        ('GET', 200, b'', (FRAMING_CLOSE, None)),
+        ('HEAD', 200, b'Content-Length: 5\r\n', (FRAMING_NONE, 0)),
+        ('GET', 204, b'', (FRAMING_NONE, 0)),
+        ('GET', 304, b'Content-Length: 5\r\n', (FRAMING_NONE, 0)),
+    ])
+    def test_framing(self, method, status, headers, expected):
+        msg = parse_headers(io.BytesIO(headers + b'\r\n'))
+        assert get_framing(method, 11, status, msg) == expected
+
+    @pytest.mark.parametrize('version, headers, expected', [
+        (11, b'', True),
+        (11, b'Connection: close\r\n', False),
+        (10, b'', False),
+        (10, b'Connection: Keep-Alive\r\n', True),
+    ])
+    def test_keep_alive(self, version, headers, expected):
+        msg = parse_headers(io.BytesIO(headers + b'\r\n'))
+        assert is_keep_alive(version, msg) == expected
+
+    def test_chunked_request_body(self):
+        assert list(iter_request_body(iter([b'ab', b'', 'c']),
+                                      chunked=True)) == [
+            b'2\r\nab\r\n', b'1\r\nc\r\n', b'0\r\n\r\n'
+        ]
+
+    def test_file_request_body(self):
+        assert list(iter_request_body(io.BytesIO(b'abc'),
+                                      chunked=False)) == [b'abc']
+
+
+class TestAsyncioEngine:
+
+    @pytest.mark.parametrize('path', ['/get', '/gzip', '/stream/3',
+                                      '/bytes/1024?seed=1'])
+    def test_same_body_as_requests_engine(self, httpbin, path):
+        url = httpbin.url + path
+        assert aio_http('--body', url) == http('--body', url)
+
+    def test_headers(self, httpbin):
+        r = aio_http('--headers', httpbin.url + '/response-headers?X-A=b')
+        assert HTTP_OK in r
+        assert 'X-A: b' in r
+
+    def test_post(self, httpbin):
+        r = aio_http('--form', 'POST', httpbin.url + '/post', 'a=b')
+        assert '"a": "b"' in r
+
+    def test_redirects_and_cookies(self, httpbin):
+        r = aio_http('--follow', '--body',
+                     httpbin.url + '/cookies/set?a=b')
+        assert '"a": "b"' in r
+
+    def test_https(self, httpbin_secure):
+        r = aio_http('--verify=no', httpbin_secure.url + '/get')
+        assert HTTP_OK in r
+
+    def test_https_verify_failure(self, httpbin_secure):
+        with pytest.raises(requests.exceptions.SSLError):
+            aio_http(httpbin_secure.url + '/get')
+
+    def test_connection_error(self):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            aio_http('http://127.0.0.1:1')
+
+    @pytest.mark.parametrize('path, body', [
+        ('/chunked', 'abc' + 'def' * 1000 + 'ghi'),
+        ('/close', 'until close'),
+    ])
+    def test_framings(self, server, path, body):
+        r = aio_http('--body', server.url + path)
+        assert body in r
+        assert r == http('--body', server.url + path)
+
+    def test_streamed_request_body(self, server):
+        with open(__file__, 'rb') as f:
+            content = f.read()
+            f.seek(0)
+            r = aio_http('--body', 'POST', server.url + '/post',
+                         '@' + __file__)
+        assert r.strip() == content.decode().strip()
+
+    def test_timeout(self, server):
+        r = aio_http('--timeout=0.2', server.url + '/slow',
+                     error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR_TIMEOUT
+
+    def test_connections_reused(self, server):
+        pool = get_adapter(engine=ENGINE_ASYNCIO).pool
+        connections = pool.num_connections
+        for path in ['/a', '/chunked', '/b', '/close', '/c']:
+            aio_http(server.url + path)
+        # A new connection only after `Connection: close`.
+        assert pool.num_connections - connections == 2
+        assert server.requests == 5
@@ -0,0 +1,439 @@
+"""Batch mode tests."""
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mock
+import pytest
+
+import httpie.core
+from httpie import ExitStatus
+from httpie.batch import get_line_args, BatchLineError, EXCHANGE_SEPARATOR
+from httpie.core import get_mode_parser
+from utils import TestEnvironment, mk_config_dir, http, HTTP_OK
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """Respond to ``GET /SECONDS`` with the path, after SECONDS."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(float(self.path.strip('/')))
+        with server.lock:
+            server.active -= 1
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.active = server.max_active = 0
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestBatchLineArgs:
+
+    def test_url_only(self):
+        assert get_line_args({'url': 'example.org'}) == ['example.org']
+
+    def test_all_keys(self):
+        assert get_line_args({
+            'method': 'POST',
+            'url': 'example.org',
+            'headers': {'X-Foo': 'bar'},
+            'params': {'q': 'a b'},
+            'data': {'name': 'foo', 'qty': 2, 'tags': ['a']},
+            'items': ['c=d'],
+            'auth': 'user:pass',
+            'auth_type': 'digest',
+            'session': 'test',
+            'options': ['--form'],
+        }) == [
+            '--form', '--auth=user:pass', '--auth-type=digest',
+            '--session=test', 'POST', 'example.org', 'X-Foo:bar', 'q==a b',
+            'name=foo', 'qty:=2', 'tags:=["a"]', 'c=d',
+        ]
+
+    def test_separators_in_names_escaped(self):
+        assert get_line_args({
+            'url': 'example.org', 'data': {'a=b:c': 'd'},
+        }) == ['example.org', r'a\=b\:c=d']
+
+    @pytest.mark.parametrize('line', [
+        [],
+        {},
+        {'url': ''},
+        {'url': 'example.org', 'bogus': 1},
+        {'url': 'example.org', 'items': [1]},
+    ])
+    def test_invalid(self, line):
+        with pytest.raises(BatchLineError):
+            get_line_args(line)
+
+
+class TestModeParser:
+
+    def parse(self, *args):
+        return get_mode_parser().parse_args(args=list(args),
+                                            env=TestEnvironment())
+
+    def test_batch_options_parsed_out(self):
+        mode_args, args = self.parse('-v', '--batch', 'f', '--parallel=2',
+                                     '-b', 'example.org', 'a=b')
+        assert mode_args.batch == 'f'
+        assert mode_args.parallel == 2
+        assert args == ['-v', '-b', 'example.org', 'a=b']
+
+    def test_other_options_not_taken_for_abbreviations(self):
+        mode_args, args = self.parse('--pipe', '2', '--batch', 'f')
+        assert mode_args.pipeline == 1
+        assert args == ['--pipe', '2']
+
+    def test_no_mode(self):
+        mode_args, args = self.parse('example.org')
+        assert mode_args.batch is None
+        assert not mode_args.bench
+        assert args == ['example.org']
+
+
+class BatchTestBase:
+
+    def setup_method(self, method):
+        self.config_dir = mk_config_dir()
+        self.batch_path = os.path.join(self.config_dir, 'batch.jsonl')
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.config_dir)
+
+    def write_batch(self, *lines):
+        with open(self.batch_path, 'w') as f:
+            for line in lines:
+                f.write(line if isinstance(line, str) else json.dumps(line))
+                f.write('\n')
+
+
+
+class TestBatch(BatchTestBase):
+
+    def test_batch(self, httpbin):
+        self.write_batch(
+            {'url': httpbin.url + '/get', 'params': {'a': 'b'}},
+            '',
+            {'method': 'POST', 'url': httpbin.url + '/post',
+             'data': {'c': 'd'}},
+        )
+        r = http('--batch', self.batch_path)
+        assert r.count(HTTP_OK) == 2
+        assert '"a": "b"' in r
+        assert '"c": "d"' in r
+
+    def test_global_options_apply_to_each_request(self, httpbin):
+        self.write_batch({'url': httpbin.url + '/get'},
+                         {'url': httpbin.url + '/headers'})
+        r = http('--body', '--batch', self.batch_path)
+        assert HTTP_OK not in r
+        assert EXCHANGE_SEPARATOR.decode() in r
+        assert r.count('"url"') == 1
+
+    def test_line_options_override_global_options(self, httpbin):
+        self.write_batch({'url': httpbin.url + '/get', 'options': ['-h']})
+        r = http('--body', '--batch', self.batch_path)
+        assert HTTP_OK in r
+        assert '"url"' not in r
+
+    def test_invalid_line_does_not_stop_batch(self, httpbin):
+        self.write_batch('not json', {'url': httpbin.url + '/get'})
+        r = http('--batch', self.batch_path, error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert HTTP_OK in r
+        assert 'batch.jsonl:1: invalid batch line' in r.stderr
+
+    def test_exit_status_of_first_failure(self, httpbin):
+        self.write_batch({'url': httpbin.url + '/status/404'},
+                         {'url': httpbin.url + '/status/500'})
+        r = http('--check-status', '--batch', self.batch_path,
+                 error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR_HTTP_4XX
+
+    def test_cookies_not_shared_between_requests(self, httpbin):
+        self.write_batch(
+            {'url': httpbin.url + '/cookies/set?a=b', 'options': ['--follow']},
+            {'url': httpbin.url + '/cookies'},
+        )
+        r = http('--body', '--batch', self.batch_path)
+        assert r.count('"a": "b"') == 1
+
+    def test_sessions(self, httpbin):
+        self.write_batch(
+            {'url': httpbin.url + '/get', 'session': 'test',
+             'headers': {'Foo': 'Bar'}},
+            {'url': httpbin.url + '/headers', 'session': 'test'},
+        )
+        r = http('--body', '--batch', self.batch_path,
+                 env=TestEnvironment(config_dir=self.config_dir))
+        assert r.count('"Foo": "Bar"') == 2
+
+    def test_env_not_modified_by_requests(self, httpbin):
+        output_path = os.path.join(self.config_dir, 'output')
+        self.write_batch(
+            {'url': httpbin.url + '/get',
+             'options': ['--output', output_path]},
+            {'url': httpbin.url + '/headers'},
+        )
+        env = TestEnvironment()
+        stdout = env.stdout
+        r = http('--body', '--batch', self.batch_path, env=env)
+        assert env.stdout is stdout
+        assert '"headers"' in r
+        assert '"url"' not in r
+
+    def test_batch_from_stdin(self, httpbin):
+        self.write_batch({'url': httpbin.url + '/get'})
+        with open(self.batch_path, 'rb') as stdin:
+            env = TestEnvironment(stdin=stdin, stdin_isatty=False)
+            r = http('--batch', '-', env=env)
+        assert HTTP_OK in r
+
+    def test_debug_reports_estimated_speed_up(self, httpbin):
+        self.write_batch({'url': httpbin.url + '/get'})
+        r = http('--debug', '--batch', self.batch_path)
+        assert '>>> Batch: 1 requests' in r.stderr
+        assert '>>> Estimate (not measured)' in r.stderr
+        assert 'estimated speed-up' in r.stderr
+
+
+class TestParallelBatch(BatchTestBase):
+
+    def write_delays(self, server, *delays):
+        self.write_batch(*[{'url': server.url + '/' + delay}
+                           for delay in delays])
+
+    def test_output_in_order(self, slow_server):
+        self.write_delays(slow_server, '0.3', '0.1')
+        r = http('--body', '--parallel', '2', '--batch', self.batch_path)
+        assert r.index('/0.3') < r.index('/0.1')
+        assert slow_server.max_active == 2
+
+    def test_unordered_output(self, slow_server):
+        self.write_delays(slow_server, '0.3', '0.1')
+        r = http('--body', '--parallel=2', '--unordered',
+                 '--batch', self.batch_path)
+        assert r.index('/0.1') < r.index('/0.3')
+        assert EXCHANGE_SEPARATOR.decode() in r
+
+    def test_parallel_per_host(self, slow_server):
+        self.write_delays(slow_server, '0.1', '0.1', '0.1', '0.1')
+        r = http('--body', '--parallel', '4', '--parallel-per-host', '1',
+                 '--batch', self.batch_path)
+        assert r.count('/0.1') == 4
+        assert slow_server.max_active == 1
+
+    def test_exit_status_in_order(self, httpbin):
+        self.write_batch('not json',
+                         {'url': httpbin.url + '/status/500'},
+                         {'url': httpbin.url + '/status/404'})
+        r = http('--check-status', '--parallel', '2',
+                 '--batch', self.batch_path, error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert 'batch.jsonl:1: invalid batch line' in r.stderr
+
+    @pytest.mark.parametrize('options', [
+        ['--parallel', '0'],
+        ['--parallel', 'x'],
+        ['--parallel-per-host=0'],
+    ])
+    def test_invalid_options(self, options):
+        self.write_batch({'url': 'example.org'})
+        r = http(*options + ['--batch', self.batch_path], error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert '--parallel' in r.stderr
+
+    def test_parallel_requires_batch(self, httpbin):
+        r = http('--parallel', '2', httpbin.url + '/get',
+                 error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert 'only work with --batch' in r.stderr
+
+
+class PipelineServer(object):
+    """
+    A keep-alive HTTP/1.1 server that waits for `depth` requests (or for
+    a second without more) before responding to any of them, so that
+    requests that aren't pipelined are answered late. `respond(n, path)`
+    returns the response to the n-th request of a connection as `bytes`,
+    or `None` to close the connection instead.
+
+    """
+
+    def __init__(self, depth, respond=None):
+        self.depth = depth
+        self.respond = respond or self.ok
+        self.batches = []
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(8)
+        self.url = 'http://127.0.0.1:%d' % self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    @staticmethod
+    def ok(n, path, close=False):
+        headers = 'Content-Length: %d\r\n' % len(path)
+        if close:
+            headers += 'Connection: close\r\n'
+        return ('HTTP/1.1 200 OK\r\n%s\r\n%s' % (headers, path)).encode()
+
+    def serve(self):
+        while True:
+            try:
+                client, address = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle, args=(client,),
+                             daemon=True).start()
+
+    def handle(self, client):
+        data = b''
+        n = 0
+        with client:
+            client.settimeout(1)
+            while True:
+                while data.count(b'\r\n\r\n') < self.depth:
+                    try:
+                        chunk = client.recv(65536)
+                    except socket.timeout:
+                        break
+                    if not chunk:
+                        break
+                    data += chunk
+                heads = data.split(b'\r\n\r\n')
+                data = heads.pop()
+                if not heads:
+                    return
+                self.batches.append([head.split()[1].decode()
+                                     for head in heads])
+                for head in heads:
+                    response = self.respond(n, head.split()[1].decode())
+                    n += 1
+                    if response is None:
+                        return
+                    client.sendall(response)
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def pipeline_server():
+    servers = []
+
+    def start(depth, respond=None):
+        server = PipelineServer(depth, respond)
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.close()
+
+
+class TestPipelinedBatch(BatchTestBase):
+
+    def write_paths(self, server, *paths, **line):
+        self.write_batch(*[dict(line, url=server.url + path)
+                           for path in paths])
+
+    def test_pipelined(self, pipeline_server):
+        server = pipeline_server(depth=2)
+        self.write_paths(server, '/1', '/2', '/3', '/4')
+        start = time.monotonic()
+        r = http('--body', '--pipeline=2', '--batch', self.batch_path)
+        # Requests that aren't pipelined would wait a second each.
+        assert time.monotonic() - start < 1
+        assert r.split() == ['/1', '/2', '/3', '/4']
+        assert server.batches == [['/1', '/2'], ['/3', '/4']]
+
+    def test_each_request_parsed_once(self, pipeline_server):
+        server = pipeline_server(depth=2)
+        self.write_batch({'url': server.url + '/1'},
+                         {'url': server.url + '/2'},
+                         {'url': server.url + '/3', 'method': 'POST'},
+                         {'url': server.url + '/4',
+                          'options': ['--pretty=invalid']})
+        with mock.patch('httpie.core.parse_args',
+                        side_effect=httpie.core.parse_args) as parse_args:
+            r = http('--body', '--pipeline=3', '--batch', self.batch_path,
+                     error_exit_ok=True)
+        assert r.split()[:3] == ['/1', '/2', '/3']
+        assert parse_args.call_count == 4
+        assert r.stderr.count('invalid choice') == 1
+
+    def test_not_pipelined_by_default(self, pipeline_server):
+        server = pipeline_server(depth=1)
+        self.write_paths(server, '/1', '/2')
+        r = http('--body', '--batch', self.batch_path)
+        assert r.split() == ['/1', '/2']
+        assert server.batches == [['/1'], ['/2']]
+
+    def test_only_idempotent_requests(self, pipeline_server):
+        server = pipeline_server(depth=2)
+        self.write_batch({'url': server.url + '/1'},
+                         {'url': server.url + '/2'},
+                         {'url': server.url + '/3', 'method': 'POST'},
+                         {'url': server.url + '/4', 'method': 'HEAD'},
+                         {'url': server.url + '/5'})
+        r = http('--body', '--pipeline=5', '--batch', self.batch_path)
+        assert r.split() == ['/1', '/2', '/3', '/5']
+        assert ['/1', '/2'] in server.batches
+        assert ['/4', '/5'] in server.batches
+
+    def test_server_closes_connection(self, pipeline_server):
+        # The server answers two requests per connection.
+        server = pipeline_server(
+            depth=4,
+            respond=lambda n, path: PipelineServer.ok(n, path, close=n == 1))
+        self.write_paths(server, '/1', '/2', '/3', '/4')
+        r = http('--body', '--pipeline=4', '--batch', self.batch_path)
+        assert r.split() == ['/1', '/2', '/3', '/4']
+
+    def test_server_misbehaves(self, pipeline_server):
+        server = pipeline_server(
+            depth=2,
+            respond=lambda n, path: (b'garbage\r\n\r\n'
+                                     if len(server.batches) == 1
+                                     else PipelineServer.ok(n, path)))
+        self.write_paths(server, '/1', '/2', '/3')
+        r = http('--body', '--pipeline=2', '--batch', self.batch_path)
+        assert r.split() == ['/1', '/2', '/3']
+
+    @pytest.mark.parametrize('options', [
+        ['--pipeline', '0'],
+        ['--pipeline', '2', '--parallel', '2'],
+    ])
+    def test_invalid_options(self, options):
+        self.write_batch({'url': 'example.org'})
+        r = http(*options + ['--batch', self.batch_path], error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert '--pipeline' in r.stderr
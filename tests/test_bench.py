@@ -0,0 +1,177 @@
+"""Benchmark mode tests (--bench)."""
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from httpie import ExitStatus
+from httpie.bench import LatencyHistogram
+from httpie.core import get_mode_parser
+from utils import TestEnvironment, http
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        status = int(self.path.strip('/') or 200)
+        self.send_response(status)
+        self.send_header('Content-Length', '5')
+        self.end_headers()
+        self.wfile.write(b'hello')
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingServer(ThreadingHTTPServer):
+
+    def get_request(self):
+        request = super().get_request()
+        with self.lock:
+            self.connections += 1
+        return request
+
+
+@pytest.fixture
+def server():
+    server = CountingServer(('127.0.0.1', 0), Handler)
+    server.lock = threading.Lock()
+    server.requests = server.connections = 0
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestLatencyHistogram:
+
+    def test_exact_below_precision(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 101):
+            histogram.record(value / 1e6)
+        assert histogram.get_percentile(50) == 50
+        assert histogram.get_percentile(99) == 99
+        assert histogram.get_percentile(100) == 100
+        assert (histogram.min, histogram.max) == (1, 100)
+        assert histogram.mean == 50.5
+
+    def test_relative_precision(self):
+        histogram = LatencyHistogram()
+        histogram.record(12.345678)
+        histogram.record(98.765432)
+        value = histogram.get_percentile(50)
+        assert abs(value - 12345678) / 12345678 < 0.001
+
+    def test_add(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(0.001)
+        b.record(0.002)
+        b.record(0.005)
+        a.add(b)
+        assert a.count == 3
+        assert (a.min, a.max) == (1000, 5000)
+        assert a.get_percentile(50) == 2000
+
+    def test_empty(self):
+        assert LatencyHistogram().get_percentile(99) is None
+
+
+class TestBenchOptions:
+
+    def parse(self, *args):
+        return get_mode_parser().parse_args(args=list(args),
+                                            env=TestEnvironment())
+
+    def test_options(self):
+        mode_args, args = self.parse('--bench', '-n', '10',
+                                     '--concurrency=4', 'example.org')
+        assert (mode_args.requests, mode_args.concurrency,
+                mode_args.bench_format) == (10, 4, 'text')
+        assert args == ['example.org']
+
+    def test_c_is_short_for_continue(self):
+        mode_args, args = self.parse('--bench', '-c', 'example.org')
+        assert mode_args.concurrency == 1
+        assert args == ['-c', 'example.org']
+
+    @pytest.mark.parametrize('args', [
+        ['-n', '0'], ['--concurrency', 'x'], ['--bench-format=xml'],
+    ])
+    def test_invalid(self, args):
+        with pytest.raises(SystemExit):
+            self.parse('--bench', *args)
+
+
+class TestBench:
+
+    def test_json_report(self, server):
+        r = http('--bench', '-n', '20', '--concurrency', '4', '--bench-format=json',
+                 server.url + '/')
+        report = json.loads(r)
+        assert report['requests'] == 20
+        assert report['concurrency'] == 4
+        assert report['statuses'] == {'200': 20}
+        assert report['errors'] == {}
+        assert report['bytes'] == 100
+        latency = report['latency_ms']
+        assert latency['min'] <= latency['p50'] <= latency['p99.9'] <= (
+            latency['max'])
+        assert server.requests == 20
+        # The connections are kept alive and reused by the workers.
+        assert server.connections <= 4
+
+    def test_concurrency_capped_by_requests(self, server):
+        r = http('--bench', '--requests=2', '--concurrency=8',
+                 '--bench-format=json', server.url + '/')
+        assert json.loads(r)['concurrency'] == 2
+
+    def test_text_report(self, server):
+        r = http('--bench', '--requests=3', server.url + '/404')
+        assert 'Requests:      3 (concurrency 1)' in r
+        assert 'Statuses:      404: 3' in r
+        assert 'p99.9' in r
+        assert r.exit_status == ExitStatus.OK
+
+    def test_errors(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        url = 'http://127.0.0.1:%d/' % sock.getsockname()[1]
+        try:
+            r = http('--bench', '-n', '2', '--bench-format=json', url,
+                     error_exit_ok=True)
+        finally:
+            sock.close()
+        assert json.loads(r)['errors'] == {'ConnectionError': 2}
+        assert r.exit_status == ExitStatus.ERROR
+
+    def test_invalid_option(self):
+        r = http('--bench', '-n', '0', 'example.org', error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert 'at least 1' in r.stderr
+
+    @pytest.mark.parametrize('args', [
+        ['-n', '2'], ['--concurrency=2'], ['--bench-format=json'],
+    ])
+    def test_requires_bench(self, args):
+        r = http(*args + ['example.org'], error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert 'only work with --bench' in r.stderr
+
+    def test_asyncio_engine(self, server):
+        r = http('--bench', '-n', '10', '--concurrency=2', '--bench-format=json',
+                 '--engine=asyncio', server.url + '/')
+        assert json.loads(r)['statuses'] == {'200': 10}
+        assert server.connections <= 2
@@ -0,0 +1,74 @@
+"""Config file loading tests."""
+import json
+import os
+import shutil
+
+import mock
+
+from httpie import config
+from httpie.config import Config
+from utils import TestEnvironment, mk_config_dir
+
+
+class TestConfig:
+
+    def setup_method(self, method):
+        self.config_dir = mk_config_dir()
+        self.config_path = os.path.join(self.config_dir, 'config.json')
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def write_config(self, data):
+        with open(self.config_path, 'w') as f:
+            json.dump(data, f)
+
+    def test_missing_config_not_created(self):
+        config_dir = os.path.join(self.config_dir, 'new')
+        env = TestEnvironment(config_dir=config_dir)
+        assert env.config['default_options'] == []
+        assert not os.path.exists(config_dir)
+
+    def test_loading_does_not_write(self):
+        self.write_config({'default_options': ['--form']})
+        with mock.patch('os.makedirs') as makedirs, \
+                mock.patch.object(Config, 'save') as save:
+            env = TestEnvironment(config_dir=self.config_dir)
+            assert env.config['default_options'] == ['--form']
+        assert not makedirs.called
+        assert not save.called
+
+    def test_unchanged_config_not_parsed_again(self):
+        self.write_config({'default_options': ['--form']})
+        Config(directory=self.config_dir).load()
+        with mock.patch.object(config.json, 'load') as load:
+            loaded = Config(directory=self.config_dir)
+            loaded.load()
+        assert not load.called
+        assert loaded['default_options'] == ['--form']
+
+    def test_changed_config_parsed_again(self):
+        self.write_config({'default_options': ['--form']})
+        Config(directory=self.config_dir).load()
+        self.write_config({'default_options': ['--json', '--verbose']})
+        loaded = Config(directory=self.config_dir)
+        loaded.load()
+        assert loaded['default_options'] == ['--json', '--verbose']
+
+    def test_cached_data_not_shared(self):
+        self.write_config({'default_options': ['--form']})
+        first = Config(directory=self.config_dir)
+        first.load()
+        first['default_options'].append('--verbose')
+        second = Config(directory=self.config_dir)
+        second.load()
+        assert second['default_options'] == ['--form']
+
+    def test_save_creates_directory(self):
+        config_dir = os.path.join(self.config_dir, 'new')
+        new_config = Config(directory=config_dir)
+        new_config['default_options'] = ['--form']
+        new_config.save()
+        loaded = Config(directory=config_dir)
+        loaded.load()
+        assert loaded['default_options'] == ['--form']
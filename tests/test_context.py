@@ -0,0 +1,128 @@
+"""Execution environment tests."""
+import os
+import shutil
+import struct
+import tempfile
+
+import mock
+import pytest
+
+from httpie import context
+from httpie.context import Environment, DEFAULT_COLORS, TRUECOLOR
+from httpie.output.formatters.colors import get_formatter_class
+from utils import mk_config_dir, http
+
+
+class TestColorDepth:
+
+    def setup_method(self, method):
+        self.config_dir = mk_config_dir()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.config_dir)
+
+    def get_colors(self, stdout_isatty=True, **environ):
+        env = Environment(stdout_isatty=stdout_isatty,
+                          config_dir=self.config_dir)
+        with mock.patch.dict(os.environ, environ):
+            return env.colors
+
+    @mock.patch.object(context, 'probe_color_depth', return_value=8)
+    def test_probed_when_stdout_redirected(self, probe):
+        # E.g., `http --pretty=all URL | less -R`.
+        assert self.get_colors(stdout_isatty=False, TERM='xterm',
+                               COLORTERM='') == 8
+
+    @pytest.mark.parametrize('pretty, probed', [
+        ('none', False),
+        ('format', False),
+        ('all', True),
+    ])
+    @mock.patch.object(context, 'probe_color_depth', return_value=8)
+    def test_probed_only_with_colors(self, probe, httpbin, pretty, probed):
+        # Unlike with `TestEnvironment`, the color depth is detected.
+        env = Environment(stdin_isatty=True,
+                          stdout=tempfile.TemporaryFile('w+b'),
+                          stdout_isatty=False,
+                          stderr=tempfile.TemporaryFile('w+t'),
+                          config_dir=self.config_dir)
+        with mock.patch.dict(os.environ, TERM='xterm', COLORTERM=''):
+            http('--pretty', pretty, httpbin.url + '/get', env=env)
+        assert probe.called == probed
+
+    @mock.patch.object(context, 'probe_color_depth')
+    def test_truecolor_via_colorterm(self, probe):
+        assert self.get_colors(TERM='xterm', COLORTERM='truecolor') \
+            == TRUECOLOR
+        assert not probe.called
+
+    @mock.patch.object(context, 'probe_color_depth', return_value=8)
+    def test_probed_once_per_term(self, probe):
+        assert self.get_colors(TERM='xterm', COLORTERM='') == 8
+        assert self.get_colors(TERM='xterm', COLORTERM='') == 8
+        assert probe.call_count == 1
+
+        probe.return_value = 256
+        assert self.get_colors(TERM='xterm-256color', COLORTERM='') == 256
+        assert probe.call_count == 2
+
+    @mock.patch.object(context, 'probe_color_depth', return_value=None)
+    def test_default_when_probing_fails(self, probe):
+        assert self.get_colors(TERM='unknown', COLORTERM='') \
+            == DEFAULT_COLORS
+
+    def test_explicit_colors(self):
+        env = Environment(colors=8, config_dir=self.config_dir)
+        assert env.colors == 8
+
+
+class TestEnvironmentCopy:
+
+    def test_copy(self):
+        env = Environment(stdout_isatty=False, colors=8)
+        env_copy = env.copy(stdout_isatty=True)
+        assert env_copy.stdout_isatty
+        assert env_copy.colors == 8
+        env_copy.colors = 256
+        assert not env.stdout_isatty
+        assert env.colors == 8
+
+
+class TestFormatterClass:
+
+    def test_formatter_class_by_colors(self):
+        assert get_formatter_class(8).__name__ == 'TerminalFormatter'
+        assert get_formatter_class(256).__name__ == 'Terminal256Formatter'
+        assert get_formatter_class(TRUECOLOR).__name__ \
+            == 'TerminalTrueColorFormatter'
+
+
+class TestTerminfo:
+
+    def build_terminfo(self, colors, magic=context.TERMINFO_MAGIC):
+        names = b'fake|Fake terminal\0'
+        booleans = b'\1\0\1'
+        number_format = '<h' if magic == context.TERMINFO_MAGIC else '<i'
+        numbers = [80, -1, 24] + [-1] * 10 + [colors]
+        header = struct.pack('<6h', magic, len(names), len(booleans),
+                             len(numbers), 0, 0)
+        padding = b'\0' if (len(names) + len(booleans)) % 2 else b''
+        return (header + names + booleans + padding
+                + b''.join(struct.pack(number_format, n) for n in numbers))
+
+    def test_parse_colors(self):
+        assert context.parse_terminfo_colors(self.build_terminfo(256)) == 256
+
+    def test_parse_colors_32bit(self):
+        data = self.build_terminfo(
+            TRUECOLOR, magic=context.TERMINFO_MAGIC_32BIT)
+        assert context.parse_terminfo_colors(data) == TRUECOLOR
+
+    def test_parse_invalid(self):
+        assert context.parse_terminfo_colors(b'garbage') is None
+
+    def test_read_from_terminfo_dir(self, tmpdir):
+        tmpdir.mkdir('f').join('fake').write_binary(self.build_terminfo(88))
+        with mock.patch.dict(os.environ, {'TERMINFO': str(tmpdir)}):
+            assert context.read_terminfo_colors('fake') == 88
+            assert context.read_terminfo_colors('missing') is None
@@ -0,0 +1,157 @@
+"""Daemon mode tests."""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from httpie import ExitStatus, __version__, daemon
+from httpie.client import get_adapter, get_requests_session
+from utils import mk_config_dir, TESTS_ROOT
+
+
+pytestmark = pytest.mark.skipif(
+    not daemon.is_enabled({daemon.DAEMON_ENV_VAR: '1'}),
+    reason='daemon mode is not supported on this platform'
+)
+
+ROOT = os.path.dirname(TESTS_ROOT)
+
+
+def http_subprocess(config_dir, *args, **kwargs):
+    env = dict(os.environ)
+    env.update(kwargs.pop('env', {}))
+    env['HTTPIE_CONFIG_DIR'] = config_dir
+    env['PYTHONPATH'] = ROOT
+    if 'input' not in kwargs:
+        kwargs['stdin'] = subprocess.DEVNULL
+    return subprocess.run(
+        [sys.executable, '-m', 'httpie'] + list(args), env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        timeout=30, **kwargs
+    )
+
+
+class TestDaemon:
+
+    def setup_method(self, method):
+        self.config_dir = mk_config_dir()
+        self.socket_path = daemon.get_socket_path(self.config_dir)
+
+    def teardown_method(self, method):
+        daemon.stop_daemon(self.config_dir)
+        shutil.rmtree(self.config_dir)
+
+    def http(self, *args, **kwargs):
+        kwargs['env'] = {daemon.DAEMON_ENV_VAR: '1'}
+        return http_subprocess(self.config_dir, *args, **kwargs)
+
+    def test_daemon_started_and_reused(self, httpbin):
+        url = httpbin.url + '/get'
+        r = self.http('--print=b', 'GET', url, 'a==b')
+        assert r.returncode == 0
+        assert b'"a": "b"' in r.stdout
+        assert os.path.exists(self.socket_path)
+
+        r = self.http('--print=b', 'GET', url, 'c==d')
+        assert r.returncode == 0
+        assert b'"c": "d"' in r.stdout
+
+    def test_output_same_as_without_daemon(self, httpbin):
+        args = ['--print=Bb', '--pretty=all', 'POST', httpbin.url + '/post']
+        expected = http_subprocess(self.config_dir, *args, input=b'abc')
+        r = self.http(*args, input=b'abc')
+        assert r.stdout == expected.stdout
+        assert r.returncode == expected.returncode == 0
+
+    def test_exit_status_and_stderr(self, httpbin):
+        r = self.http('--check-status', httpbin.url + '/status/404')
+        assert r.returncode == 4
+        assert b'HTTP 404' in r.stderr
+
+        r = self.http('--bogus')
+        assert r.returncode == 1
+        assert b'error:' in r.stderr
+
+    def test_incompatible_client_falls_back(self, httpbin):
+        self.http('--version')
+        sock = daemon.connect(self.socket_path)
+        try:
+            daemon.send_message(sock, {'protocol': -1})
+            assert daemon.receive_message(sock) == (None, [])
+        finally:
+            sock.close()
+        # The daemon makes way for a new one.
+        time.sleep(0.2)
+        assert not os.path.exists(self.socket_path)
+
+    def test_stop(self):
+        self.http('--version')
+        assert daemon.stop_daemon(self.config_dir)
+        assert not daemon.stop_daemon(self.config_dir)
+
+
+class TestDaemonHandle:
+    """What the client receives when running the request fails."""
+
+    def handle(self, run_request):
+        config_dir = mk_config_dir()
+        client, conn = socket.socketpair()
+        try:
+            server = daemon.Daemon(config_dir)
+            server.run_request = run_request
+            daemon.send_message(client, {
+                'protocol': daemon.PROTOCOL_VERSION,
+                'httpie': __version__,
+            })
+            assert server.handle(conn)
+            # Closing isn't enough: the interrupt watcher is still reading.
+            conn.shutdown(socket.SHUT_WR)
+            messages = []
+            while True:
+                message, fds = daemon.receive_message(client)
+                if message is None:
+                    return messages
+                messages.append(message)
+        finally:
+            client.close()
+            conn.close()
+            shutil.rmtree(config_dir)
+
+    def test_failure_before_the_request_is_run(self):
+        def run_request(message, fds, accept):
+            raise OSError('no such directory')
+
+        # The client runs the request in-process.
+        assert self.handle(run_request) == []
+        assert daemon.get_lost_exit_status(accepted=False) is None
+
+    def test_failure_while_the_request_is_run(self):
+        def run_request(message, fds, accept):
+            accept()
+            raise OSError('broken output')
+
+        # The request may have been sent, so it isn't run again.
+        assert self.handle(run_request) == [
+            {'accepted': True}, {'exit_status': ExitStatus.ERROR}]
+
+    def test_daemon_lost_after_accepting(self, capsys):
+        assert daemon.get_lost_exit_status(accepted=True) == ExitStatus.ERROR
+        assert 'daemon stopped' in capsys.readouterr().err
+
+
+class TestSharedAdapters:
+
+    def test_adapter_shared_between_sessions(self):
+        adapter = get_requests_session().get_adapter('https://example.org')
+        assert adapter is get_adapter()
+        assert adapter is get_requests_session().get_adapter(
+            'http://example.org')
+
+    def test_adapter_per_tls_options(self):
+        assert get_adapter(verify=False) is not get_adapter(verify=True)
+        assert (get_adapter(cert=['a.pem', 'a.key'])
+                is get_adapter(cert=('a.pem', 'a.key')))
@@ -0,0 +1,176 @@
+"""Fast-path argument parser tests."""
+# noinspection PyCompatibility
+from argparse import SUPPRESS
+
+import mock
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from httpie import fastparser
+from httpie.cli import parser as full_parser
+from httpie.fastparser import FallbackToFullParser, FastPathParser
+from utils import TestEnvironment
+
+
+def parse(parser, args):
+    return vars(parser.parse_args(args=args, env=TestEnvironment()))
+
+
+def fast_parse(args):
+    return parse(FastPathParser(), args)
+
+
+class TestDefinitions:
+
+    def test_defaults_same_as_full_parser(self):
+        defaults = {action.dest: action.default
+                    for action in full_parser._actions
+                    if action.default is not SUPPRESS}
+        assert fastparser.get_defaults() == defaults
+
+    def test_options_same_as_full_parser(self):
+        actions = {option_string: action
+                   for action in full_parser._actions
+                   for option_string in action.option_strings}
+        for option_strings, dest, action_type, arg in fastparser.OPTIONS:
+            action = actions[option_strings[0]]
+            assert action.option_strings == option_strings
+            assert action.dest == dest
+            if action_type == fastparser.STORE_CONST:
+                assert action.const == arg
+
+
+class TestFastPathParser:
+
+    @pytest.mark.parametrize('args', [
+        ['example.org'],
+        ['GET', 'example.org', 'a==b', 'X-Foo:bar'],
+        ['-v', '--pretty=none', 'POST', ':3000/foo', 'a=b', 'c:=1'],
+        ['example.org', 'a=b', '--form', '-s', 'fruity', '--timeout', '2'],
+        ['--auth', 'user:pass', '--auth-type=digest', 'example.org'],
+        ['--pool-maxsize=20', '--pool-block', '--tcp-nodelay=no',
+         '--tcp-keepalive', '30:5', 'example.org'],
+        ['--max-retries=3', '--retry-on', '503,connect',
+         '--retry-backoff=0.1', '--retry-budget', '10', 'example.org'],
+    ])
+    def test_same_result_as_full_parser(self, args):
+        assert fast_parse(args) == parse(full_parser, args)
+
+    @pytest.mark.parametrize('args', [
+        ['--help'],
+        ['--version'],
+        ['-vb', 'example.org'],
+        ['--verb', 'example.org'],
+        ['--no-verbose', 'example.org'],
+        ['--download', 'example.org'],
+        ['GET', '-v', 'example.org'],
+        ['--', 'example.org'],
+        ['--pretty', 'bogus', 'example.org'],
+        ['--timeout', 'x', 'example.org'],
+        ['--style', 'no-such-style', 'example.org'],
+        ['--session', 'a', '--session-read-only', 'b', 'example.org'],
+        ['--print'],
+        [],
+    ])
+    def test_falls_back(self, args):
+        with pytest.raises(FallbackToFullParser):
+            fast_parse(args)
+
+    def test_invalid_item_reported_like_full_parser(self):
+        # Found once processing has started (e.g., ``--output`` is open).
+        with pytest.raises(SystemExit) as e:
+            fast_parse(['example.org', 'not-an-item'])
+        assert e.value.code == 2
+
+    def test_no_fall_back_once_processing(self, tmpdir):
+        # The file has been opened by the time the error is found.
+        path = tmpdir.join('body.txt')
+        path.write('abc')
+        with mock.patch.object(full_parser, 'parse_args') as full_parse:
+            with pytest.raises(SystemExit) as e:
+                fast_parse(['example.org', '@' + str(path), 'a=b'])
+        assert e.value.code == 2
+        assert not full_parse.called
+
+
+words = st.text(alphabet='abcXYZ09-_.', min_size=1, max_size=6)
+values = st.one_of(words, st.sampled_from(['', 'a b', '"q"', '1', '[1]']))
+
+items = st.builds(
+    lambda key, sep, value: key + sep + value,
+    words, st.sampled_from([':', '==', '=', ':=']), values,
+)
+urls = st.sampled_from([
+    'example.org', ':3000', ':/foo', 'http://a.b/c?d=e', 'https://x:1',
+    'localhost', '-',
+])
+methods = st.sampled_from(['GET', 'post', 'PUT', 'HEAD'])
+
+flags = st.sampled_from([
+    option_string
+    for option_strings, dest, action, arg in fastparser.OPTIONS
+    if action in (fastparser.STORE_TRUE, fastparser.STORE_CONST)
+    for option_string in option_strings
+])
+options_with_values = st.one_of(
+    st.tuples(st.sampled_from(['--pretty']),
+              st.sampled_from(['all', 'none', 'colors', 'format', 'x'])),
+    st.tuples(st.sampled_from(['--style', '-s']),
+              st.sampled_from(['monokai', 'fruity', 'solarized', 'nope'])),
+    st.tuples(st.sampled_from(['--print', '-p']),
+              st.sampled_from(['H', 'hb', 'HBhb', 'x'])),
+    st.tuples(st.sampled_from(['--auth', '-a']),
+              st.sampled_from(['u:p', 'user:', ':p'])),
+    st.tuples(st.sampled_from(['--auth-type']),
+              st.sampled_from(['basic', 'digest', 'ntlm'])),
+    st.tuples(st.sampled_from(['--session', '--session-read-only']),
+              st.sampled_from(['s1', 'bad name', '/tmp/s.json'])),
+    st.tuples(st.sampled_from(['--proxy']),
+              st.sampled_from(['http:http://p:3128', 'invalid'])),
+    st.tuples(st.sampled_from(['--timeout']),
+              st.sampled_from(['1', '2.5', 'x', '-1'])),
+    st.tuples(st.sampled_from(['--verify']),
+              st.sampled_from(['yes', 'no', '/path/ca.pem'])),
+)
+options = st.one_of(
+    flags.map(lambda flag: [flag]),
+    options_with_values.map(list),
+    options_with_values.map(lambda option: ['='.join(option)]),
+    # Unsupported by the fast path.
+    st.sampled_from([['--no-json'], ['-jv'], ['--verb'], ['--follow=1'],
+                     ['--'], ['-p=H']]),
+)
+
+
+@st.composite
+def invocations(draw):
+    args = sum(draw(st.lists(options, max_size=4)), [])
+    if draw(st.booleans()):
+        args.append(draw(methods))
+    args.append(draw(urls))
+    args += draw(st.lists(items, max_size=3))
+    args += sum(draw(st.lists(options, max_size=2)), [])
+    return args
+
+
+class TestFastPathParserProperties:
+
+    @settings(max_examples=300, deadline=None)
+    @given(invocations())
+    def test_agrees_with_full_parser(self, args):
+        def outcome(parse):
+            # With --traceback, some errors propagate as they are.
+            try:
+                return parse()
+            except FallbackToFullParser:
+                raise
+            except SystemExit as e:
+                return SystemExit, e.code
+            except Exception as e:
+                return type(e), str(e)
+
+        try:
+            result = outcome(lambda: fast_parse(args))
+        except FallbackToFullParser:
+            return
+        assert result == outcome(lambda: parse(full_parser, args))
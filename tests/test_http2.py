@@ -0,0 +1,252 @@
+"""HTTP/2 engine tests (--engine=h2)."""
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+h2 = pytest.importorskip('h2')
+import h2.config
+import h2.connection
+import h2.events
+
+from httpie.client import get_adapter, ENGINE_HTTP2
+from httpie.http2 import get_request_headers, get_response_head
+from utils import http, HTTP_OK
+
+
+class H2CServer(object):
+    """A prior-knowledge HTTP/2 server echoing each request as JSON
+    (the body only up to a KiB, to stay within the flow control window).
+
+    ``/slow`` responses are delayed by a second, in a thread of their own,
+    so that the other streams of the connection are served meanwhile.
+
+    """
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(16)
+        self.url = 'http://127.0.0.1:%d' % self.sock.getsockname()[1]
+        self.connections = 0
+        self.streams = 0
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                client, address = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(client,),
+                             daemon=True).start()
+
+    def handle(self, client):
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(
+            client_side=False, header_encoding='utf8'))
+        lock = threading.Lock()
+        conn.initiate_connection()
+        client.sendall(conn.data_to_send())
+        requests_ = {}
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            with lock:
+                events = conn.receive_data(data)
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        requests_[event.stream_id] = [dict(event.headers), b'']
+                    elif isinstance(event, h2.events.DataReceived):
+                        requests_[event.stream_id][1] += event.data
+                        conn.acknowledge_received_data(
+                            event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        self.streams += 1
+                        headers, body = requests_.pop(event.stream_id)
+                        threading.Thread(target=self.respond, args=(
+                            client, conn, lock, event.stream_id, headers,
+                            body), daemon=True).start()
+                client.sendall(conn.data_to_send())
+        client.close()
+
+    def respond(self, client, conn, lock, stream_id, headers, body):
+        if headers[':path'] == '/slow':
+            time.sleep(1)
+        response = json.dumps({
+            'method': headers[':method'],
+            'path': headers[':path'],
+            'authority': headers[':authority'],
+            'headers': {k: v for k, v in headers.items()
+                        if not k.startswith(':')},
+            'body': body[:1024].decode(),
+            'body_length': len(body),
+        }).encode()
+        with lock:
+            head = headers[':method'] == 'HEAD'
+            conn.send_headers(stream_id, [
+                (':status', '200'),
+                ('content-type', 'application/json'),
+                ('content-length', str(len(response))),
+            ], end_stream=head)
+            if not head:
+                conn.send_data(stream_id, response, end_stream=True)
+            client.sendall(conn.data_to_send())
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def server():
+    server = H2CServer()
+    yield server
+    server.close()
+
+
+class HTTP1Handler(BaseHTTPRequestHandler):
+    """Respond to ``GET`` with the path, and count the requests."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http1_server():
+    """A plain HTTP server that only speaks HTTP/1.1, and responds to the
+    HTTP/2 connection preface with ``505 HTTP Version Not Supported``."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), HTTP1Handler)
+    server.daemon_threads = True
+    server.requests = []
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def h2_http(*args, **kwargs):
+    return http('--engine=h2', *args, **kwargs)
+
+
+class TestHeaders:
+
+    def test_request_headers(self):
+        request = requests.Request(
+            'GET', 'http://example.org:8080/a?b=c',
+            headers={'Connection': 'keep-alive', 'X-Foo': 'bar',
+                     'TE': 'gzip'}).prepare()
+        url = requests.utils.urlparse(request.url)
+        assert get_request_headers(request, url) == [
+            (':method', 'GET'),
+            (':scheme', 'http'),
+            (':authority', 'example.org:8080'),
+            (':path', '/a?b=c'),
+            ('x-foo', 'bar'),
+        ]
+
+    def test_response_head(self):
+        head = get_response_head([(b':status', b'404'), (b'a', b'1'),
+                                  (b'a', b'2')])
+        assert head.version == 20
+        assert (head.status, head.reason) == (404, 'Not Found')
+        assert head.msg.get_all('a') == ['1', '2']
+
+
+class TestHTTP2Engine:
+
+    def test_get(self, server):
+        r = h2_http(server.url + '/get')
+        assert 'HTTP/2 200 OK' in r
+        # Lowercase header names, which `r.json` doesn't look for.
+        assert 'content-type: application/json' in r
+        r = h2_http('--body', server.url + '/get', 'X-Foo:bar')
+        assert r.json['path'] == '/get'
+        assert r.json['headers']['x-foo'] == 'bar'
+
+    def test_post(self, server):
+        r = h2_http('--body', '--form', 'POST', server.url + '/post', 'a=b')
+        assert r.json['body'] == 'a=b'
+
+    def test_streamed_request_body(self, server):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b'x' * 200000)
+        try:
+            r = h2_http('--body', 'POST', server.url + '/post',
+                        '@' + f.name)
+        finally:
+            os.unlink(f.name)
+        assert r.json['body_length'] == 200000
+
+    def test_connection_reused(self, server):
+        for _ in range(3):
+            h2_http(server.url + '/get')
+        assert server.connections == 1
+        assert server.streams == 3
+
+    def test_concurrent_requests_multiplexed(self, server, tmpdir):
+        batch_file = tmpdir.join('batch.jsonl')
+        batch_file.write(''.join(
+            json.dumps({'url': server.url + '/slow'}) + '\n'
+            for _ in range(5)))
+        start = time.time()
+        r = h2_http('--batch', str(batch_file), '--parallel', '5')
+        assert r.count('HTTP/2 200 OK') == 5
+        assert server.connections == 1
+        assert time.time() - start < 3
+
+    def test_debug_adapter(self, server, capsys):
+        h2_http('--debug', server.url + '/get')
+        # The debug output of the client goes to `sys.stderr`.
+        assert '>>> HTTP2Adapter(' in capsys.readouterr().err
+
+    def test_connection_error(self):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            h2_http('http://127.0.0.1:1/')
+
+    def test_socket_options(self, server):
+        r = h2_http('--tcp-nodelay=no', '--tcp-keepalive=30:5:3',
+                    '--socket-send-buffer=65536',
+                    '--socket-recv-buffer=65536', server.url + '/get')
+        assert 'HTTP/2 200 OK' in r
+
+    def test_http_falls_back_to_http1(self, http1_server):
+        for _ in range(2):
+            r = h2_http(http1_server.url + '/get')
+            assert HTTP_OK in r
+            assert 'HTTP/2' not in r
+        # The first request is sent only once the server has rejected the
+        # connection preface, and the second one with HTTP/1.1 right away.
+        assert http1_server.requests == ['/get', '/get']
+        adapter = get_adapter(engine=ENGINE_HTTP2)
+        assert (('http', '127.0.0.1', http1_server.server_port)
+                in adapter.pool.http1_keys)
+
+    def test_https_falls_back_to_http1(self, httpbin_secure):
+        # `pytest-httpbin` only speaks HTTP/1.1, which the server picks
+        # through ALPN.
+        r = h2_http('--verify=no', httpbin_secure.url + '/get')
+        assert HTTP_OK in r
+        assert 'HTTP/2' not in r
+        adapter = get_adapter(verify=False, engine=ENGINE_HTTP2)
+        assert adapter.pool.http1_keys
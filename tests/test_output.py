@@ -1,7 +1,14 @@
+import sys
+import subprocess
+
+import mock
 import pytest
+import pygments.styles
 
 from utils import TestEnvironment, http, HTTP_OK, COLOR, CRLF
 from httpie import ExitStatus
+from httpie.output.formatters import styles
+from httpie.output.formatters._styles import STYLE_NAMES
 from httpie.output.formatters.colors import get_lexer
 
 
@@ -46,6 +53,60 @@ class TestColors:
         assert get_lexer('xxx/yyy') is None
 
 
+class TestStyles:
+
+    def test_pygments_styles_available(self):
+        for name in list(pygments.styles.STYLE_MAP) + ['solarized']:
+            assert name in styles.AVAILABLE_STYLES
+
+    def test_unknown_style(self):
+        assert '__unknown__' not in styles.AVAILABLE_STYLES
+
+    def test_listed_style_does_not_need_pygments(self):
+        available = styles.AvailableStyles(['monokai'])
+        with mock.patch.object(styles, 'is_pygments_style') as lookup:
+            assert 'monokai' in available
+        assert not lookup.called
+
+    def test_unlisted_style_looked_up_in_pygments(self):
+        available = styles.AvailableStyles([])
+        assert 'monokai' in available
+        assert 'monokai' in list(available)
+
+    def test_styles_module_used_with_any_pygments_version(self):
+        available = styles.get_available_styles()
+        assert available.names == set(STYLE_NAMES) | {'solarized'}
+
+    def test_listed_style_missing_from_pygments_formatted(self, httpbin):
+        with mock.patch.object(styles.AVAILABLE_STYLES, 'names',
+                               styles.AVAILABLE_STYLES.names | {'__gone__'}):
+            r = http('--style=__gone__', f'{httpbin.url}/get',
+                     env=TestEnvironment(colors=256))
+        assert COLOR in r
+
+    def test_generate_styles_module(self, tmpdir):
+        path = str(tmpdir.join('_styles.py'))
+        styles.generate_styles_module(path)
+        namespace = {}
+        with open(path) as f:
+            exec(f.read(), namespace)
+        assert namespace['STYLE_NAMES'] == sorted(pygments.styles.STYLE_MAP)
+
+    def test_pygments_not_imported_without_colors(self):
+        code = (
+            'import sys\n'
+            'from httpie.core import main\n'
+            'from httpie.cli import parser\n'
+            'from httpie.context import Environment\n'
+            'env = Environment(stdout_isatty=False, stdin_isatty=True)\n'
+            'parser.parse_args(args=["--style=fruity", "example.org"],'
+            ' env=env)\n'
+            'print("pygments" in sys.modules)\n'
+        )
+        output = subprocess.check_output([sys.executable, '-c', code])
+        assert output.strip() == b'False'
+
+
 class TestPrettyOptions:
     """Test the --pretty flag handling."""
 
@@ -0,0 +1,251 @@
+"""Plugin discovery and registration tests."""
+import os
+import shutil
+
+import mock
+import pytest
+
+from httpie.client import get_requests_session, LazyTransportAdapter
+from httpie.plugins import (
+    index,
+    TransportPlugin, FormatterPlugin, ConverterPlugin
+)
+from httpie.plugins.builtin import BasicAuthPlugin, DigestAuthPlugin
+from httpie.plugins.index import EntryPoint, get_entry_points
+from httpie.plugins.manager import PluginManager, PluginDescriptor
+from httpie.output.formatters.headers import HeadersFormatter
+from httpie.output.formatters.json import JSONFormatter
+from httpie.output.formatters.colors import ColorFormatter
+from utils import mk_config_dir
+
+
+GROUPS = ['httpie.plugins.auth.v1']
+
+BASIC_AUTH_ATTRS = {
+    'name': 'Basic HTTP auth',
+    'description': None,
+    'auth_type': 'basic',
+    'group_name': None,
+    'priority': None,
+    'mime_prefixes': None,
+    'prefix': None,
+}
+
+
+def fake_entry_point(**kwargs):
+    entry_point = EntryPoint(
+        group='httpie.plugins.auth.v1',
+        name='fake',
+        value='httpie.plugins.builtin:BasicAuthPlugin',
+        dist='httpie-fake-auth',
+    )
+    entry_point.__dict__.update(kwargs)
+    return entry_point
+
+
+FAKE_ENTRY_POINT = fake_entry_point(attrs=BASIC_AUTH_ATTRS)
+
+
+class FakeTransportPlugin(TransportPlugin):
+    prefix = 'fake://'
+
+
+class TestPluginIndex:
+
+    def setup_method(self, method):
+        self.config_dir = mk_config_dir()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.config_dir)
+
+    def get_entry_points(self):
+        with mock.patch.object(index, 'iter_entry_points',
+                               return_value=iter([fake_entry_point()])) as scan:
+            entry_points = get_entry_points(GROUPS, self.config_dir)
+        return entry_points, scan.called
+
+    def test_index_is_created_and_reused(self):
+        entry_points, scanned = self.get_entry_points()
+        assert scanned
+        assert entry_points == [FAKE_ENTRY_POINT]
+        assert os.path.exists(
+            os.path.join(self.config_dir, index.INDEX_FILE_NAME))
+
+        entry_points, scanned = self.get_entry_points()
+        assert not scanned
+        assert entry_points == [FAKE_ENTRY_POINT]
+
+    def test_index_invalidated_when_installed_packages_change(self):
+        self.get_entry_points()
+        fingerprint = index.get_fingerprint(GROUPS)
+        fingerprint['paths'].append(['/new/site-packages', 1])
+        with mock.patch.object(index, 'get_fingerprint',
+                               return_value=fingerprint):
+            entry_points, scanned = self.get_entry_points()
+        assert scanned
+
+    def test_corrupted_index_is_rebuilt(self):
+        self.get_entry_points()
+        with open(os.path.join(self.config_dir,
+                               index.INDEX_FILE_NAME), 'w') as f:
+            f.write('{')
+        entry_points, scanned = self.get_entry_points()
+        assert scanned
+        assert entry_points == [FAKE_ENTRY_POINT]
+
+    def test_warm_run_does_not_scan(self):
+        self.get_entry_points()
+        with mock.patch.object(index, 'iter_entry_points',
+                               side_effect=AssertionError('scanned')):
+            get_entry_points(GROUPS, self.config_dir)
+
+
+class TestEntryPoint:
+
+    def test_load(self):
+        assert FAKE_ENTRY_POINT.load() is BasicAuthPlugin
+
+    def test_load_with_extras(self):
+        entry_point = fake_entry_point(
+            value='httpie.plugins.builtin:BasicAuthPlugin [extra]')
+        assert entry_point.load() is BasicAuthPlugin
+
+    def test_describe(self):
+        entry_point = fake_entry_point()
+        entry_point.describe()
+        assert entry_point.attrs == BASIC_AUTH_ATTRS
+
+    def test_load_missing_module(self):
+        entry_point = EntryPoint(group='g', name='n', dist='d',
+                                 value='__does_not_exist__:Plugin')
+        with pytest.raises(ImportError):
+            entry_point.load()
+
+    def test_installed_distributions_scanned(self):
+        # Smoke test the real scan; no plugins are installed in the test env.
+        assert list(index.iter_entry_points(['__no_such_group__'])) == []
+
+
+class TestLazyPlugins:
+
+    def test_descriptor_attributes_available_without_import(self):
+        descriptor = PluginDescriptor.from_entry_point(FAKE_ENTRY_POINT)
+        assert descriptor.kind == 'auth'
+        assert descriptor.auth_type == 'basic'
+        assert descriptor.package_name == 'httpie-fake-auth'
+        assert not descriptor.is_loaded
+
+    def test_installed_plugins_registered_but_not_imported(self):
+        manager = PluginManager()
+        with mock.patch('httpie.plugins.manager.get_entry_points',
+                        return_value=[FAKE_ENTRY_POINT]):
+            manager.load_installed_plugins()
+        descriptor, = manager.get_auth_plugins()
+        assert not descriptor.is_loaded
+
+        plugin = manager.get_auth_plugin('basic')
+        assert plugin is BasicAuthPlugin
+        assert descriptor.is_loaded
+
+    def test_installed_plugins_loaded_only_once(self):
+        manager = PluginManager()
+        with mock.patch('httpie.plugins.manager.get_entry_points',
+                        return_value=[FAKE_ENTRY_POINT]) as get:
+            manager.load_installed_plugins()
+            manager.load_installed_plugins()
+        assert get.call_count == 1
+        assert len(manager.get_auth_plugins()) == 1
+
+    def test_descriptor_delegates_to_plugin_class(self):
+        descriptor = PluginDescriptor.from_entry_point(FAKE_ENTRY_POINT)
+        assert descriptor.get_auth is BasicAuthPlugin.get_auth
+        assert isinstance(descriptor(), BasicAuthPlugin)
+
+    def test_transport_plugin_imported_on_first_request(self):
+        descriptor = PluginDescriptor.from_entry_point(fake_entry_point(
+            group='httpie.plugins.transport.v1',
+            value='test_plugins:FakeTransportPlugin',
+            attrs={'prefix': FakeTransportPlugin.prefix},
+        ))
+        manager = PluginManager()
+        manager.register(descriptor)
+        with mock.patch('httpie.client.plugin_manager', manager):
+            requests_session = get_requests_session()
+        adapter = requests_session.get_adapter('fake://foo')
+        assert isinstance(adapter, LazyTransportAdapter)
+        assert not descriptor.is_loaded
+
+
+class TestPluginTables:
+
+    def test_formatter_groups_not_adjacent(self):
+        manager = PluginManager()
+        manager.register(HeadersFormatter, ColorFormatter, JSONFormatter)
+        assert manager.get_formatters_grouped() == {
+            'format': [HeadersFormatter, JSONFormatter],
+            'colors': [ColorFormatter],
+        }
+
+    def test_formatters_sorted_by_priority(self):
+        class LateFormatter(FormatterPlugin):
+            priority = 10
+
+        class EarlyFormatter(FormatterPlugin):
+            priority = -10
+
+        manager = PluginManager()
+        manager.register(LateFormatter, HeadersFormatter, EarlyFormatter)
+        assert manager.get_formatters_grouped()['format'] == [
+            EarlyFormatter, HeadersFormatter, LateFormatter]
+
+    def test_formatter_groups_copied(self):
+        manager = PluginManager()
+        manager.register(HeadersFormatter, ColorFormatter)
+        groups = manager.get_formatters_grouped()
+        groups['format'].append(JSONFormatter)
+        del groups['colors']
+        assert manager.get_formatters_grouped() == {
+            'format': [HeadersFormatter],
+            'colors': [ColorFormatter],
+        }
+
+    def test_auth_plugin_mapping(self):
+        manager = PluginManager()
+        manager.register(BasicAuthPlugin, DigestAuthPlugin)
+        assert manager.get_auth_plugin('digest') is DigestAuthPlugin
+        with pytest.raises(KeyError):
+            manager.get_auth_plugin('ntlm')
+
+    def test_tables_rebuilt_on_register(self):
+        manager = PluginManager()
+        manager.register(BasicAuthPlugin)
+        with pytest.raises(KeyError):
+            manager.get_auth_plugin('digest')
+        manager.register(DigestAuthPlugin)
+        assert manager.get_auth_plugin('digest') is DigestAuthPlugin
+
+    def test_converter_lookup_by_mime_prefix(self):
+        class ImageConverter(ConverterPlugin):
+            mime_prefixes = ['image/']
+            supports = mock.Mock(return_value=True)
+
+        class AnyConverter(ConverterPlugin):
+            supports = mock.Mock(side_effect=lambda mime: mime == 'foo/bar')
+
+        manager = PluginManager()
+        manager.register(ImageConverter, AnyConverter)
+
+        assert manager.get_converter('image/png') is ImageConverter
+        assert manager.get_converter('foo/bar') is AnyConverter
+        assert manager.get_converter('text/plain') is None
+        ImageConverter.supports.assert_called_once_with('image/png')
+
+    def test_converter_lookup_cached(self):
+        class Converter(ConverterPlugin):
+            supports = mock.Mock(return_value=True)
+
+        manager = PluginManager()
+        manager.register(Converter)
+        manager.get_converter('foo/bar')
+        manager.get_converter('foo/bar')
+        assert Converter.supports.call_count == 1
@@ -0,0 +1,145 @@
+"""Connection pool and socket option tests (--pool-*, --tcp-*, --socket-*)."""
+import socket
+# noinspection PyCompatibility
+from argparse import ArgumentTypeError
+
+import mock
+import pytest
+
+from httpie import ExitStatus
+from httpie.client import (ENGINE_ASYNCIO, ENGINE_HTTP2, ENGINES,
+                           configure_pools, get_adapter)
+from httpie.input import keepalive_arg
+from httpie.transport import (SessionHTTPAdapter, RacingPoolManager,
+                              format_socket_options, get_socket_options)
+from utils import http, HTTP_OK
+
+
+class TestKeepaliveArg:
+
+    @pytest.mark.parametrize('value, expected', [
+        ('30', (30, None, None)),
+        ('30:5', (30, 5, None)),
+        ('30:5:3', (30, 5, 3)),
+    ])
+    def test_valid(self, value, expected):
+        assert keepalive_arg(value) == expected
+
+    @pytest.mark.parametrize('value', ['', 'x', '0', '30:', '1:2:3:4'])
+    def test_invalid(self, value):
+        with pytest.raises(ArgumentTypeError):
+            keepalive_arg(value)
+
+
+class TestSocketOptions:
+
+    def test_nodelay(self):
+        assert get_socket_options() == (
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),)
+        assert get_socket_options(nodelay=False) == (
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 0),)
+
+    def test_buffers(self):
+        options = get_socket_options(send_buffer=4096, recv_buffer=8192)
+        assert (socket.SOL_SOCKET, socket.SO_SNDBUF, 4096) in options
+        assert (socket.SOL_SOCKET, socket.SO_RCVBUF, 8192) in options
+
+    def test_keepalive(self):
+        options = get_socket_options(keepalive=(30, None, None))
+        assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+        assert 'SO_KEEPALIVE=1' in format_socket_options(options)
+
+
+class TestAdapters:
+
+    def test_adapter_per_socket_options(self):
+        options = get_socket_options(nodelay=False)
+        adapter = get_adapter(socket_options=options)
+        assert adapter is not get_adapter()
+        assert adapter is get_adapter(socket_options=options)
+        assert adapter.socket_options == options
+
+    def test_adapter_per_pool_options(self):
+        adapter = get_adapter(pool_overrides=[('pool_maxsize', 3),
+                                              ('pool_block', True)])
+        assert adapter is not get_adapter()
+        assert adapter._pool_maxsize == 3
+        assert adapter._pool_block
+
+    def test_configure_pools_keeps_overrides(self):
+        adapter = get_adapter(pool_overrides=[('pool_maxsize', 3)])
+        previous = configure_pools(maxsize=20, block=True)
+        try:
+            assert adapter._pool_maxsize == 3
+            assert adapter._pool_block
+            assert get_adapter()._pool_maxsize == 20
+        finally:
+            configure_pools(**previous)
+
+    def test_configure_pools_clears_replaced_pools(self):
+        adapter = get_adapter()
+        poolmanager = adapter.poolmanager
+        pool = poolmanager.connection_from_host('example.org', 80)
+        previous = configure_pools(maxsize=20, block=True)
+        try:
+            assert adapter.poolmanager is not poolmanager
+            assert not poolmanager.pools
+            assert pool.pool is None
+        finally:
+            configure_pools(**previous)
+
+    def test_configure_pools_keeps_pools_with_same_options(self):
+        adapter = get_adapter()
+        poolmanager = adapter.poolmanager
+        previous = configure_pools(maxsize=adapter._pool_maxsize,
+                                   block=adapter._pool_block)
+        try:
+            assert adapter.poolmanager is poolmanager
+        finally:
+            configure_pools(**previous)
+
+    def test_single_pool_manager_created(self):
+        with mock.patch('requests.adapters.PoolManager') as pool_manager, \
+                mock.patch.object(SessionHTTPAdapter, 'create_poolmanager',
+                                  side_effect=RacingPoolManager) as create:
+            adapter = SessionHTTPAdapter(
+                socket_options=get_socket_options(nodelay=True))
+        assert not pool_manager.called
+        create.assert_called_once_with(
+            num_pools=adapter._pool_connections,
+            maxsize=adapter._pool_maxsize, block=adapter._pool_block,
+            socket_options=list(adapter.socket_options))
+        assert isinstance(adapter.poolmanager, RacingPoolManager)
+
+
+class TestOptions:
+
+    # For HTTP/2, see `test_http2.TestHTTP2Engine.test_socket_options`.
+    @pytest.mark.parametrize('engine', [engine for engine in ENGINES
+                                        if engine != ENGINE_HTTP2])
+    def test_socket_options(self, httpbin, engine):
+        r = http('--engine', engine, '--tcp-nodelay=no',
+                 '--tcp-keepalive=30:5:3', '--socket-send-buffer=65536',
+                 '--socket-recv-buffer=65536', httpbin.url + '/get')
+        assert HTTP_OK in r
+
+    def test_pool_options(self, httpbin):
+        r = http('--pool-connections=2', '--pool-maxsize=2', '--pool-block',
+                 httpbin.url + '/get')
+        assert HTTP_OK in r
+
+    def test_debug(self, httpbin, capsys):
+        r = http('--debug', '--engine', ENGINE_ASYNCIO, '--pool-maxsize=4',
+                 '--tcp-keepalive=30', httpbin.url + '/get')
+        assert HTTP_OK in r
+        # The debug output of the client goes to `sys.stderr`.
+        stderr = capsys.readouterr().err
+        assert '>>> AsyncioAdapter(pool_connections=10, pool_maxsize=4' in (
+            stderr)
+        assert 'SO_KEEPALIVE=1' in stderr
+
+    def test_invalid_keepalive(self, httpbin):
+        r = http('--tcp-keepalive=x', httpbin.url + '/get',
+                 error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert 'IDLE[:INTERVAL[:COUNT]]' in r.stderr
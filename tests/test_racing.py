@@ -0,0 +1,178 @@
+"""Connection racing tests ("Happy Eyeballs", RFC 8305)."""
+import socket
+import time
+
+import mock
+import pytest
+
+from httpie import racing
+from httpie.racing import connect_attempts, create_connection, interleave
+from utils import http, HTTP_OK
+
+
+getaddrinfo = socket.getaddrinfo
+
+
+def has_ipv6_loopback():
+    try:
+        with socket.socket(socket.AF_INET6) as sock:
+            sock.bind(('::1', 0))
+    except OSError:
+        return False
+    return True
+
+
+requires_ipv6 = pytest.mark.skipif(not has_ipv6_loopback(),
+                                   reason='requires an IPv6 loopback')
+
+
+def addrinfo(host, port):
+    if ':' in host:
+        return (socket.AF_INET6, socket.SOCK_STREAM, socket.IPPROTO_TCP, '',
+                (host, port, 0, 0))
+    return (socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '',
+            (host, port))
+
+
+class Blackhole(object):
+    """A listener whose accept queue is full, so that it never completes
+    connections (the SYNs are dropped)."""
+
+    def __init__(self, host):
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        self.sock = socket.socket(family)
+        self.sock.bind((host, 0))
+        self.sock.listen(0)
+        self.port = self.sock.getsockname()[1]
+        self.clients = []
+        for _ in range(2):
+            client = socket.socket(family)
+            client.setblocking(False)
+            client.connect_ex((host, self.port))
+            self.clients.append(client)
+        time.sleep(0.1)
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.sock.close()
+
+
+@pytest.fixture
+def blackhole_ipv6():
+    blackhole = Blackhole('::1')
+    yield blackhole
+    blackhole.close()
+
+
+@pytest.fixture
+def blackhole_ipv4():
+    blackhole = Blackhole('127.0.0.1')
+    yield blackhole
+    blackhole.close()
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(8)
+    yield sock
+    sock.close()
+
+
+def resolve_to(*addrinfos):
+    """Patch `getaddrinfo()` to resolve ``dual-stack.test`` to `addrinfos`."""
+    def fake_getaddrinfo(host, port, *args, **kwargs):
+        if host == 'dual-stack.test':
+            return list(addrinfos)
+        return getaddrinfo(host, port, *args, **kwargs)
+    return mock.patch.object(racing.socket, 'getaddrinfo', fake_getaddrinfo)
+
+
+class TestInterleave:
+
+    def test_alternates_families(self):
+        infos = [addrinfo('::1', 80), addrinfo('::2', 80),
+                 addrinfo('127.0.0.1', 80), addrinfo('127.0.0.2', 80)]
+        assert [info[4][0] for info in interleave(infos)] == [
+            '::1', '127.0.0.1', '::2', '127.0.0.2']
+
+    def test_starts_with_first_family(self):
+        infos = [addrinfo('127.0.0.1', 80), addrinfo('::1', 80)]
+        assert interleave(infos) == infos
+
+
+class TestCreateConnection:
+
+    @requires_ipv6
+    def test_broken_ipv6(self, blackhole_ipv6, listener):
+        port = listener.getsockname()[1]
+        attempts = []
+        connect_attempts.set(attempts)
+        start = time.monotonic()
+        with resolve_to(addrinfo('::1', blackhole_ipv6.port),
+                        addrinfo('127.0.0.1', port)):
+            sock = create_connection(['dual-stack.test'], 80, timeout=10)
+        with sock:
+            assert sock.getpeername() == ('127.0.0.1', port)
+            assert sock.gettimeout() == 10
+        assert time.monotonic() - start < 2
+        assert [attempt.result for attempt in attempts] == [
+            'cancelled', 'connected']
+
+    def test_broken_first_address(self, blackhole_ipv4, listener):
+        port = listener.getsockname()[1]
+        with resolve_to(addrinfo('127.0.0.1', blackhole_ipv4.port),
+                        addrinfo('127.0.0.1', port)):
+            sock = create_connection(['dual-stack.test'], 80, timeout=10,
+                                     delay=0.05)
+        with sock:
+            assert sock.getpeername() == ('127.0.0.1', port)
+
+    def test_refused_tries_next_immediately(self, listener):
+        refused = socket.socket()
+        refused.bind(('127.0.0.1', 0))
+        refused_port = refused.getsockname()[1]
+        port = listener.getsockname()[1]
+        attempts = []
+        connect_attempts.set(attempts)
+        try:
+            with resolve_to(addrinfo('127.0.0.1', refused_port),
+                            addrinfo('127.0.0.1', port)):
+                sock = create_connection(['dual-stack.test'], 80, delay=10)
+        finally:
+            refused.close()
+        sock.close()
+        assert attempts[0].result.startswith('failed')
+        assert attempts[1].result == 'connected'
+        assert attempts[1].started - attempts[0].started < 1
+
+    def test_timeout(self, blackhole_ipv4):
+        with resolve_to(addrinfo('127.0.0.1', blackhole_ipv4.port)):
+            with pytest.raises(socket.timeout):
+                create_connection(['dual-stack.test'], 80, timeout=0.3)
+
+    def test_all_refused(self):
+        refused = socket.socket()
+        refused.bind(('127.0.0.1', 0))
+        try:
+            with pytest.raises(ConnectionRefusedError):
+                create_connection(['127.0.0.1'], refused.getsockname()[1])
+        finally:
+            refused.close()
+
+
+class TestRequestsEngine:
+
+    def test_debug_reports_attempts(self, httpbin, blackhole_ipv4, capsys):
+        with resolve_to(addrinfo('127.0.0.1', blackhole_ipv4.port),
+                        addrinfo('127.0.0.1', httpbin.port)):
+            r = http('--debug', '--timeout=10',
+                     'http://dual-stack.test:%d/get' % httpbin.port)
+        assert HTTP_OK in r
+        # The debug output of the client goes to `sys.stderr`.
+        stderr = capsys.readouterr().err
+        assert '>>> Connect 127.0.0.1:%d cancelled' % blackhole_ipv4.port in (
+            stderr)
+        assert '>>> Connect 127.0.0.1:%d connected' % httpbin.port in stderr
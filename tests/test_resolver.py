@@ -0,0 +1,124 @@
+"""DNS resolution tests (--resolve, --dns-cache-ttl)."""
+import json
+import os
+import shutil
+import socket
+# noinspection PyCompatibility
+from argparse import ArgumentTypeError
+
+import mock
+import pytest
+
+from httpie import resolver
+from httpie.input import resolve_arg
+from httpie.resolver import Resolver, get_resolver
+from utils import TestEnvironment, mk_config_dir, http, HTTP_OK
+
+
+ADDRINFO = [
+    (socket.AF_INET6, socket.SOCK_STREAM, 6, '', ('::1', 80, 0, 0)),
+    (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 80)),
+    (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 80)),
+]
+
+
+class TestResolveArg:
+
+    @pytest.mark.parametrize('value, expected', [
+        ('example.org:80:127.0.0.1', ('example.org', 80, '127.0.0.1')),
+        ('example.org:443:[::1]', ('example.org', 443, '::1')),
+        ('example.org:443:::1', ('example.org', 443, '::1')),
+    ])
+    def test_valid(self, value, expected):
+        assert resolve_arg(value) == expected
+
+    @pytest.mark.parametrize('value', [
+        'example.org', 'example.org:80', 'example.org:x:127.0.0.1',
+        ':80:127.0.0.1', 'example.org:80:example.com',
+    ])
+    def test_invalid(self, value):
+        with pytest.raises(ArgumentTypeError):
+            resolve_arg(value)
+
+
+class TestResolver:
+
+    def setup_method(self, method):
+        self.config_dir = mk_config_dir()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.config_dir)
+
+    def test_no_options(self):
+        assert get_resolver(self.config_dir) is None
+
+    def test_shared(self):
+        overrides = [('a', 80, '127.0.0.1')]
+        assert (get_resolver(self.config_dir, overrides=overrides)
+                is get_resolver(self.config_dir, overrides=list(overrides)))
+
+    def test_override(self):
+        r = Resolver(self.config_dir, overrides=[('Example.org', 80, '::1')])
+        with mock.patch('socket.getaddrinfo') as getaddrinfo:
+            assert r.resolve('example.org', 80) == ['::1']
+            assert r.resolve('example.org', 443) == ['example.org']
+        assert not getaddrinfo.called
+
+    def test_not_cached_without_ttl(self):
+        r = Resolver(self.config_dir)
+        assert r.resolve('example.org', 80) == ['example.org']
+        assert not os.listdir(self.config_dir)
+
+    def test_cached(self):
+        with mock.patch('socket.getaddrinfo',
+                        return_value=ADDRINFO) as getaddrinfo:
+            addresses = Resolver(self.config_dir, ttl=60).resolve(
+                'example.org', 80)
+            assert addresses == ['::1', '127.0.0.1']
+            # A new process.
+            assert Resolver(self.config_dir, ttl=60).resolve(
+                'example.org', 443) == addresses
+        assert getaddrinfo.call_count == 1
+        with open(os.path.join(self.config_dir, 'dns-cache.json')) as f:
+            assert json.load(f)['example.org']['addresses'] == addresses
+
+    def test_expired(self):
+        with mock.patch('socket.getaddrinfo',
+                        return_value=ADDRINFO) as getaddrinfo:
+            r = Resolver(self.config_dir, ttl=60)
+            r.resolve('example.org', 80)
+            with mock.patch.object(resolver.time, 'time',
+                                   return_value=resolver.time.time() + 61):
+                r.resolve('example.org', 80)
+        assert getaddrinfo.call_count == 2
+
+    def test_ip_addresses_not_cached(self):
+        with mock.patch('socket.getaddrinfo') as getaddrinfo:
+            r = Resolver(self.config_dir, ttl=60)
+            assert r.resolve('127.0.0.1', 80) == ['127.0.0.1']
+        assert not getaddrinfo.called
+
+
+@pytest.mark.parametrize('engine', ['requests', 'asyncio'])
+class TestResolveOption:
+
+    def test_resolve(self, httpbin, engine):
+        port = httpbin.port
+        r = http('--engine', engine,
+                 '--resolve', 'httpie.test:%d:127.0.0.1' % port,
+                 'GET', 'http://httpie.test:%d/headers' % port)
+        assert HTTP_OK in r
+        assert '"Host": "httpie.test:%d"' % port in r
+
+    def test_dns_cache(self, httpbin, engine):
+        config_dir = mk_config_dir()
+        try:
+            url = httpbin.url.replace('127.0.0.1', 'localhost') + '/get'
+            r = http('--engine', engine, '--dns-cache-ttl=60', url,
+                     env=TestEnvironment(config_dir=config_dir))
+            assert HTTP_OK in r
+            path = os.path.join(config_dir, 'dns-cache.json')
+            with open(path) as f:
+                assert 'localhost' in json.load(f)
+        finally:
+            shutil.rmtree(config_dir)
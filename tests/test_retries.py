@@ -0,0 +1,318 @@
+"""Retry tests (--max-retries, --retry-on, --retry-backoff, --retry-budget)."""
+import os
+import socket
+import threading
+from http.client import responses
+# noinspection PyCompatibility
+from argparse import ArgumentTypeError
+
+import mock
+import pytest
+import requests
+from requests.packages.urllib3.exceptions import (MaxRetryError,
+                                                  NewConnectionError,
+                                                  ProtocolError)
+
+from httpie.client import ENGINE_ASYNCIO, ENGINE_REQUESTS
+from httpie.input import retry_on_arg
+from httpie.retries import (RETRY_CONNECT, RETRY_READ, RetryPolicy,
+                            get_error_kind, parse_retry_after,
+                            send_with_retries)
+from fixtures import FILE_PATH_ARG
+from utils import TestEnvironment, http, HTTP_OK
+
+
+class ScriptedServer(object):
+    """A keep-alive HTTP/1.1 server answering request N (from 0, across
+    connections) with ``respond(N, n)``, where n is the number of the
+    request on its connection: a `(status, headers)` tuple, or `None` to
+    close the connection without a response.
+
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self.connections = 0
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(8)
+        self.url = 'http://127.0.0.1:%d' % self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                client, address = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(client,),
+                             daemon=True).start()
+
+    def handle(self, client):
+        rfile = client.makefile('rb')
+        n = 0
+        with client, rfile:
+            while True:
+                request_line = rfile.readline()
+                if not request_line:
+                    return
+                length = 0
+                for line in iter(rfile.readline, b'\r\n'):
+                    name, _, value = line.decode().partition(':')
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                rfile.read(length)
+                self.requests.append(request_line.split()[0].decode())
+                response = self.respond(len(self.requests) - 1, n)
+                n += 1
+                if response is None:
+                    return
+                status, headers = response
+                head = ['HTTP/1.1 %d %s' % (status, responses[status]),
+                        'Content-Length: 2']
+                head.extend('%s: %s' % header for header in headers)
+                client.sendall(('\r\n'.join(head) + '\r\n\r\nok').encode())
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def scripted_server():
+    servers = []
+
+    def start(respond):
+        server = ScriptedServer(respond)
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.close()
+
+
+def fake_response(status, **headers):
+    return mock.Mock(status_code=status, headers=headers)
+
+
+def connect_error():
+    return requests.ConnectionError(MaxRetryError(
+        None, '/', NewConnectionError(None, 'Connection refused')))
+
+
+class TestRetryOnArg:
+
+    def test_valid(self):
+        assert retry_on_arg('5xx,429, Connect,read') == (
+            '5xx', '429', 'connect', 'read')
+
+    @pytest.mark.parametrize('value', ['', 'x', '6xx', '42', 'connect,'])
+    def test_invalid(self, value):
+        with pytest.raises(ArgumentTypeError):
+            retry_on_arg(value)
+
+
+class TestPolicy:
+
+    def test_error_kinds(self):
+        assert get_error_kind(connect_error()) == RETRY_CONNECT
+        assert get_error_kind(requests.ConnectTimeout()) == RETRY_CONNECT
+        assert get_error_kind(requests.ReadTimeout()) == RETRY_READ
+        assert get_error_kind(requests.ConnectionError(
+            ProtocolError('Connection aborted.'))) == RETRY_READ
+        assert get_error_kind(requests.exceptions.SSLError()) is None
+
+    def test_statuses_of_idempotent_methods_only(self):
+        policy = RetryPolicy(max_retries=1, retry_on=['5xx', '429'])
+        response = fake_response(503)
+        assert policy.get_reason('get', response) == '503'
+        assert policy.get_reason('POST', response) is None
+        assert policy.get_reason('GET', fake_response(429)) == '429'
+        assert policy.get_reason('GET', fake_response(404)) is None
+
+    def test_read_errors_of_idempotent_methods_only(self):
+        policy = RetryPolicy(max_retries=1)
+        error = requests.ReadTimeout()
+        assert policy.get_reason('PUT', error=error) == RETRY_READ
+        assert policy.get_reason('POST', error=error) is None
+        assert policy.get_reason('POST', error=connect_error()) == (
+            RETRY_CONNECT)
+
+    def test_backoff_full_jitter(self):
+        policy = RetryPolicy(backoff=0.5)
+        with mock.patch('random.uniform', return_value=0.1) as uniform:
+            assert policy.get_wait(0) == 0.1
+            policy.get_wait(3)
+            policy.get_wait(10)
+        assert uniform.call_args_list == [
+            mock.call(0, 0.5), mock.call(0, 4), mock.call(0, 30)]
+
+    def test_retry_after(self):
+        policy = RetryPolicy()
+        assert policy.get_wait(5, fake_response(503, **{'Retry-After': '7'})) == 7
+
+    @pytest.mark.parametrize('value, seconds', [
+        ('120', 120),
+        ('Wed, 21 Oct 2015 07:28:00 GMT', 60),
+        ('Wed, 21 Oct 2015 07:26:00 GMT', 0),
+        ('soon', None),
+    ])
+    def test_parse_retry_after(self, value, seconds):
+        now = 1445412420  # 2015-10-21 07:27:00 UTC
+        assert parse_retry_after(value, now=now) == seconds
+
+
+class TestSendWithRetries:
+
+    def send(self, *results):
+        results = list(results)
+
+        def send():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return send
+
+    def test_retries_until_success(self):
+        ok = fake_response(200)
+        sleep = mock.Mock()
+        response = send_with_retries(
+            self.send(connect_error(), fake_response(502), ok),
+            RetryPolicy(max_retries=5), 'GET', rewind=mock.Mock(),
+            sleep=sleep)
+        assert response is ok
+        assert sleep.call_count == 2
+
+    def test_raises_last_error(self):
+        with pytest.raises(requests.ConnectionError):
+            send_with_retries(
+                self.send(connect_error(), connect_error()),
+                RetryPolicy(max_retries=1), 'GET', sleep=mock.Mock())
+
+    def test_rewinds_body(self):
+        rewind = mock.Mock()
+        send_with_retries(
+            self.send(fake_response(503), fake_response(200)),
+            RetryPolicy(max_retries=1), 'PUT', rewind=rewind,
+            sleep=mock.Mock())
+        assert rewind.call_count == 1
+
+    def test_body_not_rewindable(self):
+        response = fake_response(503)
+        assert send_with_retries(
+            self.send(response), RetryPolicy(max_retries=1), 'PUT',
+            rewind=None, sleep=mock.Mock()) is response
+
+    def test_budget(self):
+        response = fake_response(503, **{'Retry-After': '120'})
+        sleep = mock.Mock()
+        assert send_with_retries(
+            self.send(response), RetryPolicy(max_retries=3, budget=60),
+            'GET', rewind=mock.Mock(), sleep=sleep) is response
+        assert not sleep.called
+
+
+class TestRetries:
+
+    def test_retries_until_success(self, scripted_server):
+        server = scripted_server(
+            lambda i, n: (200, []) if i == 2 else (503, []))
+        r = http('--max-retries=3', '--retry-backoff=0', server.url + '/')
+        assert HTTP_OK in r
+        assert len(server.requests) == 3
+
+    def test_gives_up(self, scripted_server):
+        server = scripted_server(lambda i, n: (503, []))
+        r = http('--max-retries=2', '--retry-backoff=0', server.url + '/')
+        assert '503' in r
+        assert len(server.requests) == 3
+
+    def test_disabled_by_default(self, scripted_server):
+        server = scripted_server(lambda i, n: (503, []))
+        http(server.url + '/')
+        assert len(server.requests) == 1
+
+    def test_post_not_retried_on_status(self, scripted_server):
+        server = scripted_server(lambda i, n: (503, []))
+        http('--max-retries=2', '--retry-backoff=0', 'POST',
+             server.url + '/', 'a=b')
+        assert server.requests == ['POST']
+
+    def test_retry_on(self, scripted_server):
+        server = scripted_server(
+            lambda i, n: (200, []) if i == 1 else (418, []))
+        r = http('--max-retries=2', '--retry-on=418', '--retry-backoff=0',
+                 server.url + '/')
+        assert HTTP_OK in r
+
+    @pytest.mark.parametrize('engine', [ENGINE_REQUESTS, ENGINE_ASYNCIO])
+    def test_connect_error(self, engine, capsys):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        url = 'http://127.0.0.1:%d/' % sock.getsockname()[1]
+        try:
+            with pytest.raises(requests.ConnectionError):
+                http('--debug', '--engine', engine, '--max-retries=2',
+                     '--retry-backoff=0', 'POST', url)
+        finally:
+            sock.close()
+        assert '>>> 3 attempt(s)' in capsys.readouterr().err
+
+    def test_debug(self, scripted_server, capsys):
+        server = scripted_server(
+            lambda i, n: (200, []) if i == 1 else (503, []))
+        http('--debug', '--max-retries=2', '--retry-backoff=0',
+             server.url + '/')
+        # The debug output of the client goes to `sys.stderr`.
+        stderr = capsys.readouterr().err
+        assert '>>> Retry 1/2 in 0.00 s (503)' in stderr
+        assert '>>> 2 attempt(s), 0.00 s spent waiting for retries' in stderr
+
+
+class TestStaleConnections:
+
+    @pytest.mark.parametrize('engine', [ENGINE_REQUESTS, ENGINE_ASYNCIO])
+    def test_idempotent_request_retried(self, scripted_server, engine):
+        # The server closes the connection when it gets its second request,
+        # as if its keep-alive timeout had expired just then.
+        server = scripted_server(lambda i, n: None if n else (200, []))
+        assert HTTP_OK in http('--engine', engine, server.url + '/')
+        assert HTTP_OK in http('--engine', engine, server.url + '/')
+        assert server.requests == ['GET', 'GET', 'GET']
+        assert server.connections == 2
+
+    @pytest.mark.parametrize('engine', [ENGINE_REQUESTS, ENGINE_ASYNCIO])
+    def test_post_not_retried(self, scripted_server, engine):
+        server = scripted_server(lambda i, n: None if n else (200, []))
+        http('--engine', engine, server.url + '/')
+        with pytest.raises(requests.ConnectionError):
+            http('--engine', engine, 'POST', server.url + '/', 'a=b')
+        assert server.requests == ['GET', 'POST']
+
+    @pytest.mark.parametrize('engine', [ENGINE_REQUESTS, ENGINE_ASYNCIO])
+    def test_new_connection_not_retried(self, scripted_server, engine):
+        server = scripted_server(lambda i, n: None if i == 0 else (200, []))
+        with pytest.raises(requests.ConnectionError):
+            http('--engine', engine, server.url + '/')
+        assert server.requests == ['GET']
+
+    def test_file_body_retried(self, scripted_server):
+        server = scripted_server(lambda i, n: None if n else (200, []))
+        http(server.url + '/')
+        assert HTTP_OK in http('PUT', server.url + '/', '@' + FILE_PATH_ARG)
+        assert server.requests == ['GET', 'PUT', 'PUT']
+
+    @pytest.mark.parametrize('engine', [ENGINE_REQUESTS, ENGINE_ASYNCIO])
+    def test_piped_body_not_retried(self, scripted_server, engine):
+        server = scripted_server(lambda i, n: None if n else (200, []))
+        http('--engine', engine, server.url + '/')
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b'data')
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as stdin:
+            env = TestEnvironment(stdin=stdin, stdin_isatty=False)
+            with pytest.raises(requests.ConnectionError):
+                http('--engine', engine, 'PUT', server.url + '/', env=env)
+        assert server.requests == ['GET', 'PUT']
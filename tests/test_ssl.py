@@ -1,10 +1,16 @@
 import os
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
+import mock
 import pytest
 import pytest_httpbin.certs
 from requests.exceptions import SSLError
 
 from httpie import ExitStatus
+from httpie import tls
+from httpie.tls import SessionSSLContext, get_ssl_context
 from utils import http, HTTP_OK, TESTS_ROOT
 
 
@@ -16,6 +22,43 @@ CLIENT_PEM = os.path.join(TESTS_ROOT, 'client_certs', 'client.pem')
 # Requests without --verify=<CA_BUNDLE> will fail with a verification error.
 # See: https://github.com/kevin1024/pytest-httpbin#https-support
 CA_BUNDLE = pytest_httpbin.certs.where()
+SERVER_CERT = os.path.join(os.path.dirname(CA_BUNDLE), 'server.pem')
+SERVER_KEY = os.path.join(os.path.dirname(CA_BUNDLE), 'server.key')
+
+
+class OKHandler(BaseHTTPRequestHandler):
+    """Respond with an empty body and close the connection, so that the
+    next request makes a new one."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def tls_server():
+    """
+    An HTTPS server with a single server-side `ssl.SSLContext`, which can
+    resume the TLS sessions it has established (unlike ``httpbin_secure``,
+    which makes a new context per connection).
+
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(SERVER_CERT, SERVER_KEY)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OKHandler)
+    server.daemon_threads = True
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    server.url = 'https://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
 
 
 class TestClientSSLCertHandling(object):
@@ -80,3 +123,72 @@ class TestServerSSLCertHandling(object):
     def test_verify_custom_ca_bundle_invalid_bundle(self, httpbin_secure):
         with pytest.raises(SSLError):
             http(f'{httpbin_secure.url}/get', '--verify', __file__)
+
+
+class TestTLSSessionResumption(object):
+
+    # The debug output of the client goes to `sys.stderr`.
+
+    def test_debug_shows_resumed_session(self, tls_server, capsys):
+        url = f'{tls_server.url}/get'
+        http('--verify', CA_BUNDLE, url)
+        r = http('--debug', '--verify', CA_BUNDLE, url)
+        assert HTTP_OK in r
+        assert '>>> TLS session resumed' in capsys.readouterr().err
+
+    def test_debug_asyncio_engine(self, tls_server, capsys):
+        url = f'{tls_server.url}/get'
+        http('--engine=asyncio', '--verify', CA_BUNDLE, url)
+        r = http('--debug', '--engine=asyncio', '--verify', CA_BUNDLE, url)
+        assert HTTP_OK in r
+        assert '>>> TLS session resumed' in capsys.readouterr().err
+
+    def test_debug_plain_http(self, httpbin, capsys):
+        r = http('--debug', f'{httpbin.url}/get')
+        assert HTTP_OK in r
+        assert '>>> TLS session' not in capsys.readouterr().err
+
+    def test_session_cache(self):
+        context = SessionSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        connection = mock.Mock(session=mock.Mock(has_ticket=True))
+        context.sessions.add(('example.org', 443), connection)
+        assert (context.sessions.get(('example.org', 443))
+                is connection.session)
+        assert context.sessions.get(('example.org', 80)) is None
+
+    def test_session_saved_on_close(self):
+        context = SessionSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        session = mock.Mock(has_ticket=True)
+        connection = mock.Mock(session=session)
+        context.sessions.add(('example.org', 443), connection)
+        context.sessions.save(('example.org', 443), connection)
+        del connection
+        assert context.sessions.get(('example.org', 443)) is session
+
+
+class TestSSLContextCache(object):
+
+    def test_shared(self):
+        assert (get_ssl_context(CA_BUNDLE, [CLIENT_CERT, CLIENT_KEY])
+                is get_ssl_context(CA_BUNDLE, (CLIENT_CERT, CLIENT_KEY)))
+
+    def test_keyed_by_options(self):
+        context = get_ssl_context(CA_BUNDLE, None)
+        assert get_ssl_context(False, None) is not context
+        assert get_ssl_context(CA_BUNDLE, CLIENT_PEM) is not context
+        assert get_ssl_context(CA_BUNDLE, None, ['h2']) is not context
+
+    def test_verify_no(self):
+        context = get_ssl_context(False, None)
+        assert context.verify_mode == ssl.CERT_NONE
+        assert not context.check_hostname
+
+    def test_certificates_loaded_once(self, httpbin_secure):
+        with mock.patch.object(tls, '_contexts', {}), \
+                mock.patch.object(tls, 'create_ssl_context',
+                                  wraps=tls.create_ssl_context) as create:
+            for _ in range(3):
+                r = http('--verify', CA_BUNDLE, '--cert', CLIENT_PEM,
+                         f'{httpbin_secure.url}/get', 'Connection:close')
+                assert HTTP_OK in r
+        assert create.call_count == 1
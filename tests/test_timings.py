@@ -0,0 +1,145 @@
+"""Phase timings tests (--timings)."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from httpie.client import ENGINE_ASYNCIO
+from httpie.timings import Timings, format_timings
+from utils import http, HTTP_OK
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '10')
+        self.end_headers()
+        self.wfile.write(b'{"a": "b"}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def make_timings(**marks):
+    timings = Timings('GET', 'https://example.org/')
+    timings.status = 200
+    timings.marks.update({'start': 0}, **marks)
+    return timings
+
+
+class TestTimings:
+
+    def test_phases(self):
+        timings = make_timings(connect_start=0.001, resolved=0.003,
+                               connected=0.006, tls=0.010, send_start=0.011,
+                               sent=0.012, headers=0.020)
+        timings.add('transfer', 0.005)
+        timings.add('format', 0.002)
+        phases = {phase: round(seconds, 6)
+                  for phase, seconds in timings.get_phases().items()}
+        assert phases == {'dns': 0.002, 'connect': 0.003, 'tls': 0.004,
+                          'send': 0.001, 'ttfb': 0.008, 'transfer': 0.005,
+                          'format': 0.002}
+        assert round(timings.get_total(), 6) == 0.027
+        assert not timings.reused_connection
+
+    def test_plain_http_connects_while_sending(self):
+        timings = make_timings(send_start=0.001, connect_start=0.002,
+                               resolved=0.003, connected=0.005, sent=0.006,
+                               headers=0.010)
+        phases = timings.get_phases()
+        assert phases['tls'] is None
+        assert round(phases['send'], 6) == 0.001
+
+    def test_reused_connection(self):
+        timings = make_timings(send_start=0.001, sent=0.002, headers=0.004)
+        phases = timings.get_phases()
+        assert timings.reused_connection
+        assert phases['dns'] is phases['connect'] is phases['tls'] is None
+
+    def test_iter_timed(self):
+        timings = make_timings()
+        assert list(timings.iter_timed([b'a', b'b'], 'transfer')) == [
+            b'a', b'b']
+        assert timings.durations['transfer'] >= 0
+
+    def test_format_text(self):
+        text = format_timings([make_timings(sent=0.001, headers=0.002)])
+        header, row = text.strip().splitlines()
+        assert header.split()[:9] == ['Hop', 'Status', 'DNS', 'Connect',
+                                      'TLS', 'Send', 'TTFB', 'Transfer',
+                                      'Format']
+        assert row.split() == ['1', '200', '-', '-', '-', '1.00', '1.00',
+                               '-', '-', '2.00', 'GET',
+                               'https://example.org/']
+
+    def test_format_json(self):
+        hops = json.loads(format_timings(
+            [make_timings(sent=0.001, headers=0.002)], 'json'))
+        assert hops[0]['status'] == 200
+        assert hops[0]['reused_connection'] is True
+        assert hops[0]['timings_ms']['ttfb'] == 1.0
+        assert hops[0]['timings_ms']['total'] == 2.0
+
+
+class TestTimingsOption:
+
+    def test_redirect_hops(self, server):
+        r = http('--timings', '--timings-format=json', '--follow',
+                 server.url + '/redirect')
+        assert HTTP_OK in r
+        hops = json.loads(r.stderr)
+        assert [(hop['status'], hop['url']) for hop in hops] == [
+            (302, server.url + '/redirect'), (200, server.url + '/')]
+        first, second = [hop['timings_ms'] for hop in hops]
+        assert first['dns'] is not None and first['connect'] is not None
+        assert first['tls'] is None
+        assert first['ttfb'] is not None
+        # The redirect is followed over the same connection.
+        assert hops[1]['reused_connection']
+        assert second['transfer'] is not None
+
+    def test_text(self, server):
+        r = http('--timings', '--pretty=format', server.url + '/')
+        lines = r.stderr.strip().splitlines()
+        assert lines[0].startswith('Hop  Status')
+        assert lines[1].split()[:2] == ['1', '200']
+        assert lines[1].endswith('GET %s/' % server.url)
+
+    def test_not_by_default(self, server):
+        r = http(server.url + '/')
+        assert 'TTFB' not in r.stderr
+
+    def test_asyncio_engine(self, server):
+        r = http('--timings', '--timings-format=json', '--engine',
+                 ENGINE_ASYNCIO, server.url + '/')
+        hop, = json.loads(r.stderr)
+        assert hop['status'] == 200
+        assert hop['timings_ms']['total'] > 0
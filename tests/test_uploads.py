@@ -1,8 +1,20 @@
+import io
+import json
 import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 
 import pytest
+import requests
+from requests.packages.urllib3 import filepost
 
-from httpie.input import ParseError
+from httpie import ExitStatus
+from httpie.client import ENGINE_ASYNCIO, ENGINE_REQUESTS
+from httpie.input import DataDict, ParamsDict, ParseError
+from httpie.uploads import (BODY_PREVIEW_SIZE, FileBody, MultipartBody,
+                            SeekableStreamedBody, StreamedBody,
+                            get_streamed_body)
 from utils import TestEnvironment, http, HTTP_OK
 from fixtures import FILE_PATH_ARG, FILE_PATH, FILE_CONTENT
 
@@ -95,3 +107,318 @@ class TestRequestBodyFromFilePath:
             error_exit_ok=True,
         )
         assert 'cannot be mixed' in r.stderr
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """Respond with how the request body was framed, and its size."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            size = 0
+            while True:
+                chunk_size = int(self.rfile.readline(), 16)
+                size += len(self.rfile.read(chunk_size + 2)) - 2
+                if not chunk_size:
+                    break
+        else:
+            size = len(self.rfile.read(
+                int(self.headers.get('Content-Length', 0))))
+        body = json.dumps({
+            'content_length': self.headers.get('Content-Length'),
+            'transfer_encoding': self.headers.get('Transfer-Encoding'),
+            'size': size,
+        }).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+def get_echo(r):
+    """Return what `EchoHandler` responded with in the output `r`."""
+    return json.loads(r[r.rindex('\r\n\r\n'):])
+
+
+@pytest.fixture
+def echo_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestStreamedBody:
+
+    def test_file_size_is_known(self, tmpdir):
+        path = tmpdir.join('body')
+        path.write_binary(b'xxabcd')
+        with open(str(path), 'rb') as f:
+            f.read(2)
+            body = get_streamed_body(f)
+            assert isinstance(body, FileBody)
+            assert body.len == 4
+            assert b''.join(body) == b'abcd'
+            assert body.tell() == 4
+            body.seek(1)
+            assert body.read() == b'bcd'
+            assert body.preview == b'abcd'
+
+    def test_pipe_size_is_unknown(self):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b'abcd')
+        os.close(write_fd)
+        with open(read_fd, 'rb') as f:
+            body = get_streamed_body(f)
+            assert type(body) is StreamedBody
+            assert body.len is None
+            assert not body.seekable()
+            assert b''.join(body) == b'abcd'
+
+    def test_empty(self, tmpdir):
+        path = tmpdir.join('body')
+        path.write_binary(b'')
+        read_fd, write_fd = os.pipe()
+        os.close(write_fd)
+        with open(str(path), 'rb') as f, open(read_fd, 'rb') as pipe:
+            assert get_streamed_body(f) is None
+            assert get_streamed_body(pipe) is None
+        assert get_streamed_body(io.BytesIO()) is None
+
+    def test_close_fd(self, tmpdir):
+        path = tmpdir.join('body')
+        path.write_binary(b'abcd')
+        with open(str(path), 'rb') as f:
+            get_streamed_body(f).close()
+            assert not f.closed
+            get_streamed_body(f, close_fd=True).close()
+            assert f.closed
+        path.write_binary(b'')
+        with open(str(path), 'rb') as f:
+            assert get_streamed_body(f, close_fd=True) is None
+            assert f.closed
+
+    def test_in_memory(self):
+        body = get_streamed_body(io.BytesIO(b'abcd'))
+        assert type(body) is SeekableStreamedBody
+        assert body.len == 4
+
+    def test_sendfile_args(self, tmpdir):
+        path = tmpdir.join('body')
+        path.write_binary(b'abcdef')
+        with open(str(path), 'rb') as f:
+            body = get_streamed_body(f, preview_size=4)
+            assert body.read(1) == b'a'
+            assert body.get_sendfile_args() == (f, 1, 5)
+            assert body.preview == b'abcd'
+            assert body.omitted == 2
+
+    def test_preview_is_bounded(self):
+        body = get_streamed_body(io.BytesIO(b'abcdef'), preview_size=4)
+        assert b''.join(body) == b'abcdef'
+        assert body.preview == b'abcd'
+        assert body.omitted == 2
+
+
+class TestRequestBodyFromStdin:
+
+    def test_regular_file_sent_with_content_length(self, echo_server):
+        with open(FILE_PATH, 'rb') as stdin:
+            env = TestEnvironment(stdin=stdin, stdin_isatty=False)
+            r = http('--verbose', 'POST', echo_server.url, env=env)
+        size = os.path.getsize(FILE_PATH)
+        assert 'Content-Length: %d' % size in r
+        assert FILE_CONTENT in r
+        assert get_echo(r) == {'content_length': str(size),
+                               'transfer_encoding': None, 'size': size}
+
+    def test_pipe_sent_chunked(self, echo_server):
+        read_fd, write_fd = os.pipe()
+        size = 3 * BODY_PREVIEW_SIZE
+
+        def write():
+            with open(write_fd, 'wb') as f:
+                f.write(b'x' * size)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        with open(read_fd, 'rb') as stdin:
+            env = TestEnvironment(stdin=stdin, stdin_isatty=False)
+            r = http('--verbose', 'POST', echo_server.url, env=env)
+        writer.join()
+        assert 'Transfer-Encoding: chunked' in r
+        assert get_echo(r) == {'content_length': None,
+                               'transfer_encoding': 'chunked', 'size': size}
+        # Only the start of the body is shown.
+        assert 'x' * BODY_PREVIEW_SIZE in r
+        assert 'x' * (BODY_PREVIEW_SIZE + 1) not in r
+        assert '[%d more bytes not shown]' % (size - BODY_PREVIEW_SIZE) in r
+
+
+    def test_empty_means_no_body(self, echo_server):
+        # E.g., ``http GET URL < /dev/null`` in a script.
+        with open(os.devnull, 'rb') as stdin:
+            env = TestEnvironment(stdin=stdin, stdin_isatty=False)
+            r = http('--verbose', 'GET', echo_server.url, env=env)
+        request = r[:r.index('HTTP/1.1 200')]
+        assert 'Transfer-Encoding' not in request
+        assert 'application/json' not in request
+        assert get_echo(r) == {'content_length': None,
+                               'transfer_encoding': None, 'size': 0}
+
+
+class TestRequestBodyFromFileSendfile:
+
+    @pytest.fixture
+    def big_file(self, tmpdir):
+        path = tmpdir.join('big.txt')
+        path.write_binary(b'x' * (3 * BODY_PREVIEW_SIZE))
+        return str(path)
+
+    @pytest.fixture
+    def sendfile_calls(self, monkeypatch):
+        calls = []
+        get_sendfile_args = FileBody.get_sendfile_args
+
+        def record(body):
+            args = get_sendfile_args(body)
+            calls.append(args[1:])
+            return args
+
+        monkeypatch.setattr(FileBody, 'get_sendfile_args', record)
+        return calls
+
+    @pytest.mark.parametrize('engine', [ENGINE_REQUESTS, ENGINE_ASYNCIO])
+    def test_sent_with_sendfile(self, echo_server, big_file, sendfile_calls,
+                                engine):
+        size = os.path.getsize(big_file)
+        r = http('--verbose', '--engine', engine, 'POST', echo_server.url,
+                 '@' + big_file)
+        assert sendfile_calls == [(0, size)]
+        assert 'Content-Length: %d' % size in r
+        assert 'Content-Type: text/plain' in r
+        assert get_echo(r) == {'content_length': str(size),
+                               'transfer_encoding': None, 'size': size}
+        assert 'x' * BODY_PREVIEW_SIZE in r
+        assert 'x' * (BODY_PREVIEW_SIZE + 1) not in r
+
+
+@pytest.fixture
+def opened_files(monkeypatch):
+    """The files opened by `httpie.input` (e.g., for ``@file``)."""
+    files = []
+
+    def record(*args, **kwargs):
+        f = open(*args, **kwargs)
+        files.append(f)
+        return f
+
+    monkeypatch.setattr('httpie.input.open', record, raising=False)
+    return files
+
+
+class TestFilesClosed:
+
+    def test_body_file(self, echo_server, opened_files):
+        r = http('POST', echo_server.url, '@' + FILE_PATH_ARG)
+        assert HTTP_OK in r
+        assert len(opened_files) == 1
+        assert opened_files[0].closed
+
+    def test_empty_body_file(self, echo_server, opened_files, tmpdir):
+        path = tmpdir.join('empty.txt')
+        path.write_binary(b'')
+        r = http('POST', echo_server.url, '@' + str(path))
+        assert HTTP_OK in r
+        assert opened_files[0].closed
+
+    @pytest.mark.parametrize('items', [
+        ['@' + FILE_PATH_ARG, 'foo=bar'],
+        ['field@' + FILE_PATH_ARG],
+    ])
+    def test_parse_error(self, opened_files, items):
+        r = http('POST', 'example.org', *items, error_exit_ok=True)
+        assert r.exit_status == ExitStatus.ERROR
+        assert opened_files[0].closed
+
+    def test_multipart_files(self, echo_server, opened_files):
+        r = http('--form', 'POST', echo_server.url, 'a@' + FILE_PATH_ARG,
+                 'b@' + FILE_PATH_ARG)
+        assert HTTP_OK in r
+        assert len(opened_files) == 2
+        assert all(f.closed for f in opened_files)
+
+    def test_file_not_found(self, opened_files):
+        with pytest.raises(ParseError):
+            http('--form', 'POST', 'example.org', 'a@' + FILE_PATH_ARG,
+                 'b@/__not_found__')
+        assert opened_files[0].closed
+
+
+class TestMultipartBody:
+
+    def get_items(self):
+        fields = ParamsDict([('foo', 'bar'), ('foo', 'baz'), ('a', 'b')])
+        files = DataDict([('file', ('test.txt', open(FILE_PATH, 'rb'))),
+                          ('file', ('test.txt', open(FILE_PATH, 'rb')))])
+        return fields, files
+
+    def test_same_as_requests(self, monkeypatch):
+        monkeypatch.setattr(filepost, 'choose_boundary', lambda: 'xyz')
+        expected, content_type = \
+            requests.models.RequestEncodingMixin._encode_files(
+                *reversed(self.get_items()))
+        body = MultipartBody(*self.get_items(), boundary='xyz')
+        assert body.content_type == content_type
+        assert body.len == len(expected)
+        assert b''.join(body) == expected
+
+    def test_close(self):
+        fields, files = self.get_items()
+        MultipartBody(fields, files).close()
+        assert all(fd.closed for name, (filename, fd) in files.items())
+
+    def test_rewind(self):
+        body = MultipartBody(*self.get_items())
+        everything = body.read()
+        assert body.seekable()
+        body.seek(10)
+        assert body.tell() == 10
+        assert body.read() == everything[10:]
+        assert body.preview == everything[:BODY_PREVIEW_SIZE]
+
+    def test_unknown_file_size(self):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b'abcd')
+        os.close(write_fd)
+        with open(read_fd, 'rb') as f:
+            body = MultipartBody({}, {'file': ('f', f)})
+            assert body.len is None
+            assert not body.seekable()
+            assert b'\r\n\r\nabcd\r\n' in body.read()
+
+    def test_upload(self, echo_server, tmpdir):
+        path = tmpdir.join('big.txt')
+        path.write_binary(b'x' * (3 * BODY_PREVIEW_SIZE))
+        r = http('--verbose', '--form', 'POST', echo_server.url, 'a=b',
+                 'file@' + str(path))
+        echo = get_echo(r)
+        assert echo['transfer_encoding'] is None
+        assert echo['size'] == int(echo['content_length']) > path.size()
+        assert 'Content-Type: multipart/form-data; boundary=' in r
+        assert 'Content-Disposition: form-data; name="a"' in r
+        assert 'more bytes not shown]' in r
@@ -70,6 +70,12 @@ class TestEnvironment(Environment):
 
         super(TestEnvironment, self).__init__(**kwargs)
 
+    def copy(self, **kwargs):
+        env = super(TestEnvironment, self).copy(**kwargs)
+        # Only deleted along with the original.
+        env.delete_config_dir = False
+        return env
+
     def __del__(self):
         if self.delete_config_dir:
             self._shutil.rmtree(self.config_dir)